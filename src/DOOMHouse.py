@@ -1,62 +1,93 @@
-import clickhouse_connect
 import sys
-import array
+import collections
 import math
 import os
 import time
 import tkinter as tk
-import concurrent.futures
 from PIL import Image, ImageDraw, ImageFont, ImageTk
 from dotenv import load_dotenv
 
+from camera_paths import MOVE_SPEED, ROT_SPEED, PathRecorder
+from frame_cache import FrameCache
+from frame_pipeline import FramePipeline
+from frame_sinks import TkSink
+from framebuffer import FrameBuffer
+from prediction import MovePredictor, reproject
+from renderer import Frame, Renderer, RENDER_MODES, FRAME_WIDTH, FRAME_HEIGHT, FRAME_CACHE_MB, FRAME_ENCODING
+from resolution import ResolutionController, scaled_resolutions
+from speculation import Speculator
+
 # Load environment variables from .env file
 load_dotenv()
 
 # ---------------------------------------------------------
 # CONFIGURATION
 # ---------------------------------------------------------
-HOST = os.getenv('CLICKHOUSE_HOST', 'localhost')
-PORT = int(os.getenv('CLICKHOUSE_PORT', '8123'))
-USER = os.getenv('CLICKHOUSE_USER', 'default')
-PASS = os.getenv('CLICKHOUSE_PASS', '')
-
-# Movement Constants
-MOVE_SPEED = 0.3
-ROT_SPEED = 0.15
-
-# Texture Settings
-#TEXTURE_SIZE = 64  # 64x64 pixels
-#TEXTURE_SIZE = 256  # 256x256 pixels
-TEXTURE_SIZE = 512  # 512x512 pixels
-#OBS: Loading 1024x1024 texture maps currently does not work
-#TEXTURE_SIZE = 1024  # 1024x1024 pixels
-TEXTURE_INTENSITY = 1.2  # Texture intensity factor (1.0 = normal, <1.0 = darker, >1.0 = brighter)
-
-# NOTE: Wall2 is currently not used
-TEXTURE_THEMES = {
-    "classic": {
-        "wall1": "texture20.png",
-        "wall2": "texture20.png",
-        "floor": "texture28.png",
-        "ceiling": "texture38.png"
-    },
-       
-    "dungeon": {
-        "wall1": "texture41.png",
-        "wall2": "texture41.png",
-        "floor": "texture40.png",
-        "ceiling": "texture39.png"
-    }
-}    
+# Connection, map, tiling, render mode and texture settings: see renderer.py
+
+# Speculative Rendering
+# Background workers render the poses reachable with one more key press into the
+# frame cache, at a low ClickHouse query priority (0 workers = disabled).
+SPECULATION_WORKERS = int(os.getenv('DOOMHOUSE_SPECULATION_WORKERS', '2'))
+SPECULATION_PRIORITY = 10
+SPECULATION_WAIT = 0.25 # seconds to wait for an in-flight speculative frame of the pressed key
+
+# Frames In Flight
+# Frames render on background workers while the window keeps handling input. Each of
+# the FRAMES_IN_FLIGHT renderers (with their own connections and session) holds one
+# frame in flight; input is sampled whenever one of them is free, so only the newest
+# pose is rendered. 1 = render one frame at a time.
+FRAMES_IN_FLIGHT = max(int(os.getenv('DOOMHOUSE_FRAMES_IN_FLIGHT', '2')), 1)
+FRAME_POLL_MS = 4 # how often the Tk thread picks up finished frames
+
+# Latency Hiding
+# Moves are resolved against the client's copy of the map as soon as a key is pressed,
+# and the next move starts from the predicted position; each frame's position from the
+# server corrects the prediction. While the view turns, the last frame is reprojected to
+# the new direction until its own frame arrives. Keys are sampled on every display tick
+# and step INPUT_RATE times per second, whether or not a renderer is free. 0 = off, one
+# step per rendered frame, each move starting from the server's position.
+LATENCY_HIDING = int(os.getenv('DOOMHOUSE_LATENCY_HIDING', '1'))
+
+# Dynamic Resolution
+# Lower the render resolution (DOOMHOUSE_RESOLUTION is the maximum) whenever frames take
+# longer than this, and raise it again when there is headroom. Frames are scaled up to
+# the window. 0 = off, always render at DOOMHOUSE_RESOLUTION.
+TARGET_FRAME_MS = float(os.getenv('DOOMHOUSE_TARGET_FRAME_MS', '0'))
+
+# Input Recording
+# The pose of every played frame is appended to this JSON lines file, for replay
+# by the benchmark suite (src/bench_suite.py). "" = off.
+RECORD_FILE = os.getenv('DOOMHOUSE_RECORD', '')
+
+# Movement Constants (MOVE_SPEED and ROT_SPEED per step: see camera_paths.py)
+INPUT_RATE = 20 # steps per second while a key is held, with latency hiding
 
 class DOOMHouse:
     def __init__(self):
         self.window_name = "DOOMHouse - ClickHouse SQL Game Engine"
-        
+
+        # Rendering engine: connect and deploy the scene before opening the window.
+        # The other lanes attach to the same scene and share the frame cache; only the first one traces.
+        self.renderer = Renderer()
+        self.lanes = [self.renderer]
+        try:
+            self.renderer.connect()
+            self.renderer.load_scene()
+            for _ in range(FRAMES_IN_FLIGHT - 1):
+                lane = Renderer(trace_file="")
+                lane.connect()
+                lane.load_scene(deploy=False)
+                lane.frame_cache = self.renderer.frame_cache
+                self.lanes.append(lane)
+        except Exception as e:
+            print(f"Error connecting to ClickHouse: {e}")
+            sys.exit(1)
+
         # Tkinter Setup
         self.root = tk.Tk()
         self.root.title(self.window_name)
-        self.root.geometry("640x540")
+        self.root.geometry(f"{FRAME_WIDTH}x{FRAME_HEIGHT + 80}")
         self.root.resizable(False, False)
         self.root.configure(bg="black")
         
@@ -83,66 +114,42 @@ class DOOMHouse:
         self.root.bind("<KeyRelease>", self._on_key_release)
         self.root.protocol("WM_DELETE_WINDOW", self._on_close)
 
-        # Connect to DB
-        try:
-            self.client = clickhouse_connect.get_client(
-                host=HOST, port=PORT, username=USER, password=PASS
-            )
-            # Second client for parallel queries
-            self.client2 = clickhouse_connect.get_client(
-                host=HOST, port=PORT, username=USER, password=PASS
-            )
-            self.client3 = clickhouse_connect.get_client(
-                host=HOST, port=PORT, username=USER, password=PASS
-            )
-            self.client4 = clickhouse_connect.get_client(
-                host=HOST, port=PORT, username=USER, password=PASS
+        self.sink = TkSink(self.label, (FRAME_WIDTH, FRAME_HEIGHT))
+
+        self.resolution_controller = None
+        if TARGET_FRAME_MS:
+            resolutions = [res for res in scaled_resolutions(self.renderer.resolution) if self.renderer.supports_resolution(*res)]
+            self.resolution_controller = ResolutionController(resolutions, TARGET_FRAME_MS)
+
+        # Theme selection
+        self.theme_names = self.renderer.theme_names
+        self.current_theme_idx = 0
+        self.current_theme = self.theme_names[self.current_theme_idx]
+
+        self.speculator = None
+        if SPECULATION_WORKERS and FRAME_CACHE_MB:
+            renderer = self.renderer
+            self.speculator = Speculator(
+                renderer._connect, renderer.fetch, renderer.frame_query, renderer.tiles, renderer.frame_cache,
+                FRAME_ENCODING, SPECULATION_WORKERS, SPECULATION_PRIORITY
             )
-            
-            # Get and print ClickHouse version
-            version = self.client.query("SELECT version()").result_rows[0][0]
-            print(f"Connected to ClickHouse version: {version}")
-            
-            # Version check
-            try:
-                v_parts = [int(p) for p in version.split('.')]
-                required_v = [26, 1, 1, 562]
-                is_supported = True
-                for i in range(min(len(v_parts), len(required_v))):
-                    if v_parts[i] < required_v[i]:
-                        is_supported = False
-                        break
-                    elif v_parts[i] > required_v[i]:
-                        break
-                
-                if not is_supported:
-                    print("\n" + "="*80)
-                    print("**OBS**: Due to an issue with some newer versions of ClickHouse this program only supports ClickHosue version `26.1.1.562` or later.")
-                    print("="*80 + "\n")
-            except Exception as ve:
-                print(f"Could not parse ClickHouse version for compatibility check: {ve}")
-            
-            self.client.command("CREATE DATABASE IF NOT EXISTS doomhouse")
-            self.cleanup_database()
-            self.initialize_game_data()
-            
-            # Theme selection
-            self.theme_names = list(TEXTURE_THEMES.keys())
-            self.current_theme_idx = 0
-            self.current_theme = self.theme_names[self.current_theme_idx]
-            
-            self.initialize_texture()
-            self.initialize_tables()
-        except Exception as e:
-            print(f"Error connecting to ClickHouse: {e}")
-            sys.exit(1)
 
-        # Frame tracking
-        self.frame_id = 0
+        self.recorder = PathRecorder(RECORD_FILE) if RECORD_FILE else None
+
+        # Frames come back to the Tk thread through poll_frames(), in the order they were requested
+        self.pipeline = FramePipeline(self.lanes, self._render_frame, self._show_frame)
+        self.shown_times = collections.deque(maxlen=30)
+
+        # Latency hiding: predicted moves, and the last frame from the renderers with its pose,
+        # copied out of the lane's frame buffer to be reprojected while the view turns
+        self.predictor = MovePredictor(self.renderer.game_map)
+        self.last_frame = None
+        self.last_pose = None
+        self.last_step = 0.0
+        self.reprojected = 0
 
         # Initial Player State
-        self.pos_x = 3.5
-        self.pos_y = 3.5
+        self.pos_x, self.pos_y = self.renderer.game_map.spawn
         self.dir_x = -1.0
         self.dir_y = 0.0
         self.plane_x = 0.0
@@ -152,12 +159,6 @@ class DOOMHouse:
         self.running = True
         self.in_splash = True
 
-        # Performance Tracking
-        self.total_insert_time = 0.0
-        self.insert_count = 0
-        self.total_select_time = 0.0
-        self.select_count = 0
-                
         # Show Splash Screen
         self.show_splash()
 
@@ -167,7 +168,7 @@ class DOOMHouse:
             try:
                 with Image.open(splash_path) as img:
                     img = img.convert("RGB")
-                    img = img.resize((640, 480), Image.LANCZOS)
+                    img = img.resize((FRAME_WIDTH, FRAME_HEIGHT), Image.LANCZOS)
                     
                     # Add text
                     draw = ImageDraw.Draw(img)
@@ -200,7 +201,7 @@ class DOOMHouse:
                         # Fallback for older Pillow
                         w, h = draw.textsize(text, font=font)
                     
-                    x = (640 - w) / 2
+                    x = (FRAME_WIDTH - w) / 2
                     y = 400
                     
                     # Draw shadow for visibility
@@ -232,257 +233,56 @@ class DOOMHouse:
         if key == 't':
             self.switch_theme()
 
+        # Render mode switching
+        if key == 'm':
+            self.switch_render_mode()
+
     def _on_key_release(self, event):
         key = event.keysym.lower()
         self.keys_pressed.discard(key)
 
     def _on_close(self):
         self.running = False
+        self.pipeline.shutdown()
+        if self.speculator:
+            self.speculator.shutdown()
+        if self.recorder:
+            self.recorder.close()
+            print(f"🎥 Inputs recorded to {self.recorder.path}")
+        for lane in self.lanes:
+            lane.close()
         self.root.destroy()
 
-    def load_texture(self, filename):
-        if not os.path.exists(filename):
-            print(f"⚠️ Warning: '{filename}' not found. Using fallback gray noise.")
-            fallback = [(100, 100, 100) for _ in range(TEXTURE_SIZE**2)]
-            return fallback
-
-        print(f"🎨 Loading '{filename}' for database initialization...")
-        try:
-            with Image.open(filename) as img:
-                img = img.convert("RGB")
-                img = img.resize((TEXTURE_SIZE, TEXTURE_SIZE), Image.NEAREST)
-                pixels = list(img.getdata())
-                return pixels
-        except Exception as e:
-            print(f"Error processing texture: {e}")
-            sys.exit(1)
-
-    def _setup_texture_resource(self, table_name, dict_name, texture_file):
-        """Helper to create table, dictionary and load texture data."""
-        try:
-            self.client.command(f"DROP TABLE IF EXISTS doomhouse.{table_name}")
-            self.client.command(f"""
-                CREATE TABLE doomhouse.{table_name} (
-                    id UInt32,
-                    r UInt8,
-                    g UInt8,
-                    b UInt8
-                ) ENGINE = MergeTree ORDER BY id
-            """)
-            
-            self.client.command(f"DROP DICTIONARY IF EXISTS doomhouse.{dict_name}")
-            self.client.command(f"""
-                CREATE DICTIONARY doomhouse.{dict_name} (
-                    id UInt32,
-                    r UInt8,
-                    g UInt8,
-                    b UInt8
-                )
-                PRIMARY KEY id
-                SOURCE(CLICKHOUSE(TABLE '{table_name}' DB 'doomhouse'))
-                LIFETIME(MIN 3600 MAX 3600)
-                LAYOUT(FLAT())
-            """)
-        except Exception as e:
-            print(f"Error creating texture table/dictionary {dict_name}: {e}")
-
-        texture_path = os.path.join("textures", texture_file)
-        tex_data = self.load_texture(texture_path)
-        
-        print(f"💾 Initializing doomhouse.{table_name} table with {len(tex_data)} pixels...")
-        try:
-            self.client.command(f"TRUNCATE TABLE doomhouse.{table_name}")
-            data = [
-                [
-                    i + 1,
-                    max(0, min(255, int(r * TEXTURE_INTENSITY))),
-                    max(0, min(255, int(g * TEXTURE_INTENSITY))),
-                    max(0, min(255, int(b * TEXTURE_INTENSITY)))
-                ]
-                for i, (r, g, b) in enumerate(tex_data)
-            ]
-            self.client.insert(f'doomhouse.{table_name}', data)
-            
-            print(f"🔄 Reloading dictionary doomhouse.{dict_name}...")
-            self.client.command(f"SYSTEM RELOAD DICTIONARY doomhouse.{dict_name}")
-        except Exception as e:
-            print(f"Error initializing texture {dict_name}: {e}")
-
     def switch_theme(self):
+        # Every theme is already in the texture atlas, the theme index is just part of the next input
         self.current_theme_idx = (self.current_theme_idx + 1) % len(self.theme_names)
         self.current_theme = self.theme_names[self.current_theme_idx]
         print(f"🎭 Switching to theme: {self.current_theme}")
-        self.initialize_texture()
-        # We don't necessarily need to re-initialize tables, but we might need to reload the view
-        # if we change how it references dictionaries. For now, let's just reload textures.
-        # Actually, if we use the same dictionary names, we just need to reload them.
         self.push_input(self.pos_x, self.pos_y) # Force a re-render
 
-    def initialize_texture(self):
-        theme = TEXTURE_THEMES[self.current_theme]
-        print(f"🌟 Initializing textures for theme: {self.current_theme}")
-        
-        # Initialize Wall Textures
-        self._setup_texture_resource("tex_wall1_source", "dict_tex_wall1_data", theme["wall1"])
-        self._setup_texture_resource("tex_wall2_source", "dict_tex_wall2_data", theme["wall2"])
-        
-        # Initialize Floor Texture
-        self._setup_texture_resource("tex_floor_source", "dict_tex_floor_data", theme["floor"])
-        
-        # Initialize Ceiling Texture
-        self._setup_texture_resource("tex_ceiling_source", "dict_tex_ceiling_data", theme["ceiling"])
-
-    def cleanup_database(self):
-        print("🧹 Cleaning up existing database objects to avoid dependency errors...")
-        try:
-            # 1. Drop Materialized Views first
-            self.client.command("DROP VIEW IF EXISTS doomhouse.render_materialized")
-            self.client.command("DROP VIEW IF EXISTS doomhouse.post_process_materialized")
-            self.client.command("DROP VIEW IF EXISTS doomhouse.render_materialized_top")
-            self.client.command("DROP VIEW IF EXISTS doomhouse.render_materialized_bottom")
-            self.client.command("DROP VIEW IF EXISTS doomhouse.post_process_materialized_top")
-            self.client.command("DROP VIEW IF EXISTS doomhouse.post_process_materialized_bottom")
-            for i in range(1, 5):
-                self.client.command(f"DROP VIEW IF EXISTS doomhouse.render_materialized_{i}")
-                self.client.command(f"DROP VIEW IF EXISTS doomhouse.post_process_materialized_{i}")
-            
-            # 2. Drop Dictionaries
-            dicts = [
-                "dict_map_data", "dict_floor_dist", "dict_tex_data", "dict_tex_wall_data",
-                "dict_tex_wall1_data", "dict_tex_wall2_data", "dict_tex_floor_data", "dict_tex_ceiling_data"
-            ]
-            for d in dicts:
-                self.client.command(f"DROP DICTIONARY IF EXISTS doomhouse.{d}")
-                
-            # 3. Drop Tables
-            tables = [
-                "map_source", "floor_dist_source", "tex_source", "tex_wall_source",
-                "tex_wall1_source", "tex_wall2_source", "tex_floor_source", "tex_ceiling_source",
-                "player_input", "rendered_frame", "rendered_frame_post_processed",
-                "rendered_frame_top", "rendered_frame_bottom",
-                "rendered_frame_post_processed_top", "rendered_frame_post_processed_bottom"
-            ]
-            for t in tables:
-                self.client.command(f"DROP TABLE IF EXISTS doomhouse.{t}")
-            for i in range(1, 5):
-                self.client.command(f"DROP TABLE IF EXISTS doomhouse.rendered_frame_{i}")
-                self.client.command(f"DROP TABLE IF EXISTS doomhouse.rendered_frame_post_processed_{i}")
-        except Exception as e:
-            print(f"Note: Cleanup encountered an issue: {e}")
+    def switch_render_mode(self):
+        idx = RENDER_MODES.index(self.renderer.render_mode)
+        render_mode = RENDER_MODES[(idx + 1) % len(RENDER_MODES)]
+        print(f"🔀 Switching to render mode: {render_mode}")
+        for lane in self.lanes:
+            lane.render_mode = render_mode
+            # Timings of the two modes are not comparable, start over
+            lane.reset_stats()
+        self.push_input(self.pos_x, self.pos_y) # Force a re-render
 
-    def execute_sql_script(self, script_path):
-        """Helper to execute a SQL script that may contain multiple statements."""
-        if not os.path.exists(script_path):
-            print(f"⚠️ Warning: SQL script '{script_path}' not found.")
-            return
-        
-        with open(script_path, 'r') as f:
-            content = f.read()
-            
-        # Split by semicolon
-        statements = content.split(';')
-        for stmt in statements:
-            # Remove comments
-            lines = stmt.split('\n')
-            clean_lines = []
-            in_block_comment = False
-            for line in lines:
-                if in_block_comment:
-                    if '*/' in line:
-                        in_block_comment = False
-                        line = line.split('*/', 1)[1]
-                    else:
-                        continue
-                
-                if not in_block_comment:
-                    if '/*' in line:
-                        if '*/' in line:
-                            import re
-                            line = re.sub(r'/\*.*?\*/', '', line)
-                        else:
-                            in_block_comment = True
-                            line = line.split('/*', 1)[0]
-                    
-                    if '--' in line:
-                        line = line.split('--', 1)[0]
-                    
-                    if line.strip():
-                        clean_lines.append(line)
-            
-            stmt = '\n'.join(clean_lines).strip()
-            if not stmt:
-                continue
-            
-            # Try to extract name for dropping
-            name = None
-            upper_stmt = stmt.upper()
-            if "CREATE TABLE" in upper_stmt:
-                parts = stmt.split()
-                for i, p in enumerate(parts):
-                    if p.upper() == "TABLE":
-                        name = parts[i+1]
-                        break
-            elif "CREATE DICTIONARY" in upper_stmt:
-                parts = stmt.split()
-                for i, p in enumerate(parts):
-                    if p.upper() == "DICTIONARY":
-                        name = parts[i+1]
-                        break
-            elif "CREATE MATERIALIZED VIEW" in upper_stmt:
-                parts = stmt.split()
-                for i, p in enumerate(parts):
-                    if p.upper() == "VIEW":
-                        name = parts[i+1]
-                        break
-            
-            if name:
-                name = name.split('(')[0].strip()
-                if "DICTIONARY" in upper_stmt:
-                    self.client.command(f"DROP DICTIONARY IF EXISTS {name}")
-                elif "VIEW" in upper_stmt:
-                    self.client.command(f"DROP VIEW IF EXISTS {name}")
-                else:
-                    self.client.command(f"DROP TABLE IF EXISTS {name}")
-            
-            print(f"💾 Executing statement from {script_path}...")
-            try:
-                self.client.command(stmt)
-            except Exception as e:
-                print(f"Error executing statement: {e}")
-
-    def initialize_game_data(self):
-        print("🎮 Initializing game data (map, floor distances)...")
-        self.execute_sql_script("src/SQL/create_source_tables.sql")
-        self.execute_sql_script("src/SQL/create_dictionaries.sql")
-
-    def initialize_tables(self):
-        # Re-create tables to ensure schema matches
-        sql_files = [
-            "src/SQL/player_input_table.sql",
-            "src/SQL/rendered_frame_table.sql",
-            "src/SQL/rendered_frame_post_processed_table.sql",
-            "src/SQL/render_view.sql",
-            "src/SQL/post_process_view.sql",
-        ]
-        
-        for sql_file in sql_files:
-            self.execute_sql_script(sql_file)
+    def rotated(self, angle):
+        """Direction and camera plane after rotating the current view by `angle`."""
+        dir_x = self.dir_x * math.cos(angle) - self.dir_y * math.sin(angle)
+        dir_y = self.dir_x * math.sin(angle) + self.dir_y * math.cos(angle)
+        plane_x = self.plane_x * math.cos(angle) - self.plane_y * math.sin(angle)
+        plane_y = self.plane_x * math.sin(angle) + self.plane_y * math.cos(angle)
+        return dir_x, dir_y, plane_x, plane_y
 
     def turn_right_logic(self):
-        old_dir_x = self.dir_x
-        self.dir_x = self.dir_x * math.cos(-ROT_SPEED) - self.dir_y * math.sin(-ROT_SPEED)
-        self.dir_y = old_dir_x * math.sin(-ROT_SPEED) + self.dir_y * math.cos(-ROT_SPEED)
-        old_plane_x = self.plane_x
-        self.plane_x = self.plane_x * math.cos(-ROT_SPEED) - self.plane_y * math.sin(-ROT_SPEED)
-        self.plane_y = old_plane_x * math.sin(-ROT_SPEED) + self.plane_y * math.cos(-ROT_SPEED)
+        self.dir_x, self.dir_y, self.plane_x, self.plane_y = self.rotated(-ROT_SPEED)
 
     def turn_left_logic(self):
-        old_dir_x = self.dir_x
-        self.dir_x = self.dir_x * math.cos(ROT_SPEED) - self.dir_y * math.sin(ROT_SPEED)
-        self.dir_y = old_dir_x * math.sin(ROT_SPEED) + self.dir_y * math.cos(ROT_SPEED)
-        old_plane_x = self.plane_x
-        self.plane_x = self.plane_x * math.cos(ROT_SPEED) - self.plane_y * math.sin(ROT_SPEED)
-        self.plane_y = old_plane_x * math.sin(ROT_SPEED) + self.plane_y * math.cos(ROT_SPEED)
+        self.dir_x, self.dir_y, self.plane_x, self.plane_y = self.rotated(ROT_SPEED)
 
     def process_input(self):
         moved = False
@@ -495,44 +295,133 @@ class DOOMHouse:
             self.turn_right_logic()
             moved = True
             
-        # Movement
+        # Movement. Without latency hiding a move is held back until the server has resolved
+        # the previous one, and only goes out from the position the server returned for it
         tx, ty = self.pos_x, self.pos_y
-        if 'up' in self.keys_pressed or 'w' in self.keys_pressed:
-            tx += self.dir_x * MOVE_SPEED
-            ty += self.dir_y * MOVE_SPEED
-            moved = True
-        if 'down' in self.keys_pressed or 's' in self.keys_pressed:
-            tx -= self.dir_x * MOVE_SPEED
-            ty -= self.dir_y * MOVE_SPEED
-            moved = True
+        if LATENCY_HIDING or not any(self._moves(pose) for pose in self.pipeline.queued_poses()):
+            if 'up' in self.keys_pressed or 'w' in self.keys_pressed:
+                tx += self.dir_x * MOVE_SPEED
+                ty += self.dir_y * MOVE_SPEED
+                moved = True
+            if 'down' in self.keys_pressed or 's' in self.keys_pressed:
+                tx -= self.dir_x * MOVE_SPEED
+                ty -= self.dir_y * MOVE_SPEED
+                moved = True
             
         if moved:
             self.push_input(tx, ty)
 
+    def pose(self, target_x, target_y):
+        """The player input of a frame, as bound to the single-query render mode."""
+        res_w, res_h = self.renderer.resolution
+        return {
+            "old_x": self.pos_x, "old_y": self.pos_y, "try_x": target_x, "try_y": target_y,
+            "dir_x": self.dir_x, "dir_y": self.dir_y, "plane_x": self.plane_x, "plane_y": self.plane_y,
+            "theme": self.current_theme_idx, "res_w": res_w, "res_h": res_h,
+        }
+
+    def next_poses(self):
+        """Cache keys and poses reachable with one more key press (rotate or step)."""
+        poses = []
+        for angle in (ROT_SPEED, -ROT_SPEED):
+            dir_x, dir_y, plane_x, plane_y = self.rotated(angle)
+            pose = self.pose(self.pos_x, self.pos_y)
+            pose.update(dir_x=dir_x, dir_y=dir_y, plane_x=plane_x, plane_y=plane_y)
+            poses.append(pose)
+        for step in (MOVE_SPEED, -MOVE_SPEED):
+            poses.append(self.pose(self.pos_x + self.dir_x * step, self.pos_y + self.dir_y * step))
+        return [(FrameCache.key(pose), pose) for pose in poses]
+
+    def speculate(self):
+        if self.speculator and not self.in_splash:
+            # The speculator renders on the server, the local render mode must not touch it
+            self.speculator.speculate([] if self.renderer.render_mode == "local" else self.next_poses())
+
     def push_input(self, target_x, target_y):
-        try:
-            start_time = time.time()
-            self.frame_id += 1
-            self.client.command(f"""
-                INSERT INTO doomhouse.player_input
-                (frame_id, old_x, old_y, try_x, try_y, dir_x, dir_y, plane_x, plane_y)
-                VALUES ({self.frame_id}, {self.pos_x}, {self.pos_y}, {target_x}, {target_y},
-                        {self.dir_x}, {self.dir_y}, {self.plane_x}, {self.plane_y})
-            """)            
-            self.insert_time = (time.time() - start_time) * 1000 # in ms
-            self.total_insert_time += self.insert_time
-            self.insert_count += 1
-            self.avg_insert_time = self.total_insert_time / self.insert_count
-            print(f"Insert: {self.insert_time:.2f}ms (Avg: {self.avg_insert_time:.2f}ms)")
-
-            self.render()
-        except Exception as e:
-            print(f"Input Error: {e}")
+        """Queue a frame of the current view moving to the target, replacing any frame not started yet."""
+        pose = self.pose(target_x, target_y)
+        if self.recorder:
+            self.recorder.record(pose)
+        self.pipeline.submit(pose)
+        if LATENCY_HIDING:
+            # Show the move now: the next move starts from here, and a turn reprojects the last frame
+            self.pos_x, self.pos_y = self.predictor.predict(pose)
+            if self.last_frame and not self._faces(self.last_pose):
+                self.sink.write(self.reprojected_frame(self.last_frame, self.last_pose))
+
+    @staticmethod
+    def _moves(pose):
+        return (pose["try_x"], pose["try_y"]) != (pose["old_x"], pose["old_y"])
+
+    def _faces(self, pose):
+        """Whether `pose` looks in the current view direction."""
+        return (pose["dir_x"], pose["dir_y"], pose["plane_x"], pose["plane_y"]) == (self.dir_x, self.dir_y, self.plane_x, self.plane_y)
+
+    def reprojected_frame(self, frame, pose):
+        """`frame` of `pose` turned to the current view direction, or `frame` if the views do not overlap."""
+        framebuffer = reproject(frame.framebuffer, pose, self.pose(self.pos_x, self.pos_y))
+        if framebuffer is None:
+            return frame
+        self.reprojected += 1
+        return frame._replace(framebuffer=framebuffer)
+
+    def keep_frame(self, frame, pose):
+        """Copy a frame out of its lane's frame buffer, which the lane's next render overwrites."""
+        source = frame.framebuffer
+        framebuffer = self.last_frame.framebuffer if self.last_frame else None
+        if framebuffer is None or (framebuffer.width, framebuffer.height) != (source.width, source.height):
+            framebuffer = FrameBuffer(source.width, source.height)
+        framebuffer.buffer[:] = source.buffer
+        self.last_frame = Frame(frame.pos_x, frame.pos_y, framebuffer, frame.cached)
+        self.last_pose = pose
+
+    def _render_frame(self, lane, pose):
+        """Render a pose on one lane. Runs on a pipeline worker, never on the Tk thread."""
+        if self.speculator:
+            self.speculator.wait(FrameCache.key(pose), SPECULATION_WAIT)
+        return lane.render(pose)
+
+    def _show_frame(self, lane, pose, frame):
+        """Show a finished frame of `lane`. Runs on the Tk thread, before the lane renders again."""
+        if frame is None or not self.running:
+            return
+        if frame.cached and self.speculator:
+            self.speculator.consume(FrameCache.key(pose))
+
+        if LATENCY_HIDING:
+            # The player is already at the predicted position, the server's only corrects it
+            dx, dy = self.predictor.reconcile(pose, frame.pos_x, frame.pos_y)
+            self.pos_x, self.pos_y = self.pos_x + dx, self.pos_y + dy
+            self.keep_frame(frame, pose)
+            if not self._faces(pose):
+                # The view turned further while this frame was in flight
+                frame = self.reprojected_frame(self.last_frame, pose)
+        elif self._moves(pose):
+            # Set new position (synced from DB). Frames that did not move keep any newer move's position.
+            self.pos_x, self.pos_y = frame.pos_x, frame.pos_y
+        self.display_frame(frame, lane)
+        if self.resolution_controller and not frame.cached:
+            self.adapt_resolution(lane)
+
+    def adapt_resolution(self, lane):
+        """Let the controller pick the resolution of the next frames from this frame's render time."""
+        resolution = self.resolution_controller.update(lane.insert_time + lane.select_time)
+        if resolution:
+            print(f"📐 Render resolution {resolution[0]}x{resolution[1]} (target frame time {TARGET_FRAME_MS:.0f}ms)")
+            self.renderer.set_resolution(*resolution)
 
     def run(self):
         self.update_loop()
+        self.poll_frames()
         self.root.mainloop()
 
+    def poll_frames(self):
+        """Show the frames the render workers finished, on the Tk thread."""
+        if not self.running:
+            return
+        self.pipeline.poll()
+        self.root.after(FRAME_POLL_MS, self.poll_frames)
+
     def update_loop(self):
         if not self.running:
             return
@@ -541,86 +430,48 @@ class DOOMHouse:
             if 'escape' in self.keys_pressed:
                 self._on_close()
                 return
-            self.process_input()
+            if LATENCY_HIDING:
+                # Step at a fixed rate, a pose still waiting for a renderer is replaced by the newest one
+                now = time.time()
+                if now - self.last_step >= 1.0 / INPUT_RATE:
+                    self.last_step = now
+                    self.process_input()
+            elif self.pipeline.ready():
+                # Sample the keys only when a frame can start, so the newest input is what gets rendered
+                self.process_input()
             
         self.root.after(16, self.update_loop) # ~60 FPS target for input check
 
-    def render(self):
-        try:
-            start_time = time.time()
-            
-            # Parallel Query Execution
-            # We launch four concurrent queries to fetch the quarters of the frame.
-            with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
-                future1 = executor.submit(
-                    self.client.query,
-                    "SELECT pos_x, pos_y, image_data FROM doomhouse.rendered_frame_post_processed_1"
-                )
-                future2 = executor.submit(
-                    self.client2.query,
-                    "SELECT pos_x, pos_y, image_data FROM doomhouse.rendered_frame_post_processed_2"
-                )
-                future3 = executor.submit(
-                    self.client3.query,
-                    "SELECT pos_x, pos_y, image_data FROM doomhouse.rendered_frame_post_processed_3"
-                )
-                future4 = executor.submit(
-                    self.client4.query,
-                    "SELECT pos_x, pos_y, image_data FROM doomhouse.rendered_frame_post_processed_4"
-                )
-                
-                result1 = future1.result()
-                result2 = future2.result()
-                result3 = future3.result()
-                result4 = future4.result()
-
-            if not result1.result_rows or not result2.result_rows or not result3.result_rows or not result4.result_rows:
-                return
-
-            # Calculate render time
-            select_time = (time.time() - start_time) * 1000 # in ms
-            self.total_select_time += select_time
-            self.select_count += 1
-            avg_select_time = self.total_select_time / self.select_count
-            print(f"Select (Parallel 4-way): {select_time:.2f}ms (Avg: {avg_select_time:.2f}ms)")
-
-            # Set new position (synced from DB - using first result)
-            self.pos_x = result1.result_rows[0][0]
-            self.pos_y = result1.result_rows[0][1]
-            
-            # Compositing Step: Stitch the four partial image buffers
-            pixel_data = (
-                result1.result_rows[0][2] + 
-                result2.result_rows[0][2] + 
-                result3.result_rows[0][2] + 
-                result4.result_rows[0][2]
-            )
-            
-            # Convert list of UInt32 to bytes efficiently.
-            # Each UInt32 is [R, G, B, 0] in little-endian memory.
-            raw_bytes = array.array('I', pixel_data).tobytes()
-            
-            # Create image from raw bytes (640x480)
-            image = Image.frombytes("RGB", (640, 480), raw_bytes, "raw", "RGBX")
-
-            # Convert PIL to ImageTk
-            self.photo = ImageTk.PhotoImage(image)
-            self.label.config(image=self.photo)
-            
-            # Update status text (Multi-line)
-            fps = 1000/(self.insert_time + select_time)
-            avgfps = 1000/(self.avg_insert_time + avg_select_time)
-            line1 = f"{fps:2.1f}fps (avg: {avgfps:2.1f}fps) | Insert: {self.insert_time:3.2f}ms (avg: {self.avg_insert_time:3.2f}ms) | Select: {select_time:3.2f}ms (avg: {avg_select_time:3.2f}ms)"
-            line2 = f"Pos: ({self.pos_x:5.2f}, {self.pos_y:5.2f}) | Theme: {self.current_theme.upper()} (Press 'T' to switch theme)"
-
-            self.status_label.config(text=f"{line1}\n{line2}")
-            
-            self.root.update_idletasks()
+    def display_frame(self, frame, lane):
+        self.sink.write(frame)
+        self.shown_times.append(time.time())
+
+        # Update status text (Multi-line)
+        frame_time = lane.insert_time + lane.select_time
+        avg_frame_time = lane.avg_insert_time + lane.avg_select_time
+        fps = 1000/frame_time if frame_time else 0.0
+        avgfps = 1000/avg_frame_time if avg_frame_time else 0.0
+        shown = self.shown_times
+        shown_fps = (len(shown) - 1) / (shown[-1] - shown[0]) if len(shown) > 1 and shown[-1] > shown[0] else 0.0
+        line1 = f"{fps:2.1f}fps (avg: {avgfps:2.1f}fps, shown: {shown_fps:2.1f}fps) | Insert: {lane.insert_time:3.2f}ms (avg: {lane.avg_insert_time:3.2f}ms) | Select: {lane.select_time:3.2f}ms (avg: {lane.avg_select_time:3.2f}ms)"
+        image = frame.framebuffer
+        line2 = f"Pos: ({self.pos_x:5.2f}, {self.pos_y:5.2f}) | Res: {image.width}x{image.height} {FRAME_ENCODING.upper()} {lane.frame_bytes / 1024:.0f}KB | Theme: {self.current_theme.upper()} | Mode: {lane.render_mode.upper()} ('T' theme, 'M' mode)"
+        cache = self.renderer.frame_cache
+        pipeline = self.pipeline
+        line3 = f"In flight: {pipeline.in_flight()}/{len(self.lanes)}, {pipeline.coalesced} coalesced | Cache: {cache.hits} hits / {cache.misses} misses ({cache.hit_rate():.0%}) | {len(cache)} frames, {cache.size_bytes / 2**20:.0f}/{cache.budget_bytes / 2**20:.0f}MB"
+        if self.speculator:
+            spec = self.speculator
+            line3 += f" | Spec: {spec.hits}/{spec.completed} used ({spec.hit_rate():.0%}), {spec.wasted_time():.1f}s wasted"
+        if LATENCY_HIDING:
+            predictor = self.predictor
+            line3 += f" | Predicted: {predictor.predicted} moves, {predictor.mispredicted} corrected | Reprojected: {self.reprojected}"
+
+        self.status_label.config(text=f"{line1}\n{line2}\n{line3}")
+        
+        self.root.update_idletasks()
 
-            self.pos_x = result1.result_rows[0][0]
-            self.pos_y = result1.result_rows[0][1]
-        except Exception as e:
-            print(f"Render Error: {e}")
+        # Get the next likely frames going while the player looks at this one
+        self.speculate()
 
 def main():
     app = DOOMHouse()
@@ -1,8 +1,9 @@
-CREATE DICTIONARY doomhouse.dict_map_data (id UInt32, val UInt8)
+-- Maps have up to 1024 x 1024 cells, more than the default FLAT array size
+CREATE DICTIONARY doomhouse.dict_map_data (id UInt32, val UInt8, dist UInt8)
 PRIMARY KEY id
 SOURCE(CLICKHOUSE(TABLE 'map_source' DB 'doomhouse'))
 LIFETIME(MIN 3600 MAX 3600)
-LAYOUT(FLAT());
+LAYOUT(FLAT(INITIAL_ARRAY_SIZE 1024 MAX_ARRAY_SIZE 1048577));
 
 CREATE DICTIONARY doomhouse.dict_floor_dist (id UInt32, dist Float32)
 PRIMARY KEY id
@@ -10,4 +11,4 @@ SOURCE(CLICKHOUSE(TABLE 'floor_dist_source' DB 'doomhouse'))
 LIFETIME(MIN 3600 MAX 3600)
 LAYOUT(FLAT());
 
--- Texture dictionaries are created and managed by the Python client in DOOMHouse.py
\ No newline at end of file
+-- The texture atlas dictionary (dict_tex_atlas) is created by Renderer.texture_atlas_objects() in renderer.py
\ No newline at end of file
@@ -1,48 +1,25 @@
 CREATE DATABASE IF NOT EXISTS doomhouse;
 
--- 1. Map Data Source
+-- 1. Map Data Source (populated by Python client from a map file, see game_map.py)
+-- val: 0 = empty, otherwise wall type. dist: Chebyshev distance to the nearest wall.
 CREATE TABLE doomhouse.map_source (
     id UInt32, 
-    val UInt8
+    val UInt8,
+    dist UInt8
 ) ENGINE = MergeTree ORDER BY id;
 
-INSERT INTO doomhouse.map_source
-WITH [
-    1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,
-    1,0,0,0,0,0,0,1,0,0,0,0,0,0,1,
-    1,0,0,1,0,0,2,1,0,0,1,0,0,2,1,
-    1,0,0,0,0,0,0,1,0,0,0,0,0,0,1,
-    1,0,2,0,0,0,0,0,0,2,0,0,0,0,1,
-    1,0,0,1,0,0,0,1,0,0,1,0,0,0,1,
-    1,0,0,0,0,0,0,1,0,0,0,0,0,0,1,
-    1,1,1,0,1,1,1,1,1,1,0,1,1,1,1,
-    1,0,0,0,0,0,0,1,0,0,0,0,0,0,1,
-    1,0,0,1,0,0,2,1,0,0,1,0,0,2,1,
-    1,0,0,0,0,0,0,1,0,0,0,0,0,0,1,
-    1,0,2,0,0,0,0,0,0,2,0,0,0,0,1,
-    1,0,0,1,0,0,0,1,0,0,1,0,0,0,1,
-    1,0,0,0,0,0,0,1,0,0,0,0,0,0,1,
-    1,1,1,1,1,1,1,1,1,1,1,1,1,1,1
-] AS map_data
-SELECT 
-    idx AS id, 
-    map_data[idx] AS val 
-FROM (SELECT arrayJoin(arrayEnumerate(map_data)) AS idx);
-
 -- 2. Floor Distance Source
 CREATE TABLE doomhouse.floor_dist_source (
     id UInt32, 
     dist Float32
 ) ENGINE = MergeTree ORDER BY id;
 
+-- One row per screen row of every render height h up to 480, with id h * 512 + row + 1
 INSERT INTO doomhouse.floor_dist_source
 SELECT 
-    number + 1 as id, 
-    if(number <= 240, 0.0, 480.0 / (2.0 * number - 480.0)) as dist
-FROM numbers(480);
+    toUInt32(h * 512 + row + 1) as id, 
+    if(row <= intDiv(h, 2), 0.0, h / (2.0 * row - h)) as dist
+FROM (SELECT number + 1 AS h, arrayJoin(range(h)) AS row FROM numbers(480));
 
--- 3. Texture Data Sources (Placeholder tables, populated by Python client)
-CREATE TABLE IF NOT EXISTS doomhouse.tex_wall1_source (id UInt32, r UInt8, g UInt8, b UInt8) ENGINE = MergeTree ORDER BY id;
-CREATE TABLE IF NOT EXISTS doomhouse.tex_wall2_source (id UInt32, r UInt8, g UInt8, b UInt8) ENGINE = MergeTree ORDER BY id;
-CREATE TABLE IF NOT EXISTS doomhouse.tex_floor_source (id UInt32, r UInt8, g UInt8, b UInt8) ENGINE = MergeTree ORDER BY id;
-CREATE TABLE IF NOT EXISTS doomhouse.tex_ceiling_source (id UInt32, r UInt8, g UInt8, b UInt8) ENGINE = MergeTree ORDER BY id;
\ No newline at end of file
+-- 3. Texture Atlas (tex_atlas_source, created by Renderer.texture_atlas_objects() in renderer.py and
+--    filled by Renderer.upload_textures() with the texels prepared by texture_store.py)
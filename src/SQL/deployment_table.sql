@@ -0,0 +1,11 @@
+-- Content hash of every deployed table, dictionary and view (see `deployment.py`), appended when
+-- the object is deployed. The latest row of a name wins, and an empty hash marks a dropped object.
+CREATE TABLE IF NOT EXISTS doomhouse.deployment
+(
+    name String,
+    kind String,
+    content_hash String,
+    deployed_at DateTime64(3) DEFAULT now64(3)
+)
+ENGINE = MergeTree
+ORDER BY (name, deployed_at);
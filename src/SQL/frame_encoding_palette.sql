@@ -0,0 +1,20 @@
+/*
+   FRAME ENCODING: PER-TILE PALETTE (Fragment of `post_process_view.sql`)
+   One byte per pixel, indexing a palette of up to 256 colors picked for every tile 
+   of every frame. The colors are quantized by dropping the fewest low bits per 
+   channel (0 to 6) that leave at most 256 distinct colors, so flat ceiling and 
+   floor areas usually keep their exact colors. Lossy when a tile has more colors.
+
+   Layout: the palette size minus one (1 byte), the palette as RGB24, then the 
+   palette index of every pixel. Palette entries are in order of first use, the 
+   same order `arrayEnumerateDense` numbers them in.
+*/
+arrayMap(bits -> bitAnd(0xFF, bitNot(toUInt32(bitShiftLeft(1, bits) - 1))) * 0x010101, range(7)) AS palette_masks,
+arrayFirst(mask -> length(arrayDistinct(arrayMap(c -> bitAnd(c, mask), pixels))) <= 256, palette_masks) AS palette_mask,
+arrayMap(c -> bitAnd(c, palette_mask), pixels) AS quantized,
+arrayDistinct(quantized) AS palette,
+concat(
+    char(length(palette) - 1),
+    arrayStringConcat(arrayMap(c -> char(bitAnd(c, 0xFF), bitAnd(bitShiftRight(c, 8), 0xFF), bitShiftRight(c, 16)), palette)),
+    arrayStringConcat(arrayMap(i -> char(i - 1), arrayEnumerateDense(quantized)))
+) AS encoded
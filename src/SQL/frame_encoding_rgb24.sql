@@ -0,0 +1,6 @@
+/*
+   FRAME ENCODING: PACKED RGB24 (Fragment of `post_process_view.sql`)
+   Three bytes (r, g, b) per pixel of the post-processed 0xBBGGRR colors, so the client 
+   can copy the tile straight into its frame buffer. Lossless.
+*/
+arrayStringConcat(arrayMap(c -> char(bitAnd(c, 0xFF), bitAnd(bitShiftRight(c, 8), 0xFF), bitAnd(bitShiftRight(c, 16), 0xFF)), pixels)) AS encoded
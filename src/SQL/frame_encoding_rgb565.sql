@@ -0,0 +1,7 @@
+/*
+   FRAME ENCODING: RGB565 (Fragment of `post_process_view.sql`)
+   Two bytes per pixel: a little-endian UInt16 holding 5 bits of red, 6 of green 
+   and 5 of blue (the top bits of every channel). Lossy, a third smaller than RGB24.
+*/
+arrayMap(c -> bitOr(bitOr(bitShiftLeft(bitShiftRight(bitAnd(c, 0xFF), 3), 11), bitShiftLeft(bitShiftRight(bitAnd(bitShiftRight(c, 8), 0xFF), 2), 5)), bitShiftRight(c, 19)), pixels) AS rgb565,
+arrayStringConcat(arrayMap(v -> char(bitAnd(v, 0xFF), bitShiftRight(v, 8)), rgb565)) AS encoded
@@ -1,5 +1,6 @@
 CREATE TABLE doomhouse.player_input
 (
+    session_id String DEFAULT '',
     frame_id UInt64,
     old_x Float64,
     old_y Float64,
@@ -9,6 +10,9 @@ CREATE TABLE doomhouse.player_input
     dir_y Float64,
     plane_x Float64,
     plane_y Float64,
+    theme UInt8 DEFAULT 0,
+    res_w UInt16 DEFAULT 640,
+    res_h UInt16 DEFAULT 480,
     timestamp DateTime DEFAULT now()
 )
 ENGINE = Memory 
@@ -0,0 +1,17 @@
+/*
+   POST-PROCESS PASS: BLUR (Fragment of `post_process_view.sql`)
+   5-tap blur, 4/8 of the pixel plus 1/8 of each of its four neighbours, done 
+   with SWAR arithmetic: red and blue are summed side by side in the 0x00FF00FF 
+   lanes of one UInt32 and green in the 0x0000FF00 lane, so a pixel needs two 
+   sums instead of three. The left and right neighbours are shifted copies of 
+   the row-major pixels, masked to zero at the first and last column so rows do 
+   not bleed into each other. Needs one halo row and column around the tile.
+   `${src}` are the input pixels and `${dst}` the output.
+*/
+arrayMap((c, l, r, u, d) -> bitOr(bitAnd(bitShiftRight((bitAnd(c, 0x00FF00FF) * 4) + bitAnd(l, 0x00FF00FF) + bitAnd(r, 0x00FF00FF) + bitAnd(u, 0x00FF00FF) + bitAnd(d, 0x00FF00FF), 3), 0x00FF00FF), bitAnd(bitShiftRight((bitAnd(c, 0x0000FF00) * 4) + bitAnd(l, 0x0000FF00) + bitAnd(r, 0x0000FF00) + bitAnd(u, 0x0000FF00) + bitAnd(d, 0x0000FF00), 3), 0x0000FF00)),
+    ${src},
+    arrayMap((v, m) -> bitAnd(v, m), arraySlice(arrayConcat([0], ${src}), 1, len), not_first_col),
+    arrayMap((v, m) -> bitAnd(v, m), arrayResize(arraySlice(${src}, 2), len, 0), not_last_col),
+    arraySlice(arrayConcat(arrayWithConstant(w, 0), ${src}), 1, len),
+    arrayResize(arraySlice(${src}, w + 1), len, 0)
+) AS ${dst}
@@ -0,0 +1,7 @@
+/*
+   HALO CROP (Fragment of `post_process_view.sql`)
+   Drops the halo rows and columns around the tile once every pass has run, 
+   keeping the pixels of the tile rectangle in row-major order.
+   `${src}` are the processed pixels of the halo rectangle.
+*/
+arrayFilter((c, i) -> (i % w) >= tile_x0 - halo_x0 AND (i % w) < tile_x1 - halo_x0 AND intDiv(i, w) >= tile_y0 - halo_y0 AND intDiv(i, w) < tile_y1 - halo_y0, ${src}, range(len)) AS pixels
@@ -0,0 +1,7 @@
+/*
+   HALO CROP, FULL-WIDTH TILES (Fragment of `post_process_view.sql`)
+   A tile spanning the whole frame width has no halo columns, so the halo rows 
+   are cut off with a single slice of the row-major pixels.
+   `${src}` are the processed pixels of the halo rectangle.
+*/
+arraySlice(${src}, (tile_y0 - halo_y0) * w + 1, (tile_y1 - tile_y0) * w) AS pixels
@@ -0,0 +1,12 @@
+/*
+   POST-PROCESS PASS: FOG (Fragment of `post_process_view.sql`)
+   Screen-space haze: every pixel is blended towards gray (0x60 per channel) by a 
+   weight that is 128/256 on the horizon and falls off linearly to 0 at the top and 
+   bottom rows, where floor and ceiling are closest. The blend uses the same SWAR 
+   lanes as the blur. Per pixel only, so it needs no halo.
+   `${src}` are the input pixels and `${dst}` the output.
+*/
+arrayMap((c, a) -> bitOr(bitAnd(bitShiftRight(bitAnd(c, 0x00FF00FF) * (256 - a) + 0x00600060 * a, 8), 0x00FF00FF), bitAnd(bitShiftRight(bitAnd(c, 0x0000FF00) * (256 - a) + 0x00006000 * a, 8), 0x0000FF00)),
+    ${src},
+    arrayMap(y -> intDiv(128 * (res_h - abs(2 * y + 1 - res_h)), res_h), pixel_row)
+) AS ${dst}
@@ -0,0 +1,14 @@
+/*
+   POST-PROCESS PASS: SHARPEN (Fragment of `post_process_view.sql`)
+   Unsharp mask: every channel is pushed away from its blurred value by the same 
+   amount, 2 * c - blur(c), clamped to 0..255. `${blur}` is the blur pass over 
+   the same input, so sharpening needs one halo row and column like the blur.
+   `${src}` are the input pixels and `${dst}` the output.
+*/
+${blur},
+arrayMap((c, b) -> toUInt32(bitOr(bitOr(
+        least(greatest(2 * toInt32(bitAnd(c, 0xFF)) - toInt32(bitAnd(b, 0xFF)), 0), 255),
+        bitShiftLeft(least(greatest(2 * toInt32(bitAnd(bitShiftRight(c, 8), 0xFF)) - toInt32(bitAnd(bitShiftRight(b, 8), 0xFF)), 0), 255), 8)),
+        bitShiftLeft(least(greatest(2 * toInt32(bitShiftRight(c, 16)) - toInt32(bitShiftRight(b, 16)), 0), 255), 16))),
+    ${src}, ${dst}_blurred
+) AS ${dst}
@@ -1,89 +1,47 @@
 /*
 ------------------------------------------------------------------------------------------------
-  DOOMHOUSE POST-PROCESSOR: FAST GAUSSIAN BLUR APPROXIMATION (4-Way Split Pipeline)
+  DOOMHOUSE POST-PROCESSOR: PASS CHAIN (N-Way Tiled Pipeline)
 ------------------------------------------------------------------------------------------------
+  Template: instantiated once per screen tile by the Python client (see `render_plan.py`).
+  The post-process passes (blur, sharpen, fog, see `post_process_*.sql`) are spliced in as
+  a chain of array expressions, each reading the pixels of the one before. The render view
+  draws the tile with a halo of extra rows and columns on every side (one per pass that
+  reads its neighbours, clamped to the frame), so filters see the real pixels of the
+  neighbouring tiles instead of zeros and tiles join without seams. The halo is cropped
+  after the last pass. All rectangles are scaled from the full frame to the render
+  resolution, and the row stride is the width of the halo rectangle.
+  The source is a placeholder so the single-query render mode can reuse this SELECT.
+  Output is a `String` of the processed pixels, packed by one of the `frame_encoding_*.sql`
+  fragments (RGB24, RGB565 or a per-tile palette), rather than `Array(UInt32)`.
+  Rows keep the session and frame id of their input, so every session fetches its own frame.
 */
 
 -- =========================================================
--- VIEW 1: QUARTER 1
+-- TILE ${tile_id}
 -- =========================================================
-CREATE MATERIALIZED VIEW doomhouse.post_process_materialized_1
-TO doomhouse.rendered_frame_post_processed_1
+CREATE MATERIALIZED VIEW doomhouse.post_process_materialized_${tile_id}
+TO doomhouse.rendered_frame_post_processed_${tile_id}
 AS
 WITH
-    640 AS w,
-    image_data AS src,
-    length(src) AS len,
-    arraySlice(arrayConcat([0], src), 1, len) AS l,
-    arrayResize(arraySlice(src, 2), len, 0) AS r,
-    arraySlice(arrayConcat(arrayWithConstant(w, 0), src), 1, len) AS u,
-    arrayResize(arraySlice(src, w + 1), len, 0) AS d,
-    0x00FF00FF AS mask_rb,
-    0x0000FF00 AS mask_g
+    intDiv(${x0} * res_w, ${frame_w}) AS tile_x0,
+    intDiv((${x1} + 1) * res_w, ${frame_w}) AS tile_x1,
+    intDiv(${y0} * res_h, ${frame_h}) AS tile_y0,
+    intDiv((${y1} + 1) * res_h, ${frame_h}) AS tile_y1,
+    greatest(tile_x0 - ${halo}, 0) AS halo_x0,
+    least(tile_x1 + ${halo}, res_w) AS halo_x1,
+    greatest(tile_y0 - ${halo}, 0) AS halo_y0,
+    halo_x1 - halo_x0 AS w,
+    image_data AS pass_0,
+    length(pass_0) AS len,
+    arrayMap(i -> if(i % w = 0, 0, 0xFFFFFFFF), range(len)) AS not_first_col,
+    arrayMap(i -> if(i % w = w - 1, 0, 0xFFFFFFFF), range(len)) AS not_last_col,
+    arrayMap(i -> toInt32(halo_y0 + intDiv(i, w)), range(len)) AS pixel_row,
+    -- The post-process passes, pass_0 (the rendered halo rectangle) to ${processed}
+    ${passes}
+    ${crop},
+    -- Pack the processed pixels into the bytes the client decodes (see `framebuffer.decode_pixels`)
+    ${encode}
 SELECT
-    pos_x, pos_y,
-    arrayMap((c, l, r, u, d) -> bitOr(bitAnd(bitShiftRight((bitAnd(c, mask_rb) * 4) + bitAnd(l, mask_rb) + bitAnd(r, mask_rb) + bitAnd(u, mask_rb) + bitAnd(d, mask_rb), 3), mask_rb), bitAnd(bitShiftRight((bitAnd(c, mask_g) * 4) + bitAnd(l, mask_g) + bitAnd(r, mask_g) + bitAnd(u, mask_g) + bitAnd(d, mask_g), 3), mask_g)), src, l, r, u, d) AS image_data
-FROM doomhouse.rendered_frame_1;
-
--- =========================================================
--- VIEW 2: QUARTER 2
--- =========================================================
-CREATE MATERIALIZED VIEW doomhouse.post_process_materialized_2
-TO doomhouse.rendered_frame_post_processed_2
-AS
-WITH
-    640 AS w,
-    image_data AS src,
-    length(src) AS len,
-    arraySlice(arrayConcat([0], src), 1, len) AS l,
-    arrayResize(arraySlice(src, 2), len, 0) AS r,
-    arraySlice(arrayConcat(arrayWithConstant(w, 0), src), 1, len) AS u,
-    arrayResize(arraySlice(src, w + 1), len, 0) AS d,
-    0x00FF00FF AS mask_rb,
-    0x0000FF00 AS mask_g
-SELECT
-    pos_x, pos_y,
-    arrayMap((c, l, r, u, d) -> bitOr(bitAnd(bitShiftRight((bitAnd(c, mask_rb) * 4) + bitAnd(l, mask_rb) + bitAnd(r, mask_rb) + bitAnd(u, mask_rb) + bitAnd(d, mask_rb), 3), mask_rb), bitAnd(bitShiftRight((bitAnd(c, mask_g) * 4) + bitAnd(l, mask_g) + bitAnd(r, mask_g) + bitAnd(u, mask_g) + bitAnd(d, mask_g), 3), mask_g)), src, l, r, u, d) AS image_data
-FROM doomhouse.rendered_frame_2;
-
--- =========================================================
--- VIEW 3: QUARTER 3
--- =========================================================
-CREATE MATERIALIZED VIEW doomhouse.post_process_materialized_3
-TO doomhouse.rendered_frame_post_processed_3
-AS
-WITH
-    640 AS w,
-    image_data AS src,
-    length(src) AS len,
-    arraySlice(arrayConcat([0], src), 1, len) AS l,
-    arrayResize(arraySlice(src, 2), len, 0) AS r,
-    arraySlice(arrayConcat(arrayWithConstant(w, 0), src), 1, len) AS u,
-    arrayResize(arraySlice(src, w + 1), len, 0) AS d,
-    0x00FF00FF AS mask_rb,
-    0x0000FF00 AS mask_g
-SELECT
-    pos_x, pos_y,
-    arrayMap((c, l, r, u, d) -> bitOr(bitAnd(bitShiftRight((bitAnd(c, mask_rb) * 4) + bitAnd(l, mask_rb) + bitAnd(r, mask_rb) + bitAnd(u, mask_rb) + bitAnd(d, mask_rb), 3), mask_rb), bitAnd(bitShiftRight((bitAnd(c, mask_g) * 4) + bitAnd(l, mask_g) + bitAnd(r, mask_g) + bitAnd(u, mask_g) + bitAnd(d, mask_g), 3), mask_g)), src, l, r, u, d) AS image_data
-FROM doomhouse.rendered_frame_3;
-
--- =========================================================
--- VIEW 4: QUARTER 4
--- =========================================================
-CREATE MATERIALIZED VIEW doomhouse.post_process_materialized_4
-TO doomhouse.rendered_frame_post_processed_4
-AS
-WITH
-    640 AS w,
-    image_data AS src,
-    length(src) AS len,
-    arraySlice(arrayConcat([0], src), 1, len) AS l,
-    arrayResize(arraySlice(src, 2), len, 0) AS r,
-    arraySlice(arrayConcat(arrayWithConstant(w, 0), src), 1, len) AS u,
-    arrayResize(arraySlice(src, w + 1), len, 0) AS d,
-    0x00FF00FF AS mask_rb,
-    0x0000FF00 AS mask_g
-SELECT
-    pos_x, pos_y,
-    arrayMap((c, l, r, u, d) -> bitOr(bitAnd(bitShiftRight((bitAnd(c, mask_rb) * 4) + bitAnd(l, mask_rb) + bitAnd(r, mask_rb) + bitAnd(u, mask_rb) + bitAnd(d, mask_rb), 3), mask_rb), bitAnd(bitShiftRight((bitAnd(c, mask_g) * 4) + bitAnd(l, mask_g) + bitAnd(r, mask_g) + bitAnd(u, mask_g) + bitAnd(d, mask_g), 3), mask_g)), src, l, r, u, d) AS image_data
-FROM doomhouse.rendered_frame_4;
+    session_id, frame_id, pos_x, pos_y,
+    encoded AS image_data
+FROM ${source};
@@ -0,0 +1,16 @@
+/*
+   RAY TRAVERSAL: BRUTE FORCE (Fragment of `ray_view.sql`)
+   Evaluates the next RAY_STEPS integer grid crossings ahead of the player along 
+   both axes at once with `arrayMap`, then takes the nearest wall crossing with 
+   `arrayMin`. View distance is capped at RAY_STEPS cells.
+*/
+range(1, RAY_STEPS) as steps,
+arrayMap(i -> (floor(valid_x) + if(r_dir_x > 0, i, 1 - i) - valid_x) / r_dir_x, steps) as d_x,
+arrayMin(arrayMap((d, i) -> if(d > 0 AND d < VIEW_DIST AND dictGet('doomhouse.dict_map_data', 'val', toUInt32(floor(valid_y + r_dir_y * d) * MAP_W + floor(valid_x + r_dir_x * d + if(r_dir_x > 0, 0.005, -0.005)) + 1)) > 0, d, 999.0), d_x, steps)) as dist_x,
+arrayMap(i -> (floor(valid_y) + if(r_dir_y > 0, i, 1 - i) - valid_y) / r_dir_y, steps) as d_y,
+arrayMin(arrayMap((d, i) -> if(d > 0 AND d < VIEW_DIST AND dictGet('doomhouse.dict_map_data', 'val', toUInt32(floor(valid_y + r_dir_y * d + if(r_dir_y > 0, 0.005, -0.005)) * MAP_W + floor(valid_x + r_dir_x * d) + 1)) > 0, d, 999.0), d_y, steps)) as dist_y,
+least(dist_x, dist_y) as raw_hit_dist,
+least(dist_x, dist_y) as hit_dist,
+(dist_y < dist_x) as side,
+-- `AND` short-circuits, so only crossings with 0 < d < VIEW_DIST reach the dictionary
+arrayCount(d -> d > 0 AND d < VIEW_DIST, d_x) + arrayCount(d -> d > 0 AND d < VIEW_DIST, d_y) as lookups
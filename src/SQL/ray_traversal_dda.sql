@@ -0,0 +1,33 @@
+/*
+   RAY TRAVERSAL: DDA (Fragment of `ray_view.sql`)
+   Digital Differential Analyzer: walks the grid one cell at a time, always stepping 
+   across whichever grid line (x or y) the ray reaches first, and stops at the first 
+   wall. The walk is an `arrayFold` whose state is 
+   (map_x, map_y, side_dist_x, side_dist_y, side, hit, lookups). Once `hit` is set 
+   the state passes through unchanged, and because `if` is evaluated short-circuit 
+   the `dictGet` only runs for rays that are still travelling. 
+   DDA_STEPS (MAP_W + MAP_H) is enough to cross the whole map, so there is no 
+   view distance cap.
+*/
+toInt32(floor(valid_x)) as map_x0,
+toInt32(floor(valid_y)) as map_y0,
+abs(1.0 / r_dir_x) as delta_x,
+abs(1.0 / r_dir_y) as delta_y,
+toInt32(if(r_dir_x < 0, -1, 1)) as step_x,
+toInt32(if(r_dir_y < 0, -1, 1)) as step_y,
+toFloat64(if(r_dir_x < 0, (valid_x - map_x0) * delta_x, (map_x0 + 1.0 - valid_x) * delta_x)) as side_x0,
+toFloat64(if(r_dir_y < 0, (valid_y - map_y0) * delta_y, (map_y0 + 1.0 - valid_y) * delta_y)) as side_y0,
+arrayFold(
+    (acc, i) -> if(acc.6 = 1, acc,
+        if(acc.3 < acc.4,
+            (toInt32(acc.1 + step_x), acc.2, acc.3 + delta_x, acc.4, toUInt8(0),
+             toUInt8(dictGet('doomhouse.dict_map_data', 'val', toUInt32(acc.2 * MAP_W + acc.1 + step_x + 1)) > 0), toUInt32(acc.7 + 1)),
+            (acc.1, toInt32(acc.2 + step_y), acc.3, acc.4 + delta_y, toUInt8(1),
+             toUInt8(dictGet('doomhouse.dict_map_data', 'val', toUInt32((acc.2 + step_y) * MAP_W + acc.1 + 1)) > 0), toUInt32(acc.7 + 1)))),
+    range(DDA_STEPS),
+    (map_x0, map_y0, side_x0, side_y0, toUInt8(0), toUInt8(0), toUInt32(0))
+) as dda,
+(dda.5 = 1) as side,
+if(dda.6 = 1, if(side, dda.4 - delta_y, dda.3 - delta_x), 999.0) as raw_hit_dist,
+raw_hit_dist as hit_dist,
+dda.7 as lookups
@@ -0,0 +1,38 @@
+/*
+   RAY TRAVERSAL: DISTANCE FIELD (Fragment of `ray_view.sql`)
+   DDA that skips open space. Every map cell stores its Chebyshev distance `d` to
+   the nearest wall (`dist` attribute of `dict_map_data`, 0 for walls). From a
+   cell with d > 1 the ray jumps (d - 1) cells along its longer axis in one step,
+   because every cell it can land in is empty. Next to a wall (d = 1) it takes a
+   regular DDA step across the nearest grid line, and it stops on entering a cell
+   with d = 0. Each step costs one dictionary lookup, so the cost depends on how
+   cluttered the view is, not on the map size. The walk is an `arrayFold` with
+   state (map_x, map_y, t, side, hit, lookups). Every step crosses at least one
+   grid line, so like the DDA it runs DDA_STEPS (MAP_W + MAP_H) steps, enough to
+   reach the walled outer ring, and has no view distance cap.
+*/
+toInt32(if(r_dir_x < 0, -1, 1)) as step_x,
+toInt32(if(r_dir_y < 0, -1, 1)) as step_y,
+1.0 / r_dir_x as inv_x,
+1.0 / r_dir_y as inv_y,
+1.0 / greatest(abs(r_dir_x), abs(r_dir_y)) as inv_max,
+arrayFold(
+    (acc, i) -> if(acc.5 = 1, acc,
+        multiIf(
+            dictGet('doomhouse.dict_map_data', 'dist', toUInt32(acc.2 * MAP_W + acc.1 + 1)) = 0,
+            (acc.1, acc.2, acc.3, acc.4, toUInt8(1), toUInt32(acc.6 + 1)),
+            dictGet('doomhouse.dict_map_data', 'dist', toUInt32(acc.2 * MAP_W + acc.1 + 1)) > 1,
+            (toInt32(floor(valid_x + r_dir_x * (acc.3 + (dictGet('doomhouse.dict_map_data', 'dist', toUInt32(acc.2 * MAP_W + acc.1 + 1)) - 1) * inv_max))),
+             toInt32(floor(valid_y + r_dir_y * (acc.3 + (dictGet('doomhouse.dict_map_data', 'dist', toUInt32(acc.2 * MAP_W + acc.1 + 1)) - 1) * inv_max))),
+             toFloat64(acc.3 + (dictGet('doomhouse.dict_map_data', 'dist', toUInt32(acc.2 * MAP_W + acc.1 + 1)) - 1) * inv_max),
+             acc.4, toUInt8(0), toUInt32(acc.6 + 1)),
+            (acc.1 + if(step_x > 0, 1, 0) - valid_x) * inv_x < (acc.2 + if(step_y > 0, 1, 0) - valid_y) * inv_y,
+            (toInt32(acc.1 + step_x), acc.2, toFloat64((acc.1 + if(step_x > 0, 1, 0) - valid_x) * inv_x), toUInt8(0), toUInt8(0), toUInt32(acc.6 + 1)),
+            (acc.1, toInt32(acc.2 + step_y), toFloat64((acc.2 + if(step_y > 0, 1, 0) - valid_y) * inv_y), toUInt8(1), toUInt8(0), toUInt32(acc.6 + 1)))),
+    range(DDA_STEPS),
+    (toInt32(floor(valid_x)), toInt32(floor(valid_y)), toFloat64(0), toUInt8(0), toUInt8(0), toUInt32(0))
+) as walk,
+(walk.4 = 1) as side,
+if(walk.5 = 1, walk.3, 999.0) as raw_hit_dist,
+raw_hit_dist as hit_dist,
+walk.6 as lookups
@@ -0,0 +1,85 @@
+/*
+   ========================================================================================
+   DOOMHOUSE RAY STAGE: Collision + One Ray per Screen Column
+   ========================================================================================
+   Runs once per player input and produces res_w rows (one per screen column) holding 
+   everything the pixel shading stage needs: wall span (draw_start/draw_end), texture 
+   column and step (tx, tex_step, tex_base), shading and the ray hit point. The 
+   texture theme of the input, and the session and frame it belongs to, are passed 
+   through for the shading stage, along with the render resolution (`res_w` x `res_h`), 
+   which can change from one input to the next.
+
+   The raycasting itself (vectorized grid crossings, fish-eye correction, fog and 
+   collision) is described in the header of `render_view.sql`. The per-tile shading 
+   views consume `doomhouse.rendered_rays`, so the ray cost does not grow with the 
+   number of tiles.
+
+   `${input}` is `doomhouse.player_input` for the Materialized View, or a one-row 
+   subquery of bound parameters in the single-query render mode.
+
+   `${traversal}` is the grid traversal that finds the first wall along each ray. It 
+   is one of the `ray_traversal_*.sql` fragments and must produce `raw_hit_dist`, 
+   `hit_dist`, `side` (1 = horizontal wall) and `lookups` (map lookups per ray).
+
+   `${map_w}` and `${map_h}` are the size of the loaded map (see `game_map.py`). 
+   Cell (x, y) has id `y * MAP_W + x + 1` in `dict_map_data`.
+   `${tex_size}` is the texels per side of the textures, a power of two.
+   ========================================================================================
+*/
+
+CREATE MATERIALIZED VIEW doomhouse.ray_materialized
+TO doomhouse.rendered_rays
+AS
+WITH 
+    ${map_w} AS MAP_W,
+    ${tex_size} AS TEX_SIZE,
+    CAST(TEX_SIZE - 1, 'Int32') AS TEX_MAX,
+    ${map_h} AS MAP_H,
+    25 AS RAY_STEPS,
+    30 AS VIEW_DIST,
+    MAP_W + MAP_H AS DDA_STEPS
+SELECT 
+    x, valid_x, valid_y,
+    toInt32(intDiv(res_h, 2) - (res_h / (perp_wall_dist + 0.0001)) * 0.5) AS draw_start,
+    toInt32(intDiv(res_h, 2) + (res_h / (perp_wall_dist + 0.0001)) * 0.5) AS draw_end,
+    (1.0 / (res_h / (perp_wall_dist + 0.0001))) * TEX_SIZE as tex_step,
+    -(intDiv(res_h, 2) - (res_h / (perp_wall_dist + 0.0001)) * 0.5) * tex_step as tex_base,
+    (if(side, 0.6, 1.0) * (1.0 - least(least(hit_dist, 20.0) * 0.125, 1.0))) AS base_shade,
+    least(if(side, hit_x_wall, hit_y_wall), TEX_MAX) AS tx,
+    hit_x, hit_y, perp_wall_dist, lookups, theme, session_id, frame_id, res_w, res_h
+FROM (
+    SELECT 
+        *, raw_hit_dist * (p_dir_x * r_dir_x + p_dir_y * r_dir_y) as perp_wall_dist,
+        (valid_x + r_dir_x * raw_hit_dist) as hit_x, (valid_y + r_dir_y * raw_hit_dist) as hit_y,
+        toInt32((hit_x - floor(hit_x)) * TEX_SIZE) as hit_x_wall_raw, toInt32((hit_y - floor(hit_y)) * TEX_SIZE) as hit_y_wall_raw,
+        if(bitAnd(intHash32(toInt32(hit_y)), 1) = 0, TEX_MAX - hit_x_wall_raw, hit_x_wall_raw) as hit_x_wall,
+        if(bitAnd(intHash32(toInt32(hit_x)), 1) = 0, TEX_MAX - hit_y_wall_raw, hit_y_wall_raw) as hit_y_wall
+    FROM (
+        SELECT
+            *, ${traversal}
+        FROM (
+            SELECT 
+                screen_col AS x, p.valid_x, p.valid_y, p.dir_x as p_dir_x, p.dir_y as p_dir_y, p.theme, p.session_id, p.frame_id,
+                p.res_w, p.res_h,
+                (p.dir_x + p.plane_x * (2.0 * screen_col * p.w_inv - 1.0)) as r_dir_x,
+                (p.dir_y + p.plane_y * (2.0 * screen_col * p.w_inv - 1.0)) as r_dir_y
+            FROM (
+                SELECT 
+                    toFloat32(dir_x) as dir_x, toFloat32(dir_y) as dir_y, toFloat32(plane_x) as plane_x, toFloat32(plane_y) as plane_y,
+                    if(dictGet('doomhouse.dict_map_data', 'val', toUInt32(floor(try_y + if(try_y > old_y, 0.2, -0.2)) * MAP_W + floor(valid_x_inter) + 1)) = 0, try_y, old_y) as valid_y,
+                    valid_x_inter as valid_x,
+                    toUInt8(theme) as theme,
+                    toString(session_id) as session_id,
+                    toUInt64(frame_id) as frame_id,
+                    toUInt16(res_w) as res_w,
+                    toUInt16(res_h) as res_h,
+                    CAST(1.0 / res_w, 'Float32') AS w_inv
+                FROM (
+                    SELECT *, if(dictGet('doomhouse.dict_map_data', 'val', toUInt32(floor(old_y) * MAP_W + floor(try_x + if(try_x > old_x, 0.2, -0.2)) + 1)) = 0, try_x, old_x) as valid_x_inter
+                    FROM ${input}
+                ) AS pi
+            ) AS p
+            ARRAY JOIN range(p.res_w) AS screen_col
+        )
+    )
+);
@@ -0,0 +1,19 @@
+/*
+------------------------------------------------------------------------------------------------
+  DOOMHOUSE SINGLE-STAGE TILE VIEW (N-Way Tiled Pipeline)
+------------------------------------------------------------------------------------------------
+  Template: used instead of `render_view.sql` and `post_process_view.sql` when the 
+  post-process chain is empty. A chain without passes only packs the pixels, so the 
+  render and post-process SELECTs are chained into one Materialized View that writes 
+  the finished tile straight to `rendered_frame_post_processed_${tile_id}`. This saves 
+  the second view stage and the `rendered_frame_${tile_id}` Memory table in between. 
+  The SELECT below is the chained pair, built by `render_plan.tile_select()`.
+*/
+
+-- =========================================================
+-- TILE ${tile_id}
+-- =========================================================
+CREATE MATERIALIZED VIEW doomhouse.render_materialized_${tile_id}
+TO doomhouse.rendered_frame_post_processed_${tile_id}
+AS
+${select};
@@ -1,6 +1,6 @@
 /*
    ========================================================================================
-   DOOMHOUSE RENDER ENGINE: 3D Raycasting in Pure SQL (4-Way Split Pipeline)
+   DOOMHOUSE RENDER ENGINE: 3D Raycasting in Pure SQL (N-Way Tiled Pipeline)
    ========================================================================================
 
    OVERVIEW:
@@ -26,6 +26,14 @@
       To optimize memory access and CPU cycles, texture data is split into separate 
       `r`, `g`, and `b` (UInt8) columns. This avoids the overhead of bitwise unpacking 
       a single UInt32 color integer during the shading step.
+      The textures of every theme live in one atlas, `doomhouse.dict_tex_atlas`, keyed 
+      by (theme, surface, mip level, texel) packed into a single id. The theme is part 
+      of the player input, so switching themes changes no tables or dictionaries.
+      The atlas also holds a packed `rgb` attribute (or only that one, with the `packed` 
+      texture storage): the three `*_sample` placeholders are 
+      filled with a `texture_sample_*.sql` fragment, doing either three channel 
+      lookups or one packed lookup per pixel. Textures are `${tex_size}` texels per side, 
+      a power of two, so floor coordinates wrap with a bit mask.
 
    3. FISH-EYE CORRECTION:
       Raw Euclidean distance creates a "fish-eye" lens effect. We correct this by 
@@ -49,7 +57,8 @@
    6. LOOKUP TABLES (Pre-computed Floor Distances):
       Floor and ceiling casting typically requires an expensive division operation 
       for every single pixel (`distance = height / pixel_row`).
-      To optimize this, we pre-calculate these values into `doomhouse.dict_floor_dist`.
+      To optimize this, we pre-calculate these values into `doomhouse.dict_floor_dist`, 
+      for every screen row of every render height (keyed by `height * 512 + row + 1`).
       The engine performs a fast O(1) dictionary lookup instead of performing floating-point 
       division at runtime.
 
@@ -59,366 +68,120 @@
         once per pixel in a subquery, rather than repeating the math for every color channel.
       - Assembly: The final pixel color is packed into a UInt32 (0xBBGGRR) using 
         fast bitwise shifts at the very end of the pipeline.
+      - Frame Assembly: Every pixel knows its row-major index in the halo rectangle, so
+        `groupArrayInsertAt` scatters the colors straight into the image array. There is 
+        no per-pixel (index, color) tuple and no sort of the whole tile by index.
 
-   ========================================================================================
-*/
+   8. TILED RENDERING (One Template, N Views):
+      This file is a template, not a single view. The Python client instantiates it 
+      once per screen tile (see `render_plan.py`), substituting the placeholders 
+      with the tile id and its pixel rectangle. Tiles can be horizontal strips, 
+      vertical strips or a 2D grid. Every tile gets its own Materialized View and 
+      output table, so ClickHouse renders all tiles of a frame in parallel.
 
--- =========================================================
--- VIEW 1: QUARTER 1 (Rows 0-119)
--- =========================================================
-CREATE MATERIALIZED VIEW doomhouse.render_materialized_1
-TO doomhouse.rendered_frame_1
-AS
-WITH 
-    640 AS W,
-    480 AS H,
-    240 AS H_HALF,
-    120 AS H_QUARTER,
-    15 AS MAP_W,
-    512 AS TEX_SIZE,
-    CAST(TEX_SIZE - 1, 'Int32') AS TEX_MAX,
-    25 AS RAY_STEPS,
-    CAST(1.0 / W, 'Float32') AS W_INV
-SELECT
-    any(valid_x) as pos_x,
-    any(valid_y) as pos_y,
-    arrayMap(x -> x.2, arraySort(k -> k.1, groupArray((y * W + x, final_color)))) AS image_data
-FROM (
-    SELECT
-        x, y, valid_x, valid_y,
-        multiIf(
-            toInt32(y) >= draw_start AND toInt32(y) <= draw_end,
-            CAST(bitOr(bitOr(bitShiftLeft(toUInt32(dictGet('doomhouse.dict_tex_wall1_data', 'r', w_tex_idx) * base_shade), 0), bitShiftLeft(toUInt32(dictGet('doomhouse.dict_tex_wall1_data', 'g', w_tex_idx) * base_shade), 8)), bitShiftLeft(toUInt32(dictGet('doomhouse.dict_tex_wall1_data', 'b', w_tex_idx) * base_shade), 16)), 'UInt32'),
-            toInt32(y) < draw_start,
-            CAST(bitOr(bitOr(bitShiftLeft(toUInt32(dictGet('doomhouse.dict_tex_ceiling_data', 'r', f_tex_idx) * floor_shade), 0), bitShiftLeft(toUInt32(dictGet('doomhouse.dict_tex_ceiling_data', 'g', f_tex_idx) * floor_shade), 8)), bitShiftLeft(toUInt32(dictGet('doomhouse.dict_tex_ceiling_data', 'b', f_tex_idx) * floor_shade), 16)), 'UInt32'),
-            CAST(bitOr(bitOr(bitShiftLeft(toUInt32(dictGet('doomhouse.dict_tex_floor_data', 'r', f_tex_idx) * floor_shade), 0), bitShiftLeft(toUInt32(dictGet('doomhouse.dict_tex_floor_data', 'g', f_tex_idx) * floor_shade), 8)), bitShiftLeft(toUInt32(dictGet('doomhouse.dict_tex_floor_data', 'b', f_tex_idx) * floor_shade), 16)), 'UInt32')
-        ) AS final_color
-    FROM (
-        SELECT 
-            x, y, rays.valid_x, rays.valid_y, rays.draw_start, rays.draw_end, rays.base_shade, 
-            (1.0 - least(floor_dist * 0.125, 1.0)) as floor_shade,
-            toUInt32((least(greatest(toInt32(y * rays.tex_step + rays.tex_base), 0), TEX_MAX) * TEX_SIZE) + rays.tx + 1) as w_tex_idx,
-            toUInt32((bitAnd(toInt32((rays.valid_y + floor_dist * ((rays.hit_y - rays.valid_y) / (rays.perp_wall_dist + 0.001))) * TEX_SIZE), TEX_MAX) * TEX_SIZE) + bitAnd(toInt32((rays.valid_x + floor_dist * ((rays.hit_x - rays.valid_x) / (rays.perp_wall_dist + 0.001))) * TEX_SIZE), TEX_MAX) + 1) as f_tex_idx
-        FROM (
-            SELECT 
-                x, valid_x, valid_y,
-                toInt32(H_HALF - (H / (perp_wall_dist + 0.0001)) * 0.5) AS draw_start,
-                toInt32(H_HALF + (H / (perp_wall_dist + 0.0001)) * 0.5) AS draw_end,
-                (1.0 / (H / (perp_wall_dist + 0.0001))) * TEX_SIZE as tex_step,
-                -(H_HALF - (H / (perp_wall_dist + 0.0001)) * 0.5) * tex_step as tex_base,
-                (if(side, 0.6, 1.0) * (1.0 - least(least(hit_dist, 20.0) * 0.125, 1.0))) AS base_shade,
-                least(if(side, hit_x_wall, hit_y_wall), TEX_MAX) AS tx,
-                hit_x, hit_y, perp_wall_dist
-            FROM (
-                SELECT 
-                    *, raw_hit_dist * (p_dir_x * r_dir_x + p_dir_y * r_dir_y) as perp_wall_dist,
-                    (valid_x + r_dir_x * raw_hit_dist) as hit_x, (valid_y + r_dir_y * raw_hit_dist) as hit_y,
-                    toInt32((hit_x - floor(hit_x)) * TEX_SIZE) as hit_x_wall_raw, toInt32((hit_y - floor(hit_y)) * TEX_SIZE) as hit_y_wall_raw,
-                    if(bitAnd(intHash32(toInt32(hit_y)), 1) = 0, TEX_MAX - hit_x_wall_raw, hit_x_wall_raw) as hit_x_wall,
-                    if(bitAnd(intHash32(toInt32(hit_x)), 1) = 0, TEX_MAX - hit_y_wall_raw, hit_y_wall_raw) as hit_y_wall
-                FROM (
-                    SELECT *, least(dist_x, dist_y) as raw_hit_dist, least(dist_x, dist_y) as hit_dist, (dist_y < dist_x) as side
-                    FROM (
-                        SELECT 
-                            *, arrayMap(i -> (i - valid_x) / r_dir_x, steps) as d_x,
-                            arrayMin(arrayMap((d, i) -> if(d > 0 AND d < 30 AND dictGet('doomhouse.dict_map_data', 'val', toUInt32(floor(valid_y + r_dir_y * d) * MAP_W + floor(valid_x + r_dir_x * d + if(r_dir_x > 0, 0.005, -0.005)) + 1)) > 0, d, 999.0), d_x, steps)) as dist_x,
-                            arrayMap(i -> (i - valid_y) / r_dir_y, steps) as d_y,
-                            arrayMin(arrayMap((d, i) -> if(d > 0 AND d < 30 AND dictGet('doomhouse.dict_map_data', 'val', toUInt32(floor(valid_y + r_dir_y * d + if(r_dir_y > 0, 0.005, -0.005)) * MAP_W + floor(valid_x + r_dir_x * d) + 1)) > 0, d, 999.0), d_y, steps)) as dist_y
-                        FROM (
-                            SELECT 
-                                screen_col.number AS x, p.valid_x, p.valid_y, p.dir_x as p_dir_x, p.dir_y as p_dir_y,
-                                (p.dir_x + p.plane_x * (2.0 * screen_col.number * W_INV - 1.0)) as r_dir_x,
-                                (p.dir_y + p.plane_y * (2.0 * screen_col.number * W_INV - 1.0)) as r_dir_y,
-                                range(1, RAY_STEPS) as steps
-                            FROM (
-                                SELECT 
-                                    toFloat32(dir_x) as dir_x, toFloat32(dir_y) as dir_y, toFloat32(plane_x) as plane_x, toFloat32(plane_y) as plane_y,
-                                    if(dictGet('doomhouse.dict_map_data', 'val', toUInt32(floor(try_y + if(try_y > old_y, 0.2, -0.2)) * MAP_W + floor(valid_x_inter) + 1)) = 0, try_y, old_y) as valid_y,
-                                    valid_x_inter as valid_x
-                                FROM (
-                                    SELECT *, if(dictGet('doomhouse.dict_map_data', 'val', toUInt32(floor(old_y) * MAP_W + floor(try_x + if(try_x > old_x, 0.2, -0.2)) + 1)) = 0, try_x, old_x) as valid_x_inter
-                                    FROM doomhouse.player_input
-                                ) AS pi
-                            ) AS p
-                            CROSS JOIN numbers(W) AS screen_col
-                        )
-                    )
-                )
-            )
-        ) AS rays
-        CROSS JOIN (
-            SELECT number as y, toInt32(H - 1 - number) as dist_lookup_idx, dictGet('doomhouse.dict_floor_dist', 'dist', toUInt32(dist_lookup_idx + 1)) as floor_dist
-            FROM numbers(H_QUARTER)
-        ) AS v_lines
-    ) AS sub
-);
+   9. TWO-STAGE PIPELINE (Rays Once, Pixels per Tile):
+      Collision and raycasting (concepts 1, 3, 4 and 5) only depend on the screen 
+      column, so they run once per frame in `ray_view.sql`, producing one row per 
+      column in `doomhouse.rendered_rays`. The tile views in this file only do the 
+      per-pixel work (concepts 2, 6 and 7) for the columns inside their tile.
+      The ray source is a placeholder: the Materialized Views read 
+      `doomhouse.rendered_rays`, while the single-query render mode substitutes the 
+      ray SELECT with the pose passed in as query parameters.
 
--- =========================================================
--- VIEW 2: QUARTER 2 (Rows 120-239)
--- =========================================================
-CREATE MATERIALIZED VIEW doomhouse.render_materialized_2
-TO doomhouse.rendered_frame_2
-AS
-WITH 
-    640 AS W,
-    480 AS H,
-    240 AS H_HALF,
-    120 AS H_QUARTER,
-    15 AS MAP_W,
-    512 AS TEX_SIZE,
-    CAST(TEX_SIZE - 1, 'Int32') AS TEX_MAX,
-    25 AS RAY_STEPS,
-    CAST(1.0 / W, 'Float32') AS W_INV
-SELECT
-    any(valid_x) as pos_x,
-    any(valid_y) as pos_y,
-    arrayMap(x -> x.2, arraySort(k -> k.1, groupArray((y * W + x, final_color)))) AS image_data
-FROM (
-    SELECT
-        x, y, valid_x, valid_y,
-        multiIf(
-            toInt32(y) >= draw_start AND toInt32(y) <= draw_end,
-            CAST(bitOr(bitOr(bitShiftLeft(toUInt32(dictGet('doomhouse.dict_tex_wall1_data', 'r', w_tex_idx) * base_shade), 0), bitShiftLeft(toUInt32(dictGet('doomhouse.dict_tex_wall1_data', 'g', w_tex_idx) * base_shade), 8)), bitShiftLeft(toUInt32(dictGet('doomhouse.dict_tex_wall1_data', 'b', w_tex_idx) * base_shade), 16)), 'UInt32'),
-            toInt32(y) < draw_start,
-            CAST(bitOr(bitOr(bitShiftLeft(toUInt32(dictGet('doomhouse.dict_tex_ceiling_data', 'r', f_tex_idx) * floor_shade), 0), bitShiftLeft(toUInt32(dictGet('doomhouse.dict_tex_ceiling_data', 'g', f_tex_idx) * floor_shade), 8)), bitShiftLeft(toUInt32(dictGet('doomhouse.dict_tex_ceiling_data', 'b', f_tex_idx) * floor_shade), 16)), 'UInt32'),
-            CAST(bitOr(bitOr(bitShiftLeft(toUInt32(dictGet('doomhouse.dict_tex_floor_data', 'r', f_tex_idx) * floor_shade), 0), bitShiftLeft(toUInt32(dictGet('doomhouse.dict_tex_floor_data', 'g', f_tex_idx) * floor_shade), 8)), bitShiftLeft(toUInt32(dictGet('doomhouse.dict_tex_floor_data', 'b', f_tex_idx) * floor_shade), 16)), 'UInt32')
-        ) AS final_color
-    FROM (
-        SELECT 
-            x, y, rays.valid_x, rays.valid_y, rays.draw_start, rays.draw_end, rays.base_shade, 
-            (1.0 - least(floor_dist * 0.125, 1.0)) as floor_shade,
-            toUInt32((least(greatest(toInt32(y * rays.tex_step + rays.tex_base), 0), TEX_MAX) * TEX_SIZE) + rays.tx + 1) as w_tex_idx,
-            toUInt32((bitAnd(toInt32((rays.valid_y + floor_dist * ((rays.hit_y - rays.valid_y) / (rays.perp_wall_dist + 0.001))) * TEX_SIZE), TEX_MAX) * TEX_SIZE) + bitAnd(toInt32((rays.valid_x + floor_dist * ((rays.hit_x - rays.valid_x) / (rays.perp_wall_dist + 0.001))) * TEX_SIZE), TEX_MAX) + 1) as f_tex_idx
-        FROM (
-            SELECT 
-                x, valid_x, valid_y,
-                toInt32(H_HALF - (H / (perp_wall_dist + 0.0001)) * 0.5) AS draw_start,
-                toInt32(H_HALF + (H / (perp_wall_dist + 0.0001)) * 0.5) AS draw_end,
-                (1.0 / (H / (perp_wall_dist + 0.0001))) * TEX_SIZE as tex_step,
-                -(H_HALF - (H / (perp_wall_dist + 0.0001)) * 0.5) * tex_step as tex_base,
-                (if(side, 0.6, 1.0) * (1.0 - least(least(hit_dist, 20.0) * 0.125, 1.0))) AS base_shade,
-                least(if(side, hit_x_wall, hit_y_wall), TEX_MAX) AS tx,
-                hit_x, hit_y, perp_wall_dist
-            FROM (
-                SELECT 
-                    *, raw_hit_dist * (p_dir_x * r_dir_x + p_dir_y * r_dir_y) as perp_wall_dist,
-                    (valid_x + r_dir_x * raw_hit_dist) as hit_x, (valid_y + r_dir_y * raw_hit_dist) as hit_y,
-                    toInt32((hit_x - floor(hit_x)) * TEX_SIZE) as hit_x_wall_raw, toInt32((hit_y - floor(hit_y)) * TEX_SIZE) as hit_y_wall_raw,
-                    if(bitAnd(intHash32(toInt32(hit_y)), 1) = 0, TEX_MAX - hit_x_wall_raw, hit_x_wall_raw) as hit_x_wall,
-                    if(bitAnd(intHash32(toInt32(hit_x)), 1) = 0, TEX_MAX - hit_y_wall_raw, hit_y_wall_raw) as hit_y_wall
-                FROM (
-                    SELECT *, least(dist_x, dist_y) as raw_hit_dist, least(dist_x, dist_y) as hit_dist, (dist_y < dist_x) as side
-                    FROM (
-                        SELECT 
-                            *, arrayMap(i -> (i - valid_x) / r_dir_x, steps) as d_x,
-                            arrayMin(arrayMap((d, i) -> if(d > 0 AND d < 30 AND dictGet('doomhouse.dict_map_data', 'val', toUInt32(floor(valid_y + r_dir_y * d) * MAP_W + floor(valid_x + r_dir_x * d + if(r_dir_x > 0, 0.005, -0.005)) + 1)) > 0, d, 999.0), d_x, steps)) as dist_x,
-                            arrayMap(i -> (i - valid_y) / r_dir_y, steps) as d_y,
-                            arrayMin(arrayMap((d, i) -> if(d > 0 AND d < 30 AND dictGet('doomhouse.dict_map_data', 'val', toUInt32(floor(valid_y + r_dir_y * d + if(r_dir_y > 0, 0.005, -0.005)) * MAP_W + floor(valid_x + r_dir_x * d) + 1)) > 0, d, 999.0), d_y, steps)) as dist_y
-                        FROM (
-                            SELECT 
-                                screen_col.number AS x, p.valid_x, p.valid_y, p.dir_x as p_dir_x, p.dir_y as p_dir_y,
-                                (p.dir_x + p.plane_x * (2.0 * screen_col.number * W_INV - 1.0)) as r_dir_x,
-                                (p.dir_y + p.plane_y * (2.0 * screen_col.number * W_INV - 1.0)) as r_dir_y,
-                                range(1, RAY_STEPS) as steps
-                            FROM (
-                                SELECT 
-                                    toFloat32(dir_x) as dir_x, toFloat32(dir_y) as dir_y, toFloat32(plane_x) as plane_x, toFloat32(plane_y) as plane_y,
-                                    if(dictGet('doomhouse.dict_map_data', 'val', toUInt32(floor(try_y + if(try_y > old_y, 0.2, -0.2)) * MAP_W + floor(valid_x_inter) + 1)) = 0, try_y, old_y) as valid_y,
-                                    valid_x_inter as valid_x
-                                FROM (
-                                    SELECT *, if(dictGet('doomhouse.dict_map_data', 'val', toUInt32(floor(old_y) * MAP_W + floor(try_x + if(try_x > old_x, 0.2, -0.2)) + 1)) = 0, try_x, old_x) as valid_x_inter
-                                    FROM doomhouse.player_input
-                                ) AS pi
-                            ) AS p
-                            CROSS JOIN numbers(W) AS screen_col
-                        )
-                    )
-                )
-            )
-        ) AS rays
-        CROSS JOIN (
-            SELECT number + H_QUARTER as y, toInt32(H - 1 - (number + H_QUARTER)) as dist_lookup_idx, dictGet('doomhouse.dict_floor_dist', 'dist', toUInt32(dist_lookup_idx + 1)) as floor_dist
-            FROM numbers(H_QUARTER)
-        ) AS v_lines
-    ) AS sub
-);
+   10. MIPMAPPING (Level of Detail):
+      Every texture is stored with a chain of box-filtered mip levels, each half the 
+      size of the previous one. A distant wall column or floor row, where one screen 
+      pixel spans many texels, samples a smaller level. Its lookups then hit a small, 
+      cache-friendly part of the atlas instead of being scattered over the full 
+      resolution texture. The level is chosen per column for walls (from the texture 
+      step, i.e. `perp_wall_dist`) and per row for floors and ceilings (from 
+      `floor_dist`). A MAX_LOD of 0 turns mipmapping off.
 
--- =========================================================
--- VIEW 3: QUARTER 3 (Rows 240-359)
--- =========================================================
-CREATE MATERIALIZED VIEW doomhouse.render_materialized_3
-TO doomhouse.rendered_frame_3
-AS
-WITH 
-    640 AS W,
-    480 AS H,
-    240 AS H_HALF,
-    120 AS H_QUARTER,
-    15 AS MAP_W,
-    512 AS TEX_SIZE,
-    CAST(TEX_SIZE - 1, 'Int32') AS TEX_MAX,
-    25 AS RAY_STEPS,
-    CAST(1.0 / W, 'Float32') AS W_INV
-SELECT
-    any(valid_x) as pos_x,
-    any(valid_y) as pos_y,
-    arrayMap(x -> x.2, arraySort(k -> k.1, groupArray((y * W + x, final_color)))) AS image_data
-FROM (
-    SELECT
-        x, y, valid_x, valid_y,
-        multiIf(
-            toInt32(y) >= draw_start AND toInt32(y) <= draw_end,
-            CAST(bitOr(bitOr(bitShiftLeft(toUInt32(dictGet('doomhouse.dict_tex_wall1_data', 'r', w_tex_idx) * base_shade), 0), bitShiftLeft(toUInt32(dictGet('doomhouse.dict_tex_wall1_data', 'g', w_tex_idx) * base_shade), 8)), bitShiftLeft(toUInt32(dictGet('doomhouse.dict_tex_wall1_data', 'b', w_tex_idx) * base_shade), 16)), 'UInt32'),
-            toInt32(y) < draw_start,
-            CAST(bitOr(bitOr(bitShiftLeft(toUInt32(dictGet('doomhouse.dict_tex_ceiling_data', 'r', f_tex_idx) * floor_shade), 0), bitShiftLeft(toUInt32(dictGet('doomhouse.dict_tex_ceiling_data', 'g', f_tex_idx) * floor_shade), 8)), bitShiftLeft(toUInt32(dictGet('doomhouse.dict_tex_ceiling_data', 'b', f_tex_idx) * floor_shade), 16)), 'UInt32'),
-            CAST(bitOr(bitOr(bitShiftLeft(toUInt32(dictGet('doomhouse.dict_tex_floor_data', 'r', f_tex_idx) * floor_shade), 0), bitShiftLeft(toUInt32(dictGet('doomhouse.dict_tex_floor_data', 'g', f_tex_idx) * floor_shade), 8)), bitShiftLeft(toUInt32(dictGet('doomhouse.dict_tex_floor_data', 'b', f_tex_idx) * floor_shade), 16)), 'UInt32')
-        ) AS final_color
-    FROM (
-        SELECT 
-            x, y, rays.valid_x, rays.valid_y, rays.draw_start, rays.draw_end, rays.base_shade, 
-            (1.0 - least(floor_dist * 0.125, 1.0)) as floor_shade,
-            toUInt32((least(greatest(toInt32(y * rays.tex_step + rays.tex_base), 0), TEX_MAX) * TEX_SIZE) + rays.tx + 1) as w_tex_idx,
-            toUInt32((bitAnd(toInt32((rays.valid_y + floor_dist * ((rays.hit_y - rays.valid_y) / (rays.perp_wall_dist + 0.001))) * TEX_SIZE), TEX_MAX) * TEX_SIZE) + bitAnd(toInt32((rays.valid_x + floor_dist * ((rays.hit_x - rays.valid_x) / (rays.perp_wall_dist + 0.001))) * TEX_SIZE), TEX_MAX) + 1) as f_tex_idx
-        FROM (
-            SELECT 
-                x, valid_x, valid_y,
-                toInt32(H_HALF - (H / (perp_wall_dist + 0.0001)) * 0.5) AS draw_start,
-                toInt32(H_HALF + (H / (perp_wall_dist + 0.0001)) * 0.5) AS draw_end,
-                (1.0 / (H / (perp_wall_dist + 0.0001))) * TEX_SIZE as tex_step,
-                -(H_HALF - (H / (perp_wall_dist + 0.0001)) * 0.5) * tex_step as tex_base,
-                (if(side, 0.6, 1.0) * (1.0 - least(least(hit_dist, 20.0) * 0.125, 1.0))) AS base_shade,
-                least(if(side, hit_x_wall, hit_y_wall), TEX_MAX) AS tx,
-                hit_x, hit_y, perp_wall_dist
-            FROM (
-                SELECT 
-                    *, raw_hit_dist * (p_dir_x * r_dir_x + p_dir_y * r_dir_y) as perp_wall_dist,
-                    (valid_x + r_dir_x * raw_hit_dist) as hit_x, (valid_y + r_dir_y * raw_hit_dist) as hit_y,
-                    toInt32((hit_x - floor(hit_x)) * TEX_SIZE) as hit_x_wall_raw, toInt32((hit_y - floor(hit_y)) * TEX_SIZE) as hit_y_wall_raw,
-                    if(bitAnd(intHash32(toInt32(hit_y)), 1) = 0, TEX_MAX - hit_x_wall_raw, hit_x_wall_raw) as hit_x_wall,
-                    if(bitAnd(intHash32(toInt32(hit_x)), 1) = 0, TEX_MAX - hit_y_wall_raw, hit_y_wall_raw) as hit_y_wall
-                FROM (
-                    SELECT *, least(dist_x, dist_y) as raw_hit_dist, least(dist_x, dist_y) as hit_dist, (dist_y < dist_x) as side
-                    FROM (
-                        SELECT 
-                            *, arrayMap(i -> (i - valid_x) / r_dir_x, steps) as d_x,
-                            arrayMin(arrayMap((d, i) -> if(d > 0 AND d < 30 AND dictGet('doomhouse.dict_map_data', 'val', toUInt32(floor(valid_y + r_dir_y * d) * MAP_W + floor(valid_x + r_dir_x * d + if(r_dir_x > 0, 0.005, -0.005)) + 1)) > 0, d, 999.0), d_x, steps)) as dist_x,
-                            arrayMap(i -> (i - valid_y) / r_dir_y, steps) as d_y,
-                            arrayMin(arrayMap((d, i) -> if(d > 0 AND d < 30 AND dictGet('doomhouse.dict_map_data', 'val', toUInt32(floor(valid_y + r_dir_y * d + if(r_dir_y > 0, 0.005, -0.005)) * MAP_W + floor(valid_x + r_dir_x * d) + 1)) > 0, d, 999.0), d_y, steps)) as dist_y
-                        FROM (
-                            SELECT 
-                                screen_col.number AS x, p.valid_x, p.valid_y, p.dir_x as p_dir_x, p.dir_y as p_dir_y,
-                                (p.dir_x + p.plane_x * (2.0 * screen_col.number * W_INV - 1.0)) as r_dir_x,
-                                (p.dir_y + p.plane_y * (2.0 * screen_col.number * W_INV - 1.0)) as r_dir_y,
-                                range(1, RAY_STEPS) as steps
-                            FROM (
-                                SELECT 
-                                    toFloat32(dir_x) as dir_x, toFloat32(dir_y) as dir_y, toFloat32(plane_x) as plane_x, toFloat32(plane_y) as plane_y,
-                                    if(dictGet('doomhouse.dict_map_data', 'val', toUInt32(floor(try_y + if(try_y > old_y, 0.2, -0.2)) * MAP_W + floor(valid_x_inter) + 1)) = 0, try_y, old_y) as valid_y,
-                                    valid_x_inter as valid_x
-                                FROM (
-                                    SELECT *, if(dictGet('doomhouse.dict_map_data', 'val', toUInt32(floor(old_y) * MAP_W + floor(try_x + if(try_x > old_x, 0.2, -0.2)) + 1)) = 0, try_x, old_x) as valid_x_inter
-                                    FROM doomhouse.player_input
-                                ) AS pi
-                            ) AS p
-                            CROSS JOIN numbers(W) AS screen_col
-                        )
-                    )
-                )
-            )
-        ) AS rays
-        CROSS JOIN (
-            SELECT number + H_HALF as y, toInt32(number + H_HALF) as dist_lookup_idx, dictGet('doomhouse.dict_floor_dist', 'dist', toUInt32(dist_lookup_idx + 1)) as floor_dist
-            FROM numbers(H_QUARTER)
-        ) AS v_lines
-    ) AS sub
-);
+   11. ONE ROW PER FRAME:
+      Pixels are grouped by (session_id, frame_id). A Materialized View block holds a 
+      single frame, but the batch render mode feeds the rays of many frames of a 
+      trajectory through one query and gets one tile row per frame back.
+
+   12. DYNAMIC RESOLUTION:
+      The render resolution (`res_w` x `res_h`) is part of every input, so the client 
+      can lower it at runtime without redeploying anything. A tile keeps its share of 
+      the frame: its rectangle on the full ${frame_w}x${frame_h} frame is scaled to the 
+      render resolution, and the client scales the finished frame back up.
+
+   13. HALO PIXELS:
+      Post-process filters read the neighbours of every pixel, so a tile is drawn with 
+      ${halo} extra rows and columns on every side (clamped to the frame) that belong to 
+      its neighbours. `post_process_view.sql` filters the whole rectangle and crops the 
+      halo, so the finished tiles match a frame that was filtered in one piece.
+
+   ========================================================================================
+*/
 
 -- =========================================================
--- VIEW 4: QUARTER 4 (Rows 360-479)
+-- TILE ${tile_id}: Columns ${x0}..${x1}, Rows ${y0}..${y1} (at ${frame_w}x${frame_h}), Halo ${halo}
 -- =========================================================
-CREATE MATERIALIZED VIEW doomhouse.render_materialized_4
-TO doomhouse.rendered_frame_4
+CREATE MATERIALIZED VIEW doomhouse.render_materialized_${tile_id}
+TO doomhouse.rendered_frame_${tile_id}
 AS
 WITH 
-    640 AS W,
-    480 AS H,
-    240 AS H_HALF,
-    120 AS H_QUARTER,
-    15 AS MAP_W,
-    512 AS TEX_SIZE,
+    ${tex_size} AS TEX_SIZE,
     CAST(TEX_SIZE - 1, 'Int32') AS TEX_MAX,
-    25 AS RAY_STEPS,
-    CAST(1.0 / W, 'Float32') AS W_INV
+    TEX_SIZE * TEX_SIZE AS TEX_TEXELS,
+    ${mip_levels} AS MIP_LEVELS,
+    ${max_lod} AS MAX_LOD,
+    -- Texels of a surface's whole mip chain: TEX_TEXELS * (1 + 1/4 + 1/16 + ...)
+    intDiv(4 * (TEX_TEXELS - bitShiftRight(TEX_TEXELS, 2 * MIP_LEVELS)), 3) AS SURFACE_TEXELS,
+    -- Atlas surfaces per theme: 0 = wall1, 1 = wall2, 2 = floor, 3 = ceiling
+    4 * SURFACE_TEXELS AS THEME_TEXELS
 SELECT
+    session_id,
+    frame_id,
+    res_w,
+    res_h,
     any(valid_x) as pos_x,
     any(valid_y) as pos_y,
-    arrayMap(x -> x.2, arraySort(k -> k.1, groupArray((y * W + x, final_color)))) AS image_data
+    -- Every pixel is written straight to its row-major slot, no (index, color) tuples to sort
+    groupArrayInsertAt(final_color, pixel_idx) AS image_data
 FROM (
     SELECT
-        x, y, valid_x, valid_y,
+        x, y, pixel_idx, valid_x, valid_y, session_id, frame_id, res_w, res_h,
         multiIf(
             toInt32(y) >= draw_start AND toInt32(y) <= draw_end,
-            CAST(bitOr(bitOr(bitShiftLeft(toUInt32(dictGet('doomhouse.dict_tex_wall1_data', 'r', w_tex_idx) * base_shade), 0), bitShiftLeft(toUInt32(dictGet('doomhouse.dict_tex_wall1_data', 'g', w_tex_idx) * base_shade), 8)), bitShiftLeft(toUInt32(dictGet('doomhouse.dict_tex_wall1_data', 'b', w_tex_idx) * base_shade), 16)), 'UInt32'),
+            ${wall_sample},
             toInt32(y) < draw_start,
-            CAST(bitOr(bitOr(bitShiftLeft(toUInt32(dictGet('doomhouse.dict_tex_ceiling_data', 'r', f_tex_idx) * floor_shade), 0), bitShiftLeft(toUInt32(dictGet('doomhouse.dict_tex_ceiling_data', 'g', f_tex_idx) * floor_shade), 8)), bitShiftLeft(toUInt32(dictGet('doomhouse.dict_tex_ceiling_data', 'b', f_tex_idx) * floor_shade), 16)), 'UInt32'),
-            CAST(bitOr(bitOr(bitShiftLeft(toUInt32(dictGet('doomhouse.dict_tex_floor_data', 'r', f_tex_idx) * floor_shade), 0), bitShiftLeft(toUInt32(dictGet('doomhouse.dict_tex_floor_data', 'g', f_tex_idx) * floor_shade), 8)), bitShiftLeft(toUInt32(dictGet('doomhouse.dict_tex_floor_data', 'b', f_tex_idx) * floor_shade), 16)), 'UInt32')
+            ${ceiling_sample},
+            ${floor_sample}
         ) AS final_color
     FROM (
         SELECT 
-            x, y, rays.valid_x, rays.valid_y, rays.draw_start, rays.draw_end, rays.base_shade, 
+            x, y, rays.valid_x, rays.valid_y, rays.session_id, rays.frame_id, rays.res_w, rays.res_h, 
+            -- Row-major index in the halo rectangle: (y - halo top) * halo width + (x - halo left)
+            toUInt32(
+                (y - greatest(intDiv(${y0} * rays.res_h, ${frame_h}) - ${halo}, 0))
+                    * (least(intDiv((${x1} + 1) * rays.res_w, ${frame_w}) + ${halo}, rays.res_w) - greatest(intDiv(${x0} * rays.res_w, ${frame_w}) - ${halo}, 0))
+                + x - greatest(intDiv(${x0} * rays.res_w, ${frame_w}) - ${halo}, 0)
+            ) as pixel_idx,
+            rays.draw_start, rays.draw_end, rays.base_shade, 
+            toInt32(if(y < intDiv(rays.res_h, 2), rays.res_h - 1 - y, y)) as dist_lookup_idx,
+            dictGet('doomhouse.dict_floor_dist', 'dist', toUInt32(rays.res_h * 512 + dist_lookup_idx + 1)) as floor_dist,
             (1.0 - least(floor_dist * 0.125, 1.0)) as floor_shade,
-            toUInt32((least(greatest(toInt32(y * rays.tex_step + rays.tex_base), 0), TEX_MAX) * TEX_SIZE) + rays.tx + 1) as w_tex_idx,
-            toUInt32((bitAnd(toInt32((rays.valid_y + floor_dist * ((rays.hit_y - rays.valid_y) / (rays.perp_wall_dist + 0.001))) * TEX_SIZE), TEX_MAX) * TEX_SIZE) + bitAnd(toInt32((rays.valid_x + floor_dist * ((rays.hit_x - rays.valid_x) / (rays.perp_wall_dist + 0.001))) * TEX_SIZE), TEX_MAX) + 1) as f_tex_idx
+            toUInt32(rays.theme * THEME_TEXELS) as theme_base,
+            -- Mip level: one level per doubling of texels per screen pixel (per column for walls, per row for floors)
+            least(toUInt8(greatest(floor(log2(rays.tex_step)), 0)), MAX_LOD) as wall_lod,
+            -- Floor texels covered by one screen column per unit of distance (camera plane is 2 * 0.66 wide)
+            least(toUInt8(greatest(floor(log2(floor_dist * (TEX_SIZE * 1.32 / rays.res_w))), 0)), MAX_LOD) as floor_lod,
+            least(greatest(toInt32(y * rays.tex_step + rays.tex_base), 0), TEX_MAX) as w_ty,
+            bitAnd(toInt32((rays.valid_y + floor_dist * ((rays.hit_y - rays.valid_y) / (rays.perp_wall_dist + 0.001))) * TEX_SIZE), TEX_MAX) as f_ty,
+            bitAnd(toInt32((rays.valid_x + floor_dist * ((rays.hit_x - rays.valid_x) / (rays.perp_wall_dist + 0.001))) * TEX_SIZE), TEX_MAX) as f_tx,
+            toUInt32(theme_base + intDiv(4 * (TEX_TEXELS - bitShiftRight(TEX_TEXELS, 2 * wall_lod)), 3) + bitShiftRight(w_ty, wall_lod) * bitShiftRight(TEX_SIZE, wall_lod) + bitShiftRight(rays.tx, wall_lod) + 1) as w_tex_idx,
+            toUInt32(theme_base + 2 * SURFACE_TEXELS + intDiv(4 * (TEX_TEXELS - bitShiftRight(TEX_TEXELS, 2 * floor_lod)), 3) + bitShiftRight(f_ty, floor_lod) * bitShiftRight(TEX_SIZE, floor_lod) + bitShiftRight(f_tx, floor_lod) + 1) as f_tex_idx,
+            f_tex_idx + SURFACE_TEXELS as c_tex_idx
         FROM (
-            SELECT 
-                x, valid_x, valid_y,
-                toInt32(H_HALF - (H / (perp_wall_dist + 0.0001)) * 0.5) AS draw_start,
-                toInt32(H_HALF + (H / (perp_wall_dist + 0.0001)) * 0.5) AS draw_end,
-                (1.0 / (H / (perp_wall_dist + 0.0001))) * TEX_SIZE as tex_step,
-                -(H_HALF - (H / (perp_wall_dist + 0.0001)) * 0.5) * tex_step as tex_base,
-                (if(side, 0.6, 1.0) * (1.0 - least(least(hit_dist, 20.0) * 0.125, 1.0))) AS base_shade,
-                least(if(side, hit_x_wall, hit_y_wall), TEX_MAX) AS tx,
-                hit_x, hit_y, perp_wall_dist
-            FROM (
-                SELECT 
-                    *, raw_hit_dist * (p_dir_x * r_dir_x + p_dir_y * r_dir_y) as perp_wall_dist,
-                    (valid_x + r_dir_x * raw_hit_dist) as hit_x, (valid_y + r_dir_y * raw_hit_dist) as hit_y,
-                    toInt32((hit_x - floor(hit_x)) * TEX_SIZE) as hit_x_wall_raw, toInt32((hit_y - floor(hit_y)) * TEX_SIZE) as hit_y_wall_raw,
-                    if(bitAnd(intHash32(toInt32(hit_y)), 1) = 0, TEX_MAX - hit_x_wall_raw, hit_x_wall_raw) as hit_x_wall,
-                    if(bitAnd(intHash32(toInt32(hit_x)), 1) = 0, TEX_MAX - hit_y_wall_raw, hit_y_wall_raw) as hit_y_wall
-                FROM (
-                    SELECT *, least(dist_x, dist_y) as raw_hit_dist, least(dist_x, dist_y) as hit_dist, (dist_y < dist_x) as side
-                    FROM (
-                        SELECT 
-                            *, arrayMap(i -> (i - valid_x) / r_dir_x, steps) as d_x,
-                            arrayMin(arrayMap((d, i) -> if(d > 0 AND d < 30 AND dictGet('doomhouse.dict_map_data', 'val', toUInt32(floor(valid_y + r_dir_y * d) * MAP_W + floor(valid_x + r_dir_x * d + if(r_dir_x > 0, 0.005, -0.005)) + 1)) > 0, d, 999.0), d_x, steps)) as dist_x,
-                            arrayMap(i -> (i - valid_y) / r_dir_y, steps) as d_y,
-                            arrayMin(arrayMap((d, i) -> if(d > 0 AND d < 30 AND dictGet('doomhouse.dict_map_data', 'val', toUInt32(floor(valid_y + r_dir_y * d + if(r_dir_y > 0, 0.005, -0.005)) * MAP_W + floor(valid_x + r_dir_x * d) + 1)) > 0, d, 999.0), d_y, steps)) as dist_y
-                        FROM (
-                            SELECT 
-                                screen_col.number AS x, p.valid_x, p.valid_y, p.dir_x as p_dir_x, p.dir_y as p_dir_y,
-                                (p.dir_x + p.plane_x * (2.0 * screen_col.number * W_INV - 1.0)) as r_dir_x,
-                                (p.dir_y + p.plane_y * (2.0 * screen_col.number * W_INV - 1.0)) as r_dir_y,
-                                range(1, RAY_STEPS) as steps
-                            FROM (
-                                SELECT 
-                                    toFloat32(dir_x) as dir_x, toFloat32(dir_y) as dir_y, toFloat32(plane_x) as plane_x, toFloat32(plane_y) as plane_y,
-                                    if(dictGet('doomhouse.dict_map_data', 'val', toUInt32(floor(try_y + if(try_y > old_y, 0.2, -0.2)) * MAP_W + floor(valid_x_inter) + 1)) = 0, try_y, old_y) as valid_y,
-                                    valid_x_inter as valid_x
-                                FROM (
-                                    SELECT *, if(dictGet('doomhouse.dict_map_data', 'val', toUInt32(floor(old_y) * MAP_W + floor(try_x + if(try_x > old_x, 0.2, -0.2)) + 1)) = 0, try_x, old_x) as valid_x_inter
-                                    FROM doomhouse.player_input
-                                ) AS pi
-                            ) AS p
-                            CROSS JOIN numbers(W) AS screen_col
-                        )
-                    )
-                )
-            )
+            -- This tile's columns and rows, scaled from the full frame to the render resolution, plus the halo
+            SELECT *, arrayJoin(range(toUInt32(greatest(intDiv(${y0} * res_h, ${frame_h}) - ${halo}, 0)), least(intDiv((${y1} + 1) * res_h, ${frame_h}) + ${halo}, res_h))) AS y
+            FROM ${rays}
+            WHERE x >= greatest(intDiv(${x0} * res_w, ${frame_w}) - ${halo}, 0) AND x < least(intDiv((${x1} + 1) * res_w, ${frame_w}) + ${halo}, res_w)
         ) AS rays
-        CROSS JOIN (
-            SELECT number + H_HALF + H_QUARTER as y, toInt32(number + H_HALF + H_QUARTER) as dist_lookup_idx, dictGet('doomhouse.dict_floor_dist', 'dist', toUInt32(dist_lookup_idx + 1)) as floor_dist
-            FROM numbers(H_QUARTER)
-        ) AS v_lines
     ) AS sub
-);
+)
+GROUP BY session_id, frame_id, res_w, res_h;
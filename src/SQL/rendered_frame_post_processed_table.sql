@@ -1,31 +1,12 @@
-CREATE TABLE doomhouse.rendered_frame_post_processed_1 (
+-- Keeps the latest frame of every session, fetched by (session_id, frame_id).
+-- A Join table keyed by session_id replaces a session's row on every INSERT, so
+-- other sessions can never evict it between the INSERT and the fetch.
+CREATE TABLE doomhouse.rendered_frame_post_processed_${tile_id} (
+    session_id String,
+    frame_id UInt64,
     pos_x Float32,
     pos_y Float32,
-    image_data Array(UInt32)
+    image_data String
 )
-ENGINE = Memory 
-SETTINGS min_rows_to_keep = 1, max_rows_to_keep = 1;
-
-CREATE TABLE doomhouse.rendered_frame_post_processed_2 (
-    pos_x Float32,
-    pos_y Float32,
-    image_data Array(UInt32)
-)
-ENGINE = Memory 
-SETTINGS min_rows_to_keep = 1, max_rows_to_keep = 1;
-
-CREATE TABLE doomhouse.rendered_frame_post_processed_3 (
-    pos_x Float32,
-    pos_y Float32,
-    image_data Array(UInt32)
-)
-ENGINE = Memory 
-SETTINGS min_rows_to_keep = 1, max_rows_to_keep = 1;
-
-CREATE TABLE doomhouse.rendered_frame_post_processed_4 (
-    pos_x Float32,
-    pos_y Float32,
-    image_data Array(UInt32)
-)
-ENGINE = Memory 
-SETTINGS min_rows_to_keep = 1, max_rows_to_keep = 1;
+ENGINE = Join(ANY, LEFT, session_id)
+SETTINGS join_any_take_last_row = 1;
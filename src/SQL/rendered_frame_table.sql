@@ -1,32 +1,9 @@
-CREATE TABLE doomhouse.rendered_frame_1
-(
-    pos_x Float32,
-    pos_y Float32,
-    image_data Array(UInt32)
-)
-ENGINE = Memory 
-SETTINGS min_rows_to_keep = 1, max_rows_to_keep = 1;
-
-CREATE TABLE doomhouse.rendered_frame_2
-(
-    pos_x Float32,
-    pos_y Float32,
-    image_data Array(UInt32)
-)
-ENGINE = Memory 
-SETTINGS min_rows_to_keep = 1, max_rows_to_keep = 1;
-
-CREATE TABLE doomhouse.rendered_frame_3
-(
-    pos_x Float32,
-    pos_y Float32,
-    image_data Array(UInt32)
-)
-ENGINE = Memory 
-SETTINGS min_rows_to_keep = 1, max_rows_to_keep = 1;
-
-CREATE TABLE doomhouse.rendered_frame_4
+CREATE TABLE doomhouse.rendered_frame_${tile_id}
 (
+    session_id String,
+    frame_id UInt64,
+    res_w UInt16,
+    res_h UInt16,
     pos_x Float32,
     pos_y Float32,
     image_data Array(UInt32)
@@ -0,0 +1,26 @@
+-- One row per screen column of every input. The render views only read the block each
+-- input inserts, so the table only keeps the rays of the last frame at the full
+-- resolution (${keep_rays} columns, the planned frame width) for inspection.
+CREATE TABLE doomhouse.rendered_rays
+(
+    x UInt16,
+    valid_x Float64,
+    valid_y Float64,
+    draw_start Int32,
+    draw_end Int32,
+    tex_step Float64,
+    tex_base Float64,
+    base_shade Float64,
+    tx Int32,
+    hit_x Float64,
+    hit_y Float64,
+    perp_wall_dist Float64,
+    lookups UInt32,
+    theme UInt8,
+    session_id String,
+    frame_id UInt64,
+    res_w UInt16,
+    res_h UInt16
+)
+ENGINE = Memory 
+SETTINGS min_rows_to_keep = ${keep_rays}, max_rows_to_keep = ${keep_rays};
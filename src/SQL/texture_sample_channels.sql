@@ -0,0 +1,7 @@
+/*
+   TEXTURE SAMPLING: SEPARATE CHANNELS (Fragment of `render_view.sql`)
+   Looks up the `r`, `g` and `b` attributes of the texture atlas separately and 
+   packs the shaded color into a UInt32 (0xBBGGRR). `${idx}` is the atlas id and 
+   `${shade}` the light factor.
+*/
+CAST(bitOr(bitOr(bitShiftLeft(toUInt32(dictGet('doomhouse.dict_tex_atlas', 'r', ${idx}) * ${shade}), 0), bitShiftLeft(toUInt32(dictGet('doomhouse.dict_tex_atlas', 'g', ${idx}) * ${shade}), 8)), bitShiftLeft(toUInt32(dictGet('doomhouse.dict_tex_atlas', 'b', ${idx}) * ${shade}), 16)), 'UInt32')
@@ -0,0 +1,8 @@
+/*
+   TEXTURE SAMPLING: PACKED RGB (Fragment of `render_view.sql`)
+   Looks up the packed `rgb` attribute (0xBBGGRR) of the texture atlas once and 
+   shades its channels with bit operations. The three `dictGet` calls are the 
+   same expression, which ClickHouse evaluates only once. `${idx}` is the atlas 
+   id and `${shade}` the light factor.
+*/
+CAST(bitOr(bitOr(toUInt32(bitAnd(dictGet('doomhouse.dict_tex_atlas', 'rgb', ${idx}), 0xFF) * ${shade}), bitShiftLeft(toUInt32(bitAnd(bitShiftRight(dictGet('doomhouse.dict_tex_atlas', 'rgb', ${idx}), 8), 0xFF) * ${shade}), 8)), bitShiftLeft(toUInt32(bitShiftRight(dictGet('doomhouse.dict_tex_atlas', 'rgb', ${idx}), 16) * ${shade}), 16)), 'UInt32')
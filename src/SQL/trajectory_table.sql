@@ -0,0 +1,15 @@
+-- Poses of a trajectory rendered in batches (see `Renderer.render_trajectory()`), one row per frame
+CREATE TABLE ${table}
+(
+    frame_id UInt64,
+    old_x Float64,
+    old_y Float64,
+    try_x Float64,
+    try_y Float64,
+    dir_x Float64,
+    dir_y Float64,
+    plane_x Float64,
+    plane_y Float64,
+    theme UInt8 DEFAULT 0
+)
+ENGINE = Memory;
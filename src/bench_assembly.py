@@ -0,0 +1,67 @@
+"""
+Frame assembly benchmark: scattering pixels into place vs. sorting them.
+
+The render view collects every pixel of a tile into one image array. It used
+to gather (index, color) tuples and sort them by index, and now scatters each
+color straight to its row-major slot with `groupArrayInsertAt`. This renders
+the same poses as `bench_raycast.py` with both assemblies in the single-query
+render mode, at several resolutions and tile counts, and reports the median
+frame time and the peak server memory per frame, read from `system.query_log`.
+Needs a running ClickHouse with the DOOMHouse schema loaded (start
+`src/DOOMHouse.py` once), and reads the same `.env` settings.
+
+Usage: python src/bench_assembly.py [repeats]
+"""
+import statistics
+import sys
+import uuid
+
+import render_plan
+import texture_store
+from bench_common import connect, median_ms, poses
+from game_map import load_map
+from renderer import MAP_FILE, TEXTURE_SIZE, TEXTURE_SAMPLING
+from resolution import scaled_resolutions
+
+SCATTER = "groupArrayInsertAt(final_color, pixel_idx)"
+ASSEMBLIES = {
+    "scatter": SCATTER,
+    "sort": "arrayMap(x -> x.2, arraySort(k -> k.1, groupArray((y * res_w + x, final_color))))",
+}
+TILE_COUNTS = (1, 4)
+
+
+def _peak_memory(client, run_id):
+    client.command("SYSTEM FLUSH LOGS")
+    return client.query(
+        "SELECT max(memory_usage) FROM system.query_log WHERE type = 'QueryFinish' AND startsWith(query_id, {prefix:String})",
+        parameters={"prefix": f"{run_id}-"},
+    ).result_rows[0][0]
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    client = connect()
+    game_map = load_map(MAP_FILE)
+    map_size = (game_map.width, game_map.height)
+    sampling = render_plan.sampling_params(TEXTURE_SAMPLING, TEXTURE_SIZE, texture_store.mip_levels(TEXTURE_SIZE), 0)
+    run_id = f"doomhouse-assembly-{uuid.uuid4()}"
+
+    print(f"{'tiles':>5} {'resolution':>11} {'assembly':<8} {'frame (ms)':>11} {'peak (MiB)':>11}")
+    for tile_count in TILE_COUNTS:
+        tiles = render_plan.plan_tiles(tile_count, "rows", 640, 480)
+        shipped = render_plan.frame_query(tiles, "brute", map_size, sampling)
+        for res_w, res_h in scaled_resolutions((640, 480), (1.0, 0.75, 0.5)):
+            for name, assembly in ASSEMBLIES.items():
+                query = shipped.replace(SCATTER, assembly)
+                tag = f"{run_id}-{tile_count}-{res_w}x{res_h}-{name}"
+                frame_ms = [
+                    median_ms(client, query, repeats, parameters=dict(pose, res_w=res_w, res_h=res_h), query_id=f"{tag}-{i}")
+                    for i, pose in enumerate(poses(game_map))
+                ]
+                peak = _peak_memory(client, tag) / 2 ** 20
+                print(f"{tile_count:>5} {f'{res_w}x{res_h}':>11} {name:<8} {statistics.mean(frame_ms):>11.2f} {peak:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Shared helpers of the server benchmarks (`bench_*.py`).
+
+The connection and scene settings are the ones of `renderer.py`, so every
+benchmark talks to the same server and expects the scene `src/DOOMHouse.py`
+deploys with the same `.env` settings.
+"""
+import math
+import random
+import statistics
+import time
+
+import clickhouse_connect
+
+from renderer import HOST, PORT, USER, PASS
+
+# Open cells sampled from the map, each viewed from 8 directions
+POSITIONS = 5
+ANGLES = [i * math.pi / 4 for i in range(8)]
+
+
+def connect():
+    return clickhouse_connect.get_client(host=HOST, port=PORT, username=USER, password=PASS)
+
+
+def poses(game_map):
+    """Full-resolution poses at a fixed sample of the map's open cells."""
+    open_cells = [i for i, val in enumerate(game_map.cells) if val == 0]
+    for i in random.Random(0).sample(open_cells, min(POSITIONS, len(open_cells))):
+        x, y = i % game_map.width + 0.5, i // game_map.width + 0.5
+        for angle in ANGLES:
+            yield {
+                "old_x": x, "old_y": y, "try_x": x, "try_y": y,
+                "dir_x": math.cos(angle), "dir_y": math.sin(angle),
+                "plane_x": 0.66 * math.sin(angle), "plane_y": -0.66 * math.cos(angle),
+                "theme": 0, "res_w": 640, "res_h": 480,
+            }
+
+
+def median_ms(client, query, repeats, parameters=None, query_id=None, warmup=False):
+    """Median time (ms) of `repeats` runs of the query, each tagged `<query_id>-<run>` if given."""
+    if warmup:
+        client.raw_query(query, parameters=parameters, fmt='RowBinary')
+    timings = []
+    for i in range(repeats):
+        settings = {"query_id": f"{query_id}-{i}"} if query_id else None
+        start = time.perf_counter()
+        client.raw_query(query, parameters=parameters, fmt='RowBinary', settings=settings)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
@@ -0,0 +1,168 @@
+"""
+Offline transfer and decode benchmark for the frame encodings.
+
+Renders the frames of a scripted camera path with the NumPy reference renderer
+(which produces the same tile bytes as the server's post-process stage, see
+`reference_renderer.py`), so no ClickHouse server is needed. For every frame
+encoding (`DOOMHOUSE_FRAME_ENCODING`) and HTTP response compression
+(`DOOMHOUSE_HTTP_COMPRESSION`) it reports the bytes per frame on the wire and
+the client time to turn them into a frame: decompress, parse the RowBinary
+tiles, expand the pixels to RGB24 and blit them into the frame buffer.
+Compression uses the server's default level (`http_zlib_compression_level` 3).
+Brotli and zstd are measured when the `brotli` and `zstandard` packages are
+installed.
+
+The first row is the transport before the binary frames: the driver's
+conversion of every tile's Array(UInt32) into a Python list of ints, on the
+RGB24 pixels of the same frames.
+
+Usage: python src/bench_decode.py [path] [iterations]
+"""
+import array
+import struct
+import sys
+import time
+import zlib
+
+from PIL import Image
+
+import camera_paths
+import render_plan
+import renderer as engine
+from framebuffer import FrameBuffer, decode_pixels, parse_tiles
+from game_map import load_map
+from reference_renderer import ReferenceRenderer, load_atlas
+
+# ClickHouse's default http_zlib_compression_level
+COMPRESSION_LEVEL = 3
+
+
+def _varint(value):
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _zlib_codec(wbits):
+    def compress(data):
+        compressor = zlib.compressobj(COMPRESSION_LEVEL, zlib.DEFLATED, wbits)
+        return compressor.compress(data) + compressor.flush()
+    return compress, lambda data: zlib.decompress(data, wbits)
+
+
+def compressions():
+    """(compress, decompress) pairs of the HTTP codecs available here, by Accept-Encoding name."""
+    codecs = {"none": (bytes, lambda data: data), "gzip": _zlib_codec(31), "deflate": _zlib_codec(15)}
+    try:
+        import brotli
+        codecs["br"] = (lambda data: brotli.compress(data, quality=COMPRESSION_LEVEL), brotli.decompress)
+    except ImportError:
+        pass
+    try:
+        import zstandard
+        codecs["zstd"] = (
+            zstandard.ZstdCompressor(level=COMPRESSION_LEVEL).compress,
+            zstandard.ZstdDecompressor().decompress,
+        )
+    except ImportError:
+        pass
+    return codecs
+
+
+def open_reference(game_map):
+    """A reference renderer with the game's tiling and texture settings."""
+    tiles = render_plan.plan_tiles(engine.TILE_COUNT or 4, engine.TILE_LAYOUT, engine.FRAME_WIDTH, engine.FRAME_HEIGHT)
+    theme_names = list(engine.TEXTURE_THEMES.keys())
+    atlas = load_atlas(
+        theme_names, engine.TEXTURE_THEMES, engine.TEXTURE_SURFACES, engine.TEXTURE_SIZE, engine.TEXTURE_INTENSITY,
+        engine.TEXTURE_MIP_LEVELS, engine.TEXTURE_CACHE_DIR or None,
+    )
+    return ReferenceRenderer(
+        game_map, tiles, engine.RAYCAST, atlas, engine.TEXTURE_SIZE, engine.TEXTURE_MIP_LEVELS, engine.TEXTURE_MAX_LOD,
+    )
+
+
+def render_payloads(reference, poses):
+    """One RowBinary response body per frame, as `render_plan.frame_query` returns it."""
+    return [
+        b"".join(
+            struct.pack('<Iff', tile_id, pos_x, pos_y) + _varint(len(pixels)) + pixels
+            for tile_id, pos_x, pos_y, pixels in reference.render(pose)
+        )
+        for pose in poses
+    ]
+
+
+def decode_frame(frame, tiles, encoding, decompress, body):
+    """The client path: decompress, parse, expand to RGB24, blit, wrap."""
+    for tile_id, _, _, pixels in parse_tiles(decompress(body)):
+        frame.blit(tiles[tile_id - 1], decode_pixels(encoding, pixels))
+    return frame.image()
+
+
+def decode_uint32_rows(rgbx_tiles):
+    """The previous path: Python int lists per tile, concatenated and repacked."""
+    rows = [array.array('I', raw).tolist() for raw in rgbx_tiles]
+    pixel_data = rows[0]
+    for row in rows[1:]:
+        pixel_data = pixel_data + row
+    raw_bytes = array.array('I', pixel_data).tobytes()
+    return Image.frombytes("RGB", (engine.FRAME_WIDTH, engine.FRAME_HEIGHT), raw_bytes, "raw", "RGBX")
+
+
+def _uint32_tiles(tiles, body):
+    """The RGB24 tiles of a frame body as the Array(UInt32) bytes the old transport carried."""
+    rgbx_tiles = []
+    for _, _, _, rgb in parse_tiles(body):
+        rgbx = bytearray(len(rgb) // 3 * 4)
+        rgbx[0::4], rgbx[1::4], rgbx[2::4] = rgb[0::3], rgb[1::3], rgb[2::3]
+        rgbx_tiles.append(bytes(rgbx))
+    return rgbx_tiles
+
+
+def _time_per_frame(fn, items, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for item in items:
+            fn(item)
+    return (time.perf_counter() - start) * 1000 / (iterations * len(items))
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else "rotate"
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    game_map = load_map(engine.MAP_FILE)
+    poses = camera_paths.SCRIPTED_PATHS[path](game_map)
+    reference = open_reference(game_map)
+    tiles = reference.tiles
+    codecs = compressions()
+    print(f"{len(poses)} frames of '{path}' at {engine.FRAME_WIDTH}x{engine.FRAME_HEIGHT}, "
+          f"compression level {COMPRESSION_LEVEL}, {', '.join(codecs)}")
+
+    print(f"{'encoding':<10} {'compression':<12} {'KiB/frame':>10} {'ratio':>6} {'decode (ms)':>12}")
+    raw_bytes = None
+    for encoding in render_plan.FRAME_ENCODINGS:
+        reference.encoding = encoding
+        payloads = render_payloads(reference, poses)
+        if encoding == "rgb24":
+            uint32_frames = [_uint32_tiles(tiles, body) for body in payloads]
+            raw_bytes = sum(len(t) for t in uint32_frames[0]) * len(payloads)
+            decode_ms = _time_per_frame(decode_uint32_rows, uint32_frames, iterations)
+            print(f"{'uint32':<10} {'none':<12} {raw_bytes / len(payloads) / 1024:>10.0f} {1.0:>6.2f} {decode_ms:>12.2f}")
+        frame = FrameBuffer(engine.FRAME_WIDTH, engine.FRAME_HEIGHT)
+        for name, (compress, decompress) in codecs.items():
+            bodies = [compress(body) for body in payloads]
+            total = sum(len(body) for body in bodies)
+            decode_ms = _time_per_frame(lambda body: decode_frame(frame, tiles, encoding, decompress, body), bodies, iterations)
+            print(f"{encoding:<10} {name:<12} {total / len(bodies) / 1024:>10.0f} "
+                  f"{raw_bytes / total:>6.2f} {decode_ms:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
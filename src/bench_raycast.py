@@ -0,0 +1,48 @@
+"""
+Ray traversal benchmark: brute-force grid crossings vs. DDA with early exit
+vs. distance-field skipping.
+
+For a fixed set of poses, renders the ray stage alone and the full frame with
+each traversal, and reports map lookups per frame and median render times.
+Needs a running ClickHouse with the DOOMHouse schema loaded (start
+`src/DOOMHouse.py` once with the same `DOOMHOUSE_MAP`), and reads the same
+`.env` settings. Poses are sampled from the open cells of that map.
+
+Usage: python src/bench_raycast.py [repeats]
+"""
+import statistics
+import sys
+
+import render_plan
+import texture_store
+from bench_common import connect, median_ms, poses
+from game_map import load_map
+from renderer import MAP_FILE, TEXTURE_SIZE, TEXTURE_SAMPLING
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    client = connect()
+    tiles = render_plan.plan_tiles(4, "rows", 640, 480)
+    game_map = load_map(MAP_FILE)
+    map_size = (game_map.width, game_map.height)
+    sampling = render_plan.sampling_params(TEXTURE_SAMPLING, TEXTURE_SIZE, texture_store.mip_levels(TEXTURE_SIZE), 0)
+    print(f"Map '{MAP_FILE}': {game_map.width}x{game_map.height} cells")
+
+    print(f"{'traversal':<10} {'lookups/frame':>14} {'rays (ms)':>10} {'frame (ms)':>11}")
+    for traversal in render_plan.RAY_TRAVERSALS:
+        ray_query = render_plan.ray_query(traversal, map_size, TEXTURE_SIZE)
+        frame_query = render_plan.frame_query(tiles, traversal, map_size, sampling)
+        lookups, ray_ms, frame_ms = [], [], []
+        for pose in poses(game_map):
+            lookups.append(client.query(f"SELECT sum(lookups) FROM ({ray_query})", parameters=pose).result_rows[0][0])
+            ray_ms.append(median_ms(client, ray_query, repeats, parameters=pose))
+            frame_ms.append(median_ms(client, frame_query, repeats, parameters=pose))
+        print(
+            f"{traversal:<10} {statistics.mean(lookups):>14.0f} "
+            f"{statistics.mean(ray_ms):>10.2f} {statistics.mean(frame_ms):>11.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
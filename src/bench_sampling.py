@@ -0,0 +1,43 @@
+"""
+Texture sampling benchmark: channel vs. packed RGB lookups, with and without mipmaps.
+
+Renders the same poses as `bench_raycast.py` with every texture sampling mode
+in the single-query render mode, and reports median frame times. Needs a
+running ClickHouse with the DOOMHouse schema loaded (start `src/DOOMHouse.py`
+once), and reads the same `.env` settings.
+
+Usage: python src/bench_sampling.py [repeats]
+"""
+import statistics
+import sys
+
+import render_plan
+import texture_store
+from bench_common import connect, median_ms, poses
+from game_map import load_map
+from renderer import MAP_FILE, TEXTURE_SIZE, TEXTURE_STORAGE
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    client = connect()
+    tiles = render_plan.plan_tiles(4, "rows", 640, 480)
+    game_map = load_map(MAP_FILE)
+    map_size = (game_map.width, game_map.height)
+    mip_levels = texture_store.mip_levels(TEXTURE_SIZE)
+
+    print(f"{'sampling':<10} {'mipmaps':>8} {'frame (ms)':>11} {'p90 (ms)':>9}")
+    for sampling in render_plan.TEXTURE_SAMPLINGS:
+        if not texture_store.storage_supports(TEXTURE_STORAGE, sampling):
+            # The deployed atlas does not hold the attributes this sampling reads
+            continue
+        for max_lod in (0, mip_levels - 1):
+            params = render_plan.sampling_params(sampling, TEXTURE_SIZE, mip_levels, max_lod)
+            frame_query = render_plan.frame_query(tiles, "brute", map_size, params)
+            frame_ms = [median_ms(client, frame_query, repeats, parameters=pose) for pose in poses(game_map)]
+            p90 = statistics.quantiles(frame_ms, n=10)[-1]
+            print(f"{sampling:<10} {'on' if max_lod else 'off':>8} {statistics.mean(frame_ms):>11.2f} {p90:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
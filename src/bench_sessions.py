@@ -0,0 +1,161 @@
+"""
+Multi-session load generator: N players rendering concurrently on one server.
+
+Every simulated session is a `Renderer` with its own session id and
+connections, replaying a camera path (see `camera_paths.py`) back to back,
+like a player holding down a key. Sessions start at staggered offsets into
+the path, so they render different frames at the same time. The MV pipeline
+is shared by all sessions: each INSERT carries its session id and every
+session fetches only its own frame from the tile tables, which keep the latest
+frame of every session.
+
+Reports the frame latency percentiles and FPS of every session and the
+aggregate frames per second of the server. A frame that fails to render or
+does not come back for its session counts as an error.
+
+Reads the same `.env` settings as the game and uses the deployed scene,
+deploying it first if it differs (or always with `--setup`).
+
+Usage: python src/bench_sessions.py [--sessions N] [--mode mv|query] [--path NAME|FILE]
+                                    [--frames N] [--out FILE] [--setup]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import threading
+import time
+
+import camera_paths
+import renderer as engine
+from bench_suite import summarize
+from renderer import Renderer
+
+
+class Session(threading.Thread):
+    """Renders `frames` poses of a path, starting at `offset`, and times every frame."""
+
+    def __init__(self, renderer, poses, offset, frames, start):
+        super().__init__(name=f"session-{renderer.session_id}", daemon=True)
+        self.renderer = renderer
+        self.poses = poses
+        self.offset = offset
+        self.frames = frames
+        self.start_barrier = start
+        self.latency_ms = []
+        self.errors = 0
+        self.last_error = None
+        self.elapsed = 0.0
+
+    def run(self):
+        self.start_barrier.wait()
+        run_start = time.perf_counter()
+        for i in range(self.frames):
+            pose = self.poses[(self.offset + i) % len(self.poses)]
+            start = time.perf_counter()
+            try:
+                self.renderer.render(pose)
+            except Exception as e:
+                self.errors += 1
+                self.last_error = str(e)
+                continue
+            self.latency_ms.append((time.perf_counter() - start) * 1000)
+        self.elapsed = time.perf_counter() - run_start
+
+    def result(self):
+        return {
+            "session_id": self.renderer.session_id,
+            "offset": self.offset,
+            "frames": len(self.latency_ms),
+            "errors": self.errors,
+            "last_error": self.last_error,
+            "latency_ms": summarize(self.latency_ms),
+            "fps": len(self.latency_ms) / self.elapsed if self.elapsed else 0.0,
+        }
+
+
+def open_sessions(count, mode, deploy):
+    """Connect `count` renderers. The first one deploys the scene if needed, the others attach to it."""
+    renderers = []
+    for i in range(count):
+        renderer = Renderer(render_mode=mode, frame_cache_mb=0, trace_file="", session_id=f"load{i}")
+        # Only the first session's connection log is of interest
+        with contextlib.redirect_stdout(io.StringIO()) if i else contextlib.nullcontext():
+            renderer.connect()
+            renderer.load_scene(deploy=deploy if i == 0 else False)
+        renderers.append(renderer)
+    return renderers
+
+
+def print_results(results):
+    print(f"{'session':<10} {'frames':>6} {'errors':>6} {'fps':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}")
+    for session in results["sessions"]:
+        latency = session["latency_ms"]
+        cells = [f"{latency[key]:.1f}" if latency else "-" for key in ("p50", "p95", "p99", "max")]
+        print(f"{session['session_id']:<10} {session['frames']:>6} {session['errors']:>6} {session['fps']:>6.1f} "
+              + " ".join(f"{cell:>8}" for cell in cells))
+    total = results["total"]
+    latency = total["latency_ms"]
+    print(f"{'all':<10} {total['frames']:>6} {total['errors']:>6} {total['fps']:>6.1f} "
+          + (f"{latency['p50']:>8.1f} {latency['p95']:>8.1f} {latency['p99']:>8.1f} {latency['max']:>8.1f}" if latency else ""))
+    for session in results["sessions"]:
+        if session["last_error"]:
+            print(f"⚠️ {session['session_id']}: {session['last_error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate concurrent DOOMHouse sessions on one server")
+    parser.add_argument("--sessions", type=int, default=4, help="concurrent sessions")
+    parser.add_argument("--mode", choices=engine.RENDER_MODES, default=engine.RENDER_MODE)
+    parser.add_argument("--path", default="corridor", help="scripted path name or recorded .jsonl file")
+    parser.add_argument("--frames", type=int, default=100, help="frames rendered by every session")
+    parser.add_argument("--out", help="also write the results to this JSON file")
+    parser.add_argument("--setup", action="store_true", help="deploy the scene even if it is already deployed")
+    args = parser.parse_args()
+
+    renderers = open_sessions(args.sessions, args.mode, True if args.setup else None)
+    if args.path in camera_paths.SCRIPTED_PATHS:
+        poses = camera_paths.SCRIPTED_PATHS[args.path](renderers[0].game_map)
+    else:
+        poses = camera_paths.load_path(args.path)
+
+    start = threading.Barrier(args.sessions + 1)
+    sessions = [
+        Session(renderer, poses, i * len(poses) // args.sessions, args.frames, start)
+        for i, renderer in enumerate(renderers)
+    ]
+    print(f"👥 {args.sessions} sessions x {args.frames} frames of '{args.path}' ({args.mode} mode, {len(renderers[0].tiles)} tiles)")
+    for session in sessions:
+        session.start()
+    start.wait()
+    run_start = time.perf_counter()
+    for session in sessions:
+        session.join()
+    elapsed = time.perf_counter() - run_start
+    for renderer in renderers:
+        renderer.close()
+
+    frames = sum(len(session.latency_ms) for session in sessions)
+    results = {
+        "server_version": renderers[0].server_version, "host": engine.HOST, "mode": args.mode,
+        "path": args.path, "tiles": len(renderers[0].tiles),
+        "sessions": [session.result() for session in sessions],
+        "total": {
+            "frames": frames,
+            "errors": sum(session.errors for session in sessions),
+            "latency_ms": summarize([ms for session in sessions for ms in session.latency_ms]),
+            "fps": frames / elapsed if elapsed else 0.0,
+            "elapsed_s": elapsed,
+        },
+    }
+    print_results(results)
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+"""
+Headless benchmark suite: replays camera paths against ClickHouse and writes
+latency percentiles and server-side costs to a JSON file.
+
+Each path is a fixed list of `player_input` poses, either scripted from the
+map (see `camera_paths.py`: rotate, corridor, wall_slide) or recorded while
+playing with `DOOMHOUSE_RECORD=path.jsonl`, so runs are repeatable and can be
+compared across pipeline variants and server versions. Frames are rendered
+by the game's `Renderer` (without its frame cache), in any render mode:
+
+ - "mv": INSERT into `player_input`, then one parallel SELECT per tile
+ - "query": one parameterized SELECT per frame
+ - "local": the NumPy reference renderer, as a client-side baseline
+
+and decoded into a frame buffer. Per frame the suite records the insert,
+select and end-to-end (including decode) latency, the bytes of pixel data
+received and the time spent decoding them from the frame encoding
+(DOOMHOUSE_FRAME_ENCODING), and reports p50/p95/p99 and FPS per path. Every query runs with a deterministic query_id
+(`<run_id>-<path>-<frame>-<stage>`), so the server's CPU time and memory of
+each frame are read back from `system.query_log` after the run.
+
+Reads the same `.env` settings as the game and uses the scene it deployed,
+or deploys it first with `--setup`. Results of several runs are compared
+with `--compare`.
+
+Usage: python src/bench_suite.py [--mode mv|query] [--paths rotate,corridor,wall_slide,rec.jsonl]
+                                 [--repeat N] [--warmup N] [--tag NAME] [--out FILE] [--setup]
+       python src/bench_suite.py --compare a.json b.json ...
+"""
+import argparse
+import datetime
+import json
+import os
+import time
+
+import numpy as np
+
+import camera_paths
+import renderer as engine
+from renderer import Renderer
+
+RESULTS_DIR = "bench_results"
+PERCENTILES = (50, 95, 99)
+
+
+def summarize(values):
+    """p50/p95/p99, mean and max of a list of measurements (None if there are none)."""
+    if not values:
+        return None
+    summary = {f"p{p}": float(v) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))}
+    summary["mean"] = float(np.mean(values))
+    summary["max"] = float(np.max(values))
+    return summary
+
+
+class BenchRunner:
+    """Renders poses with one render mode and times every stage of every frame."""
+
+    def __init__(self, mode, run_id, deploy=False):
+        self.mode = mode
+        self.run_id = run_id
+        # No frame cache: every replayed frame must reach the server. Queries are tagged by the run, not a tracer
+        self.renderer = Renderer(render_mode=mode, frame_cache_mb=0, trace_file="")
+        self.renderer.connect()
+        self.client = self.renderer.client
+        self.renderer.load_scene(deploy=deploy)
+
+        if mode == "mv" and not deploy:
+            deployed = self.client.query(
+                "SELECT count() FROM system.tables WHERE database = 'doomhouse' AND name LIKE 'rendered_frame_post_processed_%'"
+            ).result_rows[0][0]
+            if deployed != len(self.renderer.tiles):
+                raise RuntimeError(f"{deployed} tile views are deployed, but the settings plan {len(self.renderer.tiles)} tiles")
+
+    def config(self):
+        game_map = self.renderer.game_map
+        return {
+            "mode": self.mode, "tiles": len(self.renderer.tiles), "tile_layout": engine.TILE_LAYOUT,
+            "resolution": list(self.renderer.resolution),
+            "raycast": engine.RAYCAST, "texture_sampling": engine.TEXTURE_SAMPLING, "texture_max_lod": engine.TEXTURE_MAX_LOD,
+            "frame_encoding": engine.FRAME_ENCODING, "http_compression": engine.HTTP_COMPRESSION,
+            "post_process": ",".join(self.renderer.post_process) or "none",
+            "map": engine.MAP_FILE, "map_size": [game_map.width, game_map.height],
+        }
+
+    def render(self, pose, frame_tag):
+        """Render one pose. Returns (insert_ms or None, select_ms, end_to_end_ms)."""
+        start = time.perf_counter()
+        self.renderer.render(pose, query_id=f"{self.run_id}-{frame_tag}")
+        e2e_ms = (time.perf_counter() - start) * 1000
+        insert_ms = self.renderer.insert_time if self.mode == "mv" else None
+        return insert_ms, self.renderer.select_time, e2e_ms
+
+    def run_path(self, name, poses, repeat, warmup):
+        """Replay a path `repeat` times after `warmup` unmeasured frames."""
+        for i, pose in enumerate(poses[:warmup]):
+            self.render(pose, f"{name}-warmup{i}")
+
+        insert_ms, select_ms, e2e_ms, frame_bytes, decode_ms = [], [], [], [], []
+        run_start = time.perf_counter()
+        for r in range(repeat):
+            for i, pose in enumerate(poses):
+                ins, sel, e2e = self.render(pose, f"{name}-{r}.{i}")
+                if ins is not None:
+                    insert_ms.append(ins)
+                select_ms.append(sel)
+                e2e_ms.append(e2e)
+                frame_bytes.append(self.renderer.frame_bytes)
+                decode_ms.append(self.renderer.decode_time)
+        elapsed = time.perf_counter() - run_start
+        return {
+            "frames": len(e2e_ms),
+            "insert_ms": summarize(insert_ms),
+            "select_ms": summarize(select_ms),
+            "e2e_ms": summarize(e2e_ms),
+            "frame_bytes": summarize(frame_bytes),
+            "decode_ms": summarize(decode_ms),
+            "fps": len(e2e_ms) / elapsed if elapsed else 0.0,
+        }
+
+    def server_stats(self, names):
+        """CPU time and memory per frame of every path, from `system.query_log` (None if it is unavailable)."""
+        try:
+            self.client.command("SYSTEM FLUSH LOGS")
+            return {name: self._path_stats(name) for name in names}
+        except Exception as e:
+            print(f"⚠️ Could not read system.query_log: {e}")
+            return dict.fromkeys(names)
+
+    def _path_stats(self, name):
+        rows = self.client.query("""
+            SELECT
+                query_id,
+                ProfileEvents['OSCPUVirtualTimeMicroseconds'] / 1000 AS cpu_ms,
+                ProfileEvents['UserTimeMicroseconds'] / 1000 AS user_ms,
+                ProfileEvents['SystemTimeMicroseconds'] / 1000 AS system_ms,
+                memory_usage,
+                query_duration_ms
+            FROM system.query_log
+            WHERE type = 'QueryFinish' AND startsWith(query_id, {prefix:String})
+        """, parameters={"prefix": f"{self.run_id}-{name}-"}).result_rows
+
+        # Sum the queries of each measured frame (the insert, with its views, and every tile)
+        frames = {}
+        queries = 0
+        for query_id, cpu_ms, user_ms, system_ms, memory, duration_ms in rows:
+            frame_tag = query_id[len(self.run_id) + len(name) + 2:].rsplit("-", 1)[0]
+            if frame_tag.startswith("warmup"):
+                continue
+            queries += 1
+            frame = frames.setdefault(frame_tag, [0.0, 0.0, 0.0, 0, 0.0])
+            frame[0] += cpu_ms
+            frame[1] += user_ms
+            frame[2] += system_ms
+            frame[3] = max(frame[3], memory)
+            frame[4] += duration_ms
+        if not frames:
+            return None
+        cpu, user, system, memory, duration = zip(*frames.values())
+        return {
+            "queries": queries,
+            "cpu_ms": summarize(cpu),
+            "user_ms": summarize(user),
+            "system_ms": summarize(system),
+            "peak_memory_bytes": summarize(memory),
+            "query_duration_ms": summarize(duration),
+        }
+
+    def shutdown(self):
+        self.renderer.close()
+
+
+def load_paths(specs, game_map):
+    """Resolve path names (scripted) and file names (recorded) into `(name, source, poses)`."""
+    paths = []
+    for spec in specs:
+        if spec in camera_paths.SCRIPTED_PATHS:
+            paths.append((spec, "scripted", camera_paths.SCRIPTED_PATHS[spec](game_map)))
+        elif os.path.exists(spec):
+            name = os.path.splitext(os.path.basename(spec))[0]
+            paths.append((name, spec, camera_paths.load_path(spec)))
+        else:
+            raise ValueError(f"Unknown path '{spec}' (scripted paths: {', '.join(camera_paths.SCRIPTED_PATHS)})")
+    return paths
+
+
+def _ms(summary, key):
+    return f"{summary[key]:.1f}" if summary else "-"
+
+
+def print_results(results):
+    print(f"{'path':<12} {'frames':>6} {'fps':>6} {'insert p50':>11} {'select p50':>11} {'e2e p50':>8} {'e2e p95':>8} "
+          f"{'e2e p99':>8} {'cpu/frame':>10} {'KB/frame':>9} {'decode p50':>11}")
+    for name, path in results["paths"].items():
+        server = path.get("server")
+        frame_bytes = path.get("frame_bytes")
+        print(
+            f"{name:<12} {path['frames']:>6} {path['fps']:>6.1f} {_ms(path['insert_ms'], 'p50'):>11} "
+            f"{_ms(path['select_ms'], 'p50'):>11} {_ms(path['e2e_ms'], 'p50'):>8} {_ms(path['e2e_ms'], 'p95'):>8} "
+            f"{_ms(path['e2e_ms'], 'p99'):>8} {_ms(server and server['cpu_ms'], 'p50'):>10} "
+            f"{frame_bytes['mean'] / 1024 if frame_bytes else 0:>9.0f} {_ms(path.get('decode_ms'), 'p50'):>11}"
+        )
+
+
+def compare(files):
+    """Side by side e2e p50/p95 and FPS of the paths in several result files."""
+    runs = []
+    for path in files:
+        with open(path, 'r') as f:
+            runs.append(json.load(f))
+    names = sorted({name for run in runs for name in run["paths"]})
+    for run, path in zip(runs, files):
+        config = run["config"]
+        print(f"{path}: {run['tag']} | ClickHouse {run['server_version']} | {config['mode']} {config['tiles']}x{config['tile_layout']} "
+              f"{config['raycast']} {config['texture_sampling']} lod {config['texture_max_lod']} "
+              f"{config.get('frame_encoding', 'rgb24')} {config.get('http_compression') or 'uncompressed'}")
+    for name in names:
+        print(f"\n{name}")
+        print(f"  {'run':<30} {'fps':>7} {'e2e p50':>8} {'e2e p95':>8} {'e2e p99':>8}")
+        for run, path in zip(runs, files):
+            result = run["paths"].get(name)
+            if result:
+                e2e = result["e2e_ms"]
+                print(f"  {os.path.basename(path):<30} {result['fps']:>7.1f} {_ms(e2e, 'p50'):>8} {_ms(e2e, 'p95'):>8} {_ms(e2e, 'p99'):>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless DOOMHouse benchmark suite")
+    parser.add_argument("--mode", choices=engine.RENDER_MODES, default=engine.RENDER_MODE)
+    parser.add_argument("--paths", default=",".join(camera_paths.SCRIPTED_PATHS),
+                        help="comma separated scripted path names and/or recorded .jsonl files")
+    parser.add_argument("--repeat", type=int, default=3, help="measured replays of every path")
+    parser.add_argument("--warmup", type=int, default=5, help="unmeasured frames before every path")
+    parser.add_argument("--tag", default="bench", help="label of this run in the results")
+    parser.add_argument("--out", help=f"results file (default: {RESULTS_DIR}/<run_id>.json)")
+    parser.add_argument("--setup", action="store_true", help="deploy the scene first instead of using the deployed one")
+    parser.add_argument("--compare", nargs="+", metavar="FILE", help="compare result files instead of running")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(args.compare)
+        return
+
+    started = datetime.datetime.now(datetime.timezone.utc)
+    run_id = f"doomhouse-{args.tag}-{started:%Y%m%dT%H%M%S}"
+    runner = BenchRunner(args.mode, run_id, deploy=args.setup)
+    version = runner.renderer.server_version
+    print(f"🏁 Run {run_id} on ClickHouse {version} ({args.mode} mode, {len(runner.renderer.tiles)} tiles)")
+
+    results = {
+        "run_id": run_id, "tag": args.tag, "started": started.isoformat(),
+        "server_version": version, "host": engine.HOST,
+        "config": dict(runner.config(), repeat=args.repeat, warmup=args.warmup),
+        "paths": {},
+    }
+    try:
+        for name, source, poses in load_paths(args.paths.split(","), runner.renderer.game_map):
+            print(f"▶️ {name}: {len(poses)} poses x {args.repeat}")
+            result = dict(source=source, **runner.run_path(name, poses, args.repeat, args.warmup))
+            results["paths"][name] = result
+        for name, stats in runner.server_stats(list(results["paths"])).items():
+            results["paths"][name]["server"] = stats
+    finally:
+        runner.shutdown()
+
+    out = args.out or os.path.join(RESULTS_DIR, f"{run_id}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump(results, f, indent=2)
+    print_results(results)
+    print(f"💾 Results written to {out}")
+
+
+if __name__ == "__main__":
+    main()
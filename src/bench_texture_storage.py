@@ -0,0 +1,137 @@
+"""
+Texture storage benchmark: lookups per second and server memory of the texture atlas.
+
+For every texture size, a scratch atlas with as many texels as the game's (every
+theme and surface with its whole mip chain) is filled with synthetic texels and
+loaded into each storage option:
+
+ - flat, packed: the FLAT dictionaries of `DOOMHOUSE_TEXTURE_STORAGE`
+ - hashed, sparse_hashed, hashed_array: hash table dictionary layouts of the packed value
+ - array: the packed values as one `Array(UInt32)` in a one-row Memory table,
+   read by a scalar subquery in every query
+
+It reports the load time, the memory of the dictionary (`bytes_allocated`) or
+table, the cost of a query doing a single lookup, and the texels read per
+second over consecutive texels (like the neighbouring pixels of a wall) and
+random texels. `flat` is measured with both texture samplings, three channel
+lookups or one packed lookup per texel. Works in the scratch database
+`doomhouse_bench`, dropped at the end. Needs a running ClickHouse and reads the
+same `.env` settings. The hash table layouts take several GB at 2048.
+
+Usage: python src/bench_texture_storage.py [--sizes 512 1024 2048] [--storages flat packed ...] [--lookups N]
+"""
+import argparse
+import time
+
+import texture_store
+from bench_common import connect, median_ms
+
+DATABASE = "doomhouse_bench"
+# Atlas of the game: themes (renderer.TEXTURE_THEMES) times surfaces (renderer.TEXTURE_SURFACES)
+THEMES = 2
+SURFACES = 4
+
+# Dictionary layout and texture samplings of every storage option ("array" is a table)
+STORAGES = {
+    "flat": ("FLAT(INITIAL_ARRAY_SIZE {size} MAX_ARRAY_SIZE {size})", ("channels", "packed")),
+    "packed": ("FLAT(INITIAL_ARRAY_SIZE {size} MAX_ARRAY_SIZE {size})", ("packed",)),
+    "hashed": ("HASHED()", ("packed",)),
+    "sparse_hashed": ("SPARSE_HASHED()", ("packed",)),
+    "hashed_array": ("HASHED_ARRAY()", ("packed",)),
+    "array": (None, ("packed",)),
+}
+ACCESS = {
+    "seq": "number % {texels} + 1",
+    "random": "cityHash64(number) % {texels} + 1",
+}
+
+
+def _fill_source(client, texels):
+    client.command(f"DROP TABLE IF EXISTS {DATABASE}.tex_source")
+    client.command(f"""
+        CREATE TABLE {DATABASE}.tex_source (id UInt32, r UInt8, g UInt8, b UInt8, rgb UInt32)
+        ENGINE = MergeTree ORDER BY id
+    """)
+    client.command(f"""
+        INSERT INTO {DATABASE}.tex_source
+        SELECT number + 1, number % 251, number % 241, number % 239, cityHash64(number) % 16777216
+        FROM numbers({texels})
+    """)
+
+
+def _load(client, storage, texels):
+    """Create and load the storage option, returning its name (dictionary or table) and memory in bytes."""
+    layout = STORAGES[storage][0]
+    name = f"{DATABASE}.tex_{storage}"
+    if layout is None:
+        client.command(f"CREATE TABLE {name} (rgb Array(UInt32)) ENGINE = Memory")
+        # Sorted by id rather than scattered with groupArrayInsertAt, which stops at 16M elements
+        client.command(f"INSERT INTO {name} SELECT arrayMap(t -> t.2, arraySort(groupArray((id, rgb)))) FROM {DATABASE}.tex_source")
+        return name, client.query(
+            f"SELECT total_bytes FROM system.tables WHERE database = '{DATABASE}' AND name = 'tex_{storage}'"
+        ).result_rows[0][0]
+    attributes = texture_store.TEXTURE_STORAGES.get(storage, ("rgb",))
+    columns = ", ".join(f"{attr} {texture_store.ATTRIBUTE_TYPES[attr]}" for attr in attributes)
+    client.command(f"""
+        CREATE DICTIONARY {name} (id UInt32, {columns})
+        PRIMARY KEY id
+        SOURCE(CLICKHOUSE(TABLE 'tex_source' DB '{DATABASE}'))
+        LIFETIME(0)
+        LAYOUT({layout.format(size=texels + 1)})
+    """)
+    client.command(f"SYSTEM RELOAD DICTIONARY {name}")
+    return name, client.query(
+        f"SELECT bytes_allocated FROM system.dictionaries WHERE database = '{DATABASE}' AND name = 'tex_{storage}'"
+    ).result_rows[0][0]
+
+
+def _lookup_query(storage, name, sampling, index, count):
+    if STORAGES[storage][0] is None:
+        return f"WITH (SELECT rgb FROM {name}) AS atlas SELECT sum(atlas[toUInt32({index})]) FROM numbers({count})"
+    attributes = ("r", "g", "b") if sampling == "channels" else ("rgb",)
+    lookups = " + ".join(f"dictGet('{name}', '{attr}', toUInt32({index}))" for attr in attributes)
+    return f"SELECT sum({lookups}) FROM numbers({count})"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Texture atlas storage benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[512, 1024, 2048], help="texture sizes")
+    parser.add_argument("--storages", nargs="+", choices=list(STORAGES), default=list(STORAGES))
+    parser.add_argument("--lookups", type=int, default=20_000_000, help="texels looked up per measurement")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    client = connect()
+    client.command(f"CREATE DATABASE IF NOT EXISTS {DATABASE}")
+    print(
+        f"{'size':>5} {'texels':>9} {'storage':<14} {'sampling':<9} {'load (s)':>9} {'memory (MiB)':>13} "
+        f"{'1 lookup (ms)':>14} {'seq (M/s)':>10} {'random (M/s)':>13}"
+    )
+    try:
+        for size in args.sizes:
+            texture_store.check_texture_size(size)
+            texels = THEMES * SURFACES * texture_store.mip_texels(size, texture_store.mip_levels(size))
+            _fill_source(client, texels)
+            for storage in args.storages:
+                start = time.perf_counter()
+                name, memory = _load(client, storage, texels)
+                load_s = time.perf_counter() - start
+                for sampling in STORAGES[storage][1]:
+                    single = _lookup_query(storage, name, sampling, ACCESS["random"].format(texels=texels), 1)
+                    single_ms = median_ms(client, single, args.repeats, warmup=True)
+                    rates = []
+                    for access in ACCESS.values():
+                        query = _lookup_query(storage, name, sampling, access.format(texels=texels), args.lookups)
+                        rates.append(args.lookups / median_ms(client, query, args.repeats, warmup=True) / 1000)
+                    print(
+                        f"{size:>5} {texels:>9} {storage:<14} {sampling:<9} {load_s:>9.1f} {memory / 2**20:>13.1f} "
+                        f"{single_ms:>14.1f} {rates[0]:>10.1f} {rates[1]:>13.1f}"
+                    )
+                kind = "TABLE" if STORAGES[storage][0] is None else "DICTIONARY"
+                client.command(f"DROP {kind} {name}")
+    finally:
+        client.command(f"DROP DATABASE IF EXISTS {DATABASE}")
+
+
+if __name__ == "__main__":
+    main()
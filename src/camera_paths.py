@@ -0,0 +1,139 @@
+"""
+Camera paths for the headless benchmark (`bench_suite.py`).
+
+A camera path is a list of poses, the `player_input` of consecutive frames
+(see `DOOMHouse.pose()`). Scripted paths are generated from a map with the
+game's movement rules: every frame rotates and/or moves the camera like a held
+key, and the next frame starts from the collision-resolved position (see
+`game_map.resolve_move()`), rounded to Float32 like the position the server
+sends back. The same map therefore always gives the same inputs.
+
+Recorded paths are JSON lines files with one pose per line, written by the
+game when `DOOMHOUSE_RECORD` is set.
+"""
+import json
+import math
+
+import numpy as np
+
+from game_map import resolve_move
+from render_plan import POSE_PARAMS
+
+# Movement per input step, the game's (DOOMHouse.py) as well
+MOVE_SPEED = 0.3
+ROT_SPEED = 0.15
+
+# Frames of a half turn at ROT_SPEED
+_HALF_TURN = round(math.pi / ROT_SPEED)
+
+
+def start_pose(x, y, angle=math.pi, theme=0):
+    """Standing still at (x, y), looking along `angle` (the game starts at pi, facing -x)."""
+    return {
+        "old_x": x, "old_y": y, "try_x": x, "try_y": y,
+        "dir_x": math.cos(angle), "dir_y": math.sin(angle),
+        "plane_x": 0.66 * math.sin(angle), "plane_y": -0.66 * math.cos(angle),
+        "theme": theme,
+    }
+
+
+def next_pose(game_map, pose, turn=0.0, move=0.0):
+    """The pose of the frame after `pose`: rotate by `turn` radians, then step `move` along the view."""
+    x, y = (float(np.float32(v)) for v in resolve_move(game_map, pose["old_x"], pose["old_y"], pose["try_x"], pose["try_y"]))
+    cos, sin = math.cos(turn), math.sin(turn)
+    dir_x = pose["dir_x"] * cos - pose["dir_y"] * sin
+    dir_y = pose["dir_x"] * sin + pose["dir_y"] * cos
+    plane_x = pose["plane_x"] * cos - pose["plane_y"] * sin
+    plane_y = pose["plane_x"] * sin + pose["plane_y"] * cos
+    return {
+        "old_x": x, "old_y": y, "try_x": x + dir_x * move, "try_y": y + dir_y * move,
+        "dir_x": dir_x, "dir_y": dir_y, "plane_x": plane_x, "plane_y": plane_y,
+        "theme": pose["theme"],
+    }
+
+
+def _open_run(game_map, x, y, angle):
+    """Empty cells from (x, y) along an axis-aligned direction until the first wall."""
+    step_x, step_y = round(math.cos(angle)), round(math.sin(angle))
+    cx, cy, run = int(x), int(y), 0
+    while game_map.cells[(cy + step_y) * game_map.width + cx + step_x] == 0:
+        cx, cy, run = cx + step_x, cy + step_y, run + 1
+    return run
+
+
+_AXES = [i * math.pi / 2 for i in range(4)]
+
+
+def rotate(game_map, frames=None):
+    """One full turn in place at the spawn point."""
+    frames = frames or round(2 * math.pi / ROT_SPEED)
+    path = [start_pose(*game_map.spawn)]
+    while len(path) < frames:
+        path.append(next_pose(game_map, path[-1], turn=ROT_SPEED))
+    return path
+
+
+def corridor_walk(game_map, frames=120):
+    """Walk down the longest straight run from the spawn point, turning around whenever a wall stops the walk."""
+    x, y = game_map.spawn
+    angle = max(_AXES, key=lambda a: _open_run(game_map, x, y, a))
+    path = [start_pose(x, y, angle)]
+    turning = 0
+    while len(path) < frames:
+        prev = path[-1]
+        start = (prev["old_x"], prev["old_y"])
+        moving = (prev["try_x"], prev["try_y"]) != start
+        if moving and math.dist(resolve_move(game_map, *start, prev["try_x"], prev["try_y"]), start) < MOVE_SPEED / 2:
+            turning = _HALF_TURN
+        if turning:
+            turning -= 1
+            path.append(next_pose(game_map, prev, turn=ROT_SPEED))
+        else:
+            path.append(next_pose(game_map, prev, move=MOVE_SPEED))
+    return path
+
+
+def wall_slide(game_map, frames=60):
+    """Walk into the nearest wall at a 30 degree angle, so collision slides the player along it."""
+    x, y = game_map.spawn
+    angle = min(_AXES, key=lambda a: _open_run(game_map, x, y, a)) + math.pi / 6
+    path = [start_pose(x, y, angle)]
+    while len(path) < frames:
+        path.append(next_pose(game_map, path[-1], move=MOVE_SPEED))
+    return path
+
+
+SCRIPTED_PATHS = {
+    "rotate": rotate,
+    "corridor": corridor_walk,
+    "wall_slide": wall_slide,
+}
+
+
+def load_path(path):
+    """Read a recorded path (one JSON pose per line)."""
+    poses = []
+    with open(path, 'r') as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            pose = json.loads(line)
+            missing = [name for name in POSE_PARAMS if name not in pose]
+            if missing:
+                raise ValueError(f"{path}:{line_no}: pose is missing {', '.join(missing)}")
+            poses.append(dict({name: float(pose[name]) for name in POSE_PARAMS}, theme=int(pose.get("theme", 0))))
+    return poses
+
+
+class PathRecorder:
+    """Appends the poses of played frames to a JSON lines file for replay by the benchmark."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'w')
+
+    def record(self, pose):
+        self._file.write(json.dumps(pose) + "\n")
+
+    def close(self):
+        self._file.close()
@@ -3,6 +3,9 @@ import os
 import re
 from dotenv import load_dotenv
 
+import render_plan
+import texture_store
+
 load_dotenv()
 
 HOST = os.getenv('CLICKHOUSE_HOST', 'localhost')
@@ -23,7 +26,7 @@ def remove_comments(sql):
             clean_lines.append(line)
     return '\n'.join(clean_lines)
 
-def execute_sql_script(client, script_path):
+def execute_sql_script(client, script_path, params=None):
     if not os.path.exists(script_path):
         print(f"Script not found: {script_path}")
         return
@@ -31,6 +34,9 @@ def execute_sql_script(client, script_path):
     with open(script_path, 'r') as f:
         content = f.read()
 
+    if params is not None:
+        content = render_plan.fill_template(content, params)
+
     # Remove comments first
     content = remove_comments(content)
 
@@ -51,7 +57,10 @@ try:
     client = clickhouse_connect.get_client(host=HOST, port=PORT, username=USER, password=PASS)
     print("Connected to ClickHouse")
     
-    execute_sql_script(client, "src/SQL/render_view.sql")
+    # The render view is a per-tile template: debug it as a single full-frame tile
+    tile = render_plan.plan_tiles(1, "rows", 640, 480)[0]
+    sampling = render_plan.sampling_params("channels", 512, texture_store.mip_levels(512), 0)
+    execute_sql_script(client, "src/SQL/render_view.sql", dict(render_plan.template_params(tile, (640, 480)), **sampling))
 
 except Exception as e:
     print(f"Connection Error: {e}")
@@ -0,0 +1,236 @@
+"""
+Incremental scene deployment.
+
+The deployed scene is a set of schema objects: tables (with the data loaded
+into them), dictionaries and Materialized Views. Each object is described by
+its statements and a content hash of everything it is built from. The hashes
+of the deployed objects are recorded in `doomhouse.deployment`, one row per
+object, so a deployment only drops and recreates the objects whose hash
+changed, together with every object that refers to them. Objects deployed
+earlier but no longer wanted (e.g. the views of a previous tile count) are
+dropped. Objects that do not depend on each other are created concurrently,
+one dependency level at a time, each on its own connection. With an
+unchanged scene, deploying is a single query.
+"""
+import concurrent.futures
+import hashlib
+import os
+import queue
+import re
+import time
+from collections import namedtuple
+
+import render_plan
+
+DATABASE = "doomhouse"
+METADATA_TABLE = f"{DATABASE}.deployment"
+METADATA_COLUMNS = ["name", "kind", "content_hash"]
+
+# Connections creating objects concurrently
+DEPLOY_WORKERS = int(os.getenv('DOOMHOUSE_DEPLOY_WORKERS', '4'))
+
+# Views are dropped first and tables last, so no object is dropped while another one reads from it
+DROP_STATEMENTS = {
+    "view": "DROP VIEW IF EXISTS",
+    "dictionary": "DROP DICTIONARY IF EXISTS",
+    "table": "DROP TABLE IF EXISTS",
+}
+
+# A schema object: `statements` create it, then `load(client)` (if any) fills it.
+# `content_hash` covers the statements and the inputs of `load`.
+SchemaObject = namedtuple("SchemaObject", ["name", "kind", "statements", "content_hash", "load"])
+
+_CREATE = re.compile(
+    r"^\s*CREATE\s+(?:(MATERIALIZED\s+VIEW)|(DICTIONARY)|(TABLE))\s+(?:IF\s+NOT\s+EXISTS\s+)?([\w.]+)", re.IGNORECASE
+)
+
+
+def schema_object(name, kind, statements, inputs=(), load=None):
+    """A `SchemaObject`, hashing its statements and `inputs` (bytes, or any value with a stable repr)."""
+    digest = hashlib.sha256()
+    for part in (kind, *statements):
+        digest.update(part.encode())
+        digest.update(b"\0")
+    for item in inputs:
+        digest.update(item if isinstance(item, bytes) else repr(item).encode())
+        digest.update(b"\0")
+    return SchemaObject(name, kind, tuple(statements), digest.hexdigest(), load)
+
+
+def script_objects(path, params=None, loads=None):
+    """The objects a SQL script creates, optionally filling its `${name}` placeholders first.
+
+    Every CREATE TABLE, DICTIONARY or MATERIALIZED VIEW starts an object, and the
+    statements after it (such as an INSERT filling the table) belong to it.
+    `loads` maps object names to the `(load, inputs)` that fill them from the client.
+    """
+    loads = loads or {}
+    with open(path, 'r') as f:
+        content = f.read()
+    if params is not None:
+        content = render_plan.fill_template(content, params)
+
+    objects = []
+    for stmt in render_plan.split_statements(content):
+        match = _CREATE.match(stmt)
+        if match:
+            kind = "view" if match.group(1) else "dictionary" if match.group(2) else "table"
+            objects.append((match.group(4), kind, [stmt]))
+        elif objects:
+            objects[-1][2].append(stmt)
+        # Statements before the first object (CREATE DATABASE) are run by `deploy()` itself
+    scripted = []
+    for name, kind, statements in objects:
+        load, inputs = loads.get(name, (None, ()))
+        scripted.append(schema_object(name, kind, statements, inputs, load))
+    return scripted
+
+
+def dependencies(objects):
+    """Name -> names of the other objects whose (unqualified) name its statements mention."""
+    patterns = {
+        obj.name: re.compile(rf"(?<!\w){re.escape(obj.name.split('.')[-1])}(?!\w)") for obj in objects
+    }
+    depends = {}
+    for obj in objects:
+        text = "\n".join(obj.statements)
+        depends[obj.name] = {name for name, pattern in patterns.items() if name != obj.name and pattern.search(text)}
+    return depends
+
+
+def dependency_levels(objects, depends):
+    """Objects grouped into levels, each only depending on objects of earlier levels."""
+    remaining = {obj.name: obj for obj in objects}
+    levels = []
+    while remaining:
+        level = [obj for name, obj in remaining.items() if not depends[name] & remaining.keys()]
+        if not level:
+            raise RuntimeError(f"Circular dependencies between {', '.join(sorted(remaining))}")
+        levels.append(level)
+        for obj in level:
+            del remaining[obj.name]
+    return levels
+
+
+def deployed_objects(client):
+    """Name -> (kind, content_hash) of the objects recorded as deployed, empty if there is no record."""
+    # Only a missing record means nothing is deployed, any other failure must not wipe a live scene
+    if not client.query(f"EXISTS TABLE {METADATA_TABLE}").result_rows[0][0]:
+        return {}
+    rows = client.query(f"""
+        SELECT name, argMax(kind, deployed_at), argMax(content_hash, deployed_at)
+        FROM {METADATA_TABLE} GROUP BY name
+    """).result_rows
+    # Dropped objects are recorded with an empty hash
+    return {name: (kind, content_hash) for name, kind, content_hash in rows if content_hash}
+
+
+def plan(objects, deployed):
+    """(objects to (re)create, names and kinds of deployed objects to drop) to go from `deployed` to `objects`."""
+    depends = dependencies(objects)
+    changed = {obj.name for obj in objects if deployed.get(obj.name) != (obj.kind, obj.content_hash)}
+    # An object is rebuilt along with everything that refers to it
+    grown = True
+    while grown:
+        grown = False
+        for name, names in depends.items():
+            if name not in changed and names & changed:
+                changed.add(name)
+                grown = True
+    rebuild = [obj for obj in objects if obj.name in changed]
+    wanted = {obj.name for obj in objects}
+    drop = [(obj.name, obj.kind) for obj in rebuild if obj.name in deployed]
+    drop += [(name, kind) for name, (kind, _) in deployed.items() if name not in wanted]
+    return rebuild, drop
+
+
+def deploy(client, connect, objects, deployed, workers=DEPLOY_WORKERS):
+    """Bring the server from the `deployed` objects (see `deployed_objects()`) to `objects`.
+
+    `connect()` opens the extra connections of the concurrent workers, only when
+    there is something to deploy. Returns the names of the (re)created objects.
+    An object that fails is not recorded, the objects that refer to it are
+    skipped, and a RuntimeError naming them is raised once the rest is deployed.
+    """
+    rebuild, drop = plan(objects, deployed)
+    if not rebuild and not drop:
+        return []
+
+    start_time = time.time()
+    print(f"🧱 Deploying {len(rebuild)} of {len(objects)} objects, dropping {len(drop)}")
+    client.command(f"CREATE DATABASE IF NOT EXISTS {DATABASE}")
+    with open(os.path.join(render_plan.SQL_DIR, "deployment_table.sql"), 'r') as f:
+        client.command(render_plan.split_statements(f.read())[0])
+
+    clients = queue.Queue()
+    clients.put(client)
+    for _ in range(min(workers, len(rebuild) + len(drop)) - 1):
+        clients.put(connect())
+
+    def run(task, *args):
+        worker_client = clients.get()
+        try:
+            return task(worker_client, *args)
+        finally:
+            clients.put(worker_client)
+
+    failed = {} # name -> error, or the failed objects it refers to
+    depends = dependencies(rebuild)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=clients.qsize(), thread_name_prefix="deploy") as executor:
+        for kind, statement in DROP_STATEMENTS.items():
+            names = [name for name, drop_kind in drop if drop_kind == kind]
+            list(executor.map(lambda name: run(_drop, statement, name), names))
+        # Dropped objects that are not recreated are forgotten
+        wanted = {obj.name for obj in objects}
+        forgotten = [[name, kind, ""] for name, kind in drop if name not in wanted]
+        if forgotten:
+            client.insert(METADATA_TABLE, forgotten, column_names=METADATA_COLUMNS)
+
+        for level in dependency_levels(rebuild, depends):
+            for obj in level:
+                if depends[obj.name] & failed.keys():
+                    failed[obj.name] = f"refers to {', '.join(sorted(depends[obj.name] & failed.keys()))}"
+                    print(f"Skipping {obj.name}: {failed[obj.name]}")
+            level = [obj for obj in level if obj.name not in failed]
+            for obj, error in zip(level, executor.map(lambda obj: run(_create, obj), level)):
+                if error:
+                    failed[obj.name] = error
+
+    while not clients.empty():
+        worker_client = clients.get()
+        if worker_client is not client:
+            worker_client.close()
+    if failed:
+        raise RuntimeError(
+            f"{len(failed)} of {len(rebuild)} objects not deployed: "
+            + "; ".join(f"{name} ({error})" for name, error in sorted(failed.items()))
+        )
+    print(f"🧱 Deployed in {(time.time() - start_time) * 1000:.0f}ms")
+    return [obj.name for obj in rebuild]
+
+
+def _drop(client, statement, name):
+    try:
+        client.command(f"{statement} {name}")
+    except Exception as e:
+        print(f"Error dropping {name}: {e}")
+
+
+def _create(client, obj):
+    start_time = time.time()
+    try:
+        for stmt in obj.statements:
+            client.command(stmt)
+        if obj.load:
+            obj.load(client)
+        if obj.kind == "dictionary":
+            # Loaded right away, so a broken source fails the deployment instead of the first frame
+            client.command(f"SYSTEM RELOAD DICTIONARY {obj.name}")
+    except Exception as e:
+        # Not recorded, so the next deployment tries again
+        print(f"Error deploying {obj.name}: {e}")
+        return e
+    # Recorded last, so an interrupted deployment redoes the object
+    client.insert(METADATA_TABLE, [[obj.name, obj.kind, obj.content_hash]], column_names=METADATA_COLUMNS)
+    print(f"💾 {obj.kind.capitalize()} {obj.name} deployed in {(time.time() - start_time) * 1000:.0f}ms")
@@ -0,0 +1,73 @@
+"""
+Client-side frame cache.
+
+A rendered frame is a pure function of the player input (position, attempted
+move, direction, camera plane, texture theme and render resolution), so frames
+are cached on those values, with the pose quantized. Entries are evicted least-recently-used first
+once the cache exceeds its memory budget. The cache is thread-safe so that
+background renders can fill it.
+"""
+import threading
+from collections import OrderedDict, namedtuple
+
+from render_plan import POSE_PARAMS, RESOLUTION_PARAMS
+
+# Pose components closer than this are treated as the same pose
+POSE_QUANTUM = 1e-3
+
+CachedFrame = namedtuple("CachedFrame", ["pos_x", "pos_y", "pixels"])
+
+
+class FrameCache:
+    """LRU cache of finished frames with a byte budget."""
+
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._frames = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(pose):
+        """Cache key for a pose dict: its quantized `POSE_PARAMS`, then its theme index and resolution as is."""
+        quantized = tuple(round(pose[name] / POSE_QUANTUM) for name in POSE_PARAMS)
+        return quantized + (pose["theme"],) + tuple(pose[name] for name in RESOLUTION_PARAMS)
+
+    def get(self, key):
+        with self._lock:
+            frame = self._frames.get(key)
+            if frame is None:
+                self.misses += 1
+                return None
+            self._frames.move_to_end(key)
+            self.hits += 1
+            return frame
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._frames
+
+    def put(self, key, pos_x, pos_y, pixels):
+        """Store a copy of a frame's pixels, evicting old frames to stay within budget."""
+        if len(pixels) > self.budget_bytes:
+            return
+        frame = CachedFrame(pos_x, pos_y, bytes(pixels))
+        with self._lock:
+            if key in self._frames:
+                self.size_bytes -= len(self._frames.pop(key).pixels)
+            self._frames[key] = frame
+            self.size_bytes += len(pixels)
+            while self.size_bytes > self.budget_bytes:
+                _, evicted = self._frames.popitem(last=False)
+                self.size_bytes -= len(evicted.pixels)
+                self.evictions += 1
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __len__(self):
+        return len(self._frames)
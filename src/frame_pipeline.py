@@ -0,0 +1,103 @@
+"""
+Asynchronous frame pipeline for the interactive client.
+
+The window must never wait for the database. `FramePipeline` renders poses on
+persistent background workers, one per renderer "lane" (a `Renderer` with its
+own connections and frame buffers), so up to one frame per lane is in flight
+while the window keeps handling input. Poses submitted while every lane is busy
+are coalesced: only the newest one is rendered once a lane frees up, so stale
+poses never queue up behind a slow frame. Workers never call into the
+consumer (Tk is not thread-safe): every finished render puts its lane on a
+`queue.Queue` once its future is done, and the consumer's thread picks
+finished frames up in submission order by calling `poll()` (for Tk from an
+`after()` loop). A lane only takes the next
+pose after its frame has been shown, since the frame buffer it renders into is
+overwritten by its next render.
+"""
+import collections
+import concurrent.futures
+import queue
+
+
+class FramePipeline:
+    """Renders the newest submitted pose on the first idle lane, delivering frames in order."""
+
+    def __init__(self, lanes, render, on_frame):
+        # `render(lane, pose)` returns the lane's `Frame` of the pose, on a worker thread.
+        # `on_frame(lane, pose, frame)` runs on the consumer's thread in `poll()`, with frame None if rendering failed.
+        self._render = render
+        self._on_frame = on_frame
+        self._finished = queue.Queue()        # lanes whose render finished, filled by the futures' callbacks
+        self._idle = collections.deque(lanes)
+        self._in_flight = collections.deque() # (lane, pose, future), in submission order
+        self._pending = None                  # newest pose waiting for an idle lane
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=len(lanes), thread_name_prefix="render")
+        self.closed = False
+
+        # Counters
+        self.submitted = 0
+        self.coalesced = 0 # poses replaced by a newer one before any lane rendered them
+        self.failed = 0
+
+    def ready(self):
+        """Whether a pose submitted now starts rendering right away."""
+        return bool(self._idle) and self._pending is None
+
+    def in_flight(self):
+        return len(self._in_flight)
+
+    def queued_poses(self):
+        """Poses submitted and not delivered yet, oldest first."""
+        poses = [pose for _, pose, _ in self._in_flight]
+        return poses + [self._pending] if self._pending is not None else poses
+
+    def submit(self, pose):
+        """Render `pose` next, replacing any pose still waiting for a lane. Call from the consumer's thread."""
+        if self._pending is not None:
+            self.coalesced += 1
+        self._pending = pose
+        self._dispatch()
+
+    def poll(self):
+        """Deliver the frames that finished rendering, in submission order. Call from the consumer's thread."""
+        finished = False
+        while True:
+            try:
+                self._finished.get_nowait()
+            except queue.Empty:
+                break
+            finished = True
+        if finished:
+            self._deliver()
+
+    def shutdown(self):
+        """Drop the waiting pose. Frames still in flight finish in the background and are not delivered."""
+        # Not waiting for the frames in flight, the window closes right away
+        self.closed = True
+        self._pending = None
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _dispatch(self):
+        if self.closed or self._pending is None or not self._idle:
+            return
+        pose, self._pending = self._pending, None
+        lane = self._idle.popleft()
+        future = self._executor.submit(self._render, lane, pose)
+        # Signalled once the future is done, so `_deliver()` never finds the frame still running
+        future.add_done_callback(lambda _, lane=lane: self._finished.put(lane))
+        self._in_flight.append((lane, pose, future))
+        self.submitted += 1
+
+    def _deliver(self):
+        # Frames go out in submission order, a frame that finished early waits for the ones before it
+        while self._in_flight and self._in_flight[0][2].done() and not self.closed:
+            lane, pose, future = self._in_flight.popleft()
+            try:
+                frame = future.result()
+            except Exception as e:
+                print(f"Render Error: {e}")
+                self.failed += 1
+                frame = None
+            self._on_frame(lane, pose, frame)
+            self._idle.append(lane)
+        self._dispatch()
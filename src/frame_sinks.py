@@ -0,0 +1,87 @@
+"""
+Frame sinks: where rendered frames go.
+
+A sink takes the `Frame`s returned by `Renderer.render()` one at a time with
+`write(frame)` and is released with `close()`. Frame buffers are reused by the
+renderer, so a sink must be done with the pixels when `write()` returns.
+
+ - `TkSink`: shows frames in a Tk label (the game window), scaled to the window
+ - `PngSequenceSink`: numbered PNG files in a directory
+ - `RawRGBSink`: packed RGB24 frames on a binary stream, e.g. stdout piped into
+   `ffmpeg -f rawvideo -pix_fmt rgb24 -s 640x480 -i - out.mp4`
+
+The PNG sink writes frames at their render resolution. A raw stream has no
+per-frame header, so `RawRGBSink` writes every frame at one size.
+"""
+import os
+import sys
+
+from PIL import Image
+
+
+class TkSink:
+    """Shows every frame in a Tk label, upscaling frames rendered below `size`."""
+
+    def __init__(self, label, size=None):
+        # ImageTk needs Tk, so it is only imported when a window is used
+        from PIL import ImageTk
+        self._photo_image = ImageTk.PhotoImage
+        self.label = label
+        self.size = size
+        self.photo = None
+
+    def write(self, frame):
+        # Wrap the frame buffer as an image, no copy unless it has to be scaled
+        image = frame.framebuffer.image()
+        if self.size and image.size != self.size:
+            image = image.resize(self.size, Image.BILINEAR)
+        self.photo = self._photo_image(image)
+        self.label.config(image=self.photo)
+
+    def close(self):
+        pass
+
+
+class PngSequenceSink:
+    """Writes every frame to `<directory>/<prefix>_<n>.png`, numbered from 0."""
+
+    def __init__(self, directory, prefix="frame"):
+        self.directory = directory
+        self.prefix = prefix
+        self.count = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, frame):
+        path = os.path.join(self.directory, f"{self.prefix}_{self.count:06d}.png")
+        frame.framebuffer.image().save(path)
+        self.count += 1
+
+    def close(self):
+        pass
+
+
+class RawRGBSink:
+    """Writes every frame as width * height * 3 bytes of packed RGB24 to a binary stream.
+
+    All frames have the same `size`, by default the size of the first frame.
+    Frames rendered at another resolution are scaled to it.
+    """
+
+    def __init__(self, stream=None, size=None):
+        self.stream = stream or sys.stdout.buffer
+        self.size = size
+        self.count = 0
+
+    def write(self, frame):
+        framebuffer = frame.framebuffer
+        if self.size is None:
+            self.size = (framebuffer.width, framebuffer.height)
+        if (framebuffer.width, framebuffer.height) == self.size:
+            self.stream.write(framebuffer.buffer)
+        else:
+            self.stream.write(framebuffer.image().resize(self.size, Image.BILINEAR).tobytes())
+        self.stream.flush()
+        self.count += 1
+
+    def close(self):
+        self.stream.flush()
@@ -0,0 +1,111 @@
+"""
+Binary frame transport.
+
+Tiles arrive as RowBinary rows of `(tile_id UInt32, pos_x Float32, pos_y Float32,
+image_data String)`, where `image_data` holds the tile's pixels in one of the
+frame encodings of the post-process stage (see `SQL/frame_encoding_*.sql`).
+Batch renders prefix every row with its `frame_id UInt64`.
+RGB24 tiles are copied straight into one preallocated frame buffer, which PIL
+wraps without creating any per-pixel Python objects. The other encodings are
+first expanded to RGB24 with NumPy by `decode_pixels`.
+"""
+import struct
+
+import numpy as np
+from PIL import Image
+
+BYTES_PER_PIXEL = 3
+
+_TILE_HEADER = struct.Struct('<Iff')
+_BATCH_TILE_HEADER = struct.Struct('<QIff')
+
+
+def _read_varint(data, offset):
+    """Decode a LEB128 varint (RowBinary string length prefix)."""
+    value = 0
+    shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+def _parse_rows(data, header):
+    view = memoryview(data)
+    rows = []
+    offset = 0
+    while offset < len(data):
+        fields = header.unpack_from(data, offset)
+        length, offset = _read_varint(data, offset + header.size)
+        rows.append(fields + (view[offset:offset + length],))
+        offset += length
+    return rows
+
+
+def parse_tiles(data):
+    """Split a RowBinary response into (tile_id, pos_x, pos_y, pixels) rows without copying the pixels."""
+    return _parse_rows(data, _TILE_HEADER)
+
+
+def parse_batch_tiles(data):
+    """Like `parse_tiles`, for batch rows of (frame_id, tile_id, pos_x, pos_y, pixels)."""
+    return _parse_rows(data, _BATCH_TILE_HEADER)
+
+
+def _decode_rgb565(data):
+    value = np.frombuffer(data, dtype='<u2')
+    rgb = np.empty((len(value), BYTES_PER_PIXEL), dtype=np.uint8)
+    # Expand every channel to 8 bits by repeating its top bits, so full intensity stays 255
+    r, g, b = value >> 11, (value >> 5) & 0x3F, value & 0x1F
+    rgb[:, 0] = (r << 3) | (r >> 2)
+    rgb[:, 1] = (g << 2) | (g >> 4)
+    rgb[:, 2] = (b << 3) | (b >> 2)
+    return rgb.reshape(-1).data
+
+
+def _decode_palette(data):
+    colors = data[0] + 1
+    palette = np.frombuffer(data, dtype=np.uint8, count=colors * BYTES_PER_PIXEL, offset=1).reshape(colors, BYTES_PER_PIXEL)
+    indices = np.frombuffer(data, dtype=np.uint8, offset=1 + colors * BYTES_PER_PIXEL)
+    return np.take(palette, indices, axis=0).reshape(-1).data
+
+
+_DECODERS = {
+    "rgb24": lambda data: data,
+    "rgb565": _decode_rgb565,
+    "palette": _decode_palette,
+}
+
+
+def decode_pixels(encoding, data):
+    """Expand a tile's pixels from a frame encoding into packed RGB24 bytes (RGB24 is returned as is)."""
+    return _DECODERS[encoding](data)
+
+
+class FrameBuffer:
+    """A preallocated RGB24 frame that tiles are blitted into."""
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.buffer = bytearray(width * height * BYTES_PER_PIXEL)
+        self._view = memoryview(self.buffer)
+
+    def blit(self, tile, pixels):
+        """Copy a tile's packed RGB rows into their place in the frame."""
+        stride = self.width * BYTES_PER_PIXEL
+        row_bytes = tile.width * BYTES_PER_PIXEL
+        start = tile.y0 * stride + tile.x0 * BYTES_PER_PIXEL
+        if tile.width == self.width:
+            self._view[start:start + len(pixels)] = pixels
+            return
+        for row in range(tile.height):
+            self._view[start:start + row_bytes] = pixels[row * row_bytes:(row + 1) * row_bytes]
+            start += stride
+
+    def image(self):
+        """Wrap the buffer as a PIL image (shares memory with the buffer)."""
+        return Image.frombuffer("RGB", (self.width, self.height), self.buffer, "raw", "RGB", 0, 1)
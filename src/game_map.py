@@ -0,0 +1,147 @@
+"""
+Map loading and the distance-to-wall field.
+
+Maps are grids of cells where 0 is empty space and any other value is a wall
+type. They are read from text files (one row per line) or PNG images (one
+pixel per cell) of up to MAX_MAP_SIZE cells per side, and stored in
+`doomhouse.map_source` with cell ids `y * width + x + 1`.
+
+Alongside every cell the loader stores its Chebyshev distance to the nearest
+wall, capped at DIST_CAP. A cell at distance `d` is the centre of a
+(2d - 1) x (2d - 1) square of empty cells, so a ray anywhere inside it can
+advance `d - 1` cells in any direction without passing a wall. The
+distance-field traversal (`SQL/ray_traversal_sdf.sql`) uses that to skip open
+space in large steps.
+"""
+import math
+import os
+from collections import namedtuple
+
+import numpy as np
+from PIL import Image
+
+MAX_MAP_SIZE = 1024
+
+# Distances are stored as UInt8; further than this only skips less far
+DIST_CAP = 255
+
+# Text maps: digits are wall types (0 = empty), plus these extra symbols
+_TEXT_CELLS = {".": 0, " ": 0, "#": 1, "P": 0, "@": 0}
+_TEXT_SPAWN = ("P", "@")
+
+# PNG maps: dark pixels are walls, red pixels wall type 2, green marks the spawn
+_PNG_SPAWN = (0, 255, 0)
+
+GameMap = namedtuple("GameMap", ["width", "height", "cells", "spawn"])
+
+
+def _parse_text(path):
+    with open(path, 'r') as f:
+        lines = [line.rstrip("\n").replace(",", "") for line in f]
+    rows = [line for line in lines if line.strip()]
+    width = max(len(row) for row in rows)
+    cells = bytearray(width * len(rows))
+    spawn = None
+    for y, row in enumerate(rows):
+        for x, char in enumerate(row):
+            if char in _TEXT_SPAWN:
+                spawn = (x + 0.5, y + 0.5)
+            if char.isdigit():
+                cells[y * width + x] = int(char)
+            elif char in _TEXT_CELLS:
+                cells[y * width + x] = _TEXT_CELLS[char]
+            else:
+                raise ValueError(f"Unknown map cell '{char}' at row {y + 1}, column {x + 1}")
+    return width, len(rows), cells, spawn
+
+
+def _parse_png(path):
+    with Image.open(path) as img:
+        pixels = np.asarray(img.convert("RGB"), dtype=np.int32)
+    height, width = pixels.shape[:2]
+    r, g, b = pixels[..., 0], pixels[..., 1], pixels[..., 2]
+    is_spawn = (r == _PNG_SPAWN[0]) & (g == _PNG_SPAWN[1]) & (b == _PNG_SPAWN[2])
+    cells = np.select([is_spawn, (r > 128) & (g < 128) & (b < 128), r + g + b < 384], [0, 2, 1], 0)
+    spawn = None
+    if is_spawn.any():
+        # The last spawn pixel wins, like in text maps
+        y, x = np.unravel_index(np.flatnonzero(is_spawn)[-1], is_spawn.shape)
+        spawn = (int(x) + 0.5, int(y) + 0.5)
+    return width, height, bytearray(cells.astype(np.uint8).tobytes()), spawn
+
+
+def load_map(path):
+    """Load a text or PNG map. The outer ring of cells is always walled in."""
+    if os.path.splitext(path)[1].lower() == ".png":
+        width, height, cells, spawn = _parse_png(path)
+    else:
+        width, height, cells, spawn = _parse_text(path)
+
+    if not (3 <= width <= MAX_MAP_SIZE and 3 <= height <= MAX_MAP_SIZE):
+        raise ValueError(f"Map is {width}x{height}, sides must be between 3 and {MAX_MAP_SIZE} cells")
+
+    # Rays and collision never leave the map, so they need no bounds checks
+    for x in range(width):
+        cells[x] = cells[x] or 1
+        cells[(height - 1) * width + x] = cells[(height - 1) * width + x] or 1
+    for y in range(height):
+        cells[y * width] = cells[y * width] or 1
+        cells[y * width + width - 1] = cells[y * width + width - 1] or 1
+
+    if spawn is None:
+        spawn = next(((i % width + 0.5, i // width + 0.5) for i, val in enumerate(cells) if val == 0), None)
+    if spawn is None or cells[int(spawn[1]) * width + int(spawn[0])]:
+        raise ValueError("Map has no empty cell to spawn in")
+    return GameMap(width, height, cells, spawn)
+
+
+def distance_field(game_map):
+    """Chebyshev distance of every cell to the nearest wall (0 for walls), capped at DIST_CAP.
+
+    Two-pass chamfer transform: each pass carries distances from the
+    already visited 8-neighbours, which is exact for the Chebyshev metric.
+    A pass takes one row at a time: first the three neighbours of the previous
+    row, then the left (or right) neighbour along the row as a running minimum
+    of `dist - x`, which adds 1 per cell travelled.
+    """
+    width, height = game_map.width, game_map.height
+    cells = np.frombuffer(bytes(game_map.cells), dtype=np.uint8).reshape(height, width)
+    dist = np.where(cells > 0, 0, DIST_CAP).astype(np.int32)
+    xs = np.arange(width, dtype=np.int32)
+
+    def carry(row, prev):
+        above = prev.copy()
+        above[1:] = np.minimum(above[1:], prev[:-1])
+        above[:-1] = np.minimum(above[:-1], prev[1:])
+        row = np.minimum(row, above + 1)
+        return xs + np.minimum.accumulate(row - xs)
+
+    for y in range(1, height):
+        dist[y] = carry(dist[y], dist[y - 1])
+    for y in range(height - 2, -1, -1):
+        dist[y] = carry(dist[y, ::-1], dist[y + 1, ::-1])[::-1]
+
+    return bytearray(dist.astype(np.uint8).tobytes())
+
+
+def map_columns(game_map):
+    """Columns of `doomhouse.map_source`: (id, val, dist) as typed arrays."""
+    ids = np.arange(1, game_map.width * game_map.height + 1, dtype=np.uint32)
+    cells = np.frombuffer(bytes(game_map.cells), dtype=np.uint8)
+    dist = np.frombuffer(distance_field(game_map), dtype=np.uint8)
+    return ids, cells, dist
+
+
+def resolve_move(game_map, old_x, old_y, try_x, try_y):
+    """Collision-resolved position of a move, with the same rule as the ray stage.
+
+    The move is tried along x and then y, each blocked separately when the
+    cell 0.2 ahead of the player along that axis is a wall, so the player
+    slides along walls instead of stopping.
+    """
+    width, cells = game_map.width, game_map.cells
+    probe_x = try_x + (0.2 if try_x > old_x else -0.2)
+    valid_x = try_x if cells[int(math.floor(old_y)) * width + int(math.floor(probe_x))] == 0 else old_x
+    probe_y = try_y + (0.2 if try_y > old_y else -0.2)
+    valid_y = try_y if cells[int(math.floor(probe_y)) * width + int(math.floor(valid_x))] == 0 else old_y
+    return valid_x, valid_y
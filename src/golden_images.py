@@ -0,0 +1,163 @@
+"""
+Golden image comparison: checks that a render pipeline still produces the
+same frames.
+
+`record` renders a camera path (see `camera_paths.py`) into a directory of
+golden PNG frames, with a manifest holding the poses and the settings they
+were rendered with. `check` renders the same poses again, possibly with
+another render mode or an optimized SQL variant, and compares every frame
+with its golden image. A frame fails when more than `--max-ratio` of its
+pixels differ by more than `--tolerance` in any channel. Failing frames get
+an amplified difference image in `--diff-dir`, and the exit code is 1.
+
+The "local" render mode uses the NumPy reference renderer, so goldens recorded
+with `--mode local` check the SQL pipeline against an independent
+implementation. Tiles are post-processed together with a halo of their
+neighbours' pixels, so frames do not depend on the tile plan, except with
+the palette encoding, which picks a palette per tile.
+
+Usage: python src/golden_images.py record [--path NAME|FILE] [--dir DIR] [--mode mv|query|local]
+       python src/golden_images.py check [--dir DIR] [--mode mv|query|local] [--tolerance N]
+                                         [--max-ratio R] [--diff-dir DIR]
+"""
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+from PIL import Image
+
+import camera_paths
+import renderer as engine
+from frame_sinks import PngSequenceSink
+from renderer import Renderer
+
+MANIFEST = "manifest.json"
+
+
+def settings(renderer):
+    """Settings that change the rendered pixels."""
+    current = {
+        "resolution": renderer.resolution, "raycast": engine.RAYCAST,
+        "map": engine.MAP_FILE, "texture_size": engine.TEXTURE_SIZE, "texture_intensity": engine.TEXTURE_INTENSITY,
+        "texture_max_lod": engine.TEXTURE_MAX_LOD, "themes": engine.TEXTURE_THEMES, "frame_encoding": engine.FRAME_ENCODING,
+        "post_process": list(renderer.post_process),
+    }
+    if engine.FRAME_ENCODING == "palette":
+        current.update(tiles=len(renderer.tiles), tile_layout=engine.TILE_LAYOUT)
+    return current
+
+
+def compare_images(expected, actual, tolerance=0):
+    """Difference statistics of two (H, W, 3) uint8 images."""
+    diff = np.abs(expected.astype(np.int16) - actual.astype(np.int16))
+    differing = (diff > tolerance).any(axis=2)
+    mse = float(np.mean(diff.astype(np.float64) ** 2))
+    return {
+        "max_diff": int(diff.max()),
+        "diff_pixels": int(differing.sum()),
+        "diff_ratio": float(differing.mean()),
+        "psnr": float("inf") if mse == 0 else float(10 * np.log10(255 ** 2 / mse)),
+    }
+
+
+def diff_image(expected, actual):
+    """Per-pixel absolute difference, amplified 8x so small deviations show up."""
+    diff = np.abs(expected.astype(np.int16) - actual.astype(np.int16))
+    return Image.fromarray(np.minimum(diff * 8, 255).astype(np.uint8))
+
+
+def open_renderer(mode):
+    renderer = Renderer(render_mode=mode, frame_cache_mb=0, trace_file="")
+    renderer.connect()
+    renderer.load_scene()
+    return renderer
+
+
+def record(args):
+    renderer = open_renderer(args.mode)
+    if args.path in camera_paths.SCRIPTED_PATHS:
+        poses = camera_paths.SCRIPTED_PATHS[args.path](renderer.game_map)
+    else:
+        poses = camera_paths.load_path(args.path)
+
+    sink = PngSequenceSink(args.dir)
+    try:
+        for pose in poses:
+            sink.write(renderer.render(pose))
+    finally:
+        sink.close()
+        renderer.close()
+    manifest = {"path": args.path, "mode": args.mode, "settings": settings(renderer), "poses": poses}
+    with open(os.path.join(args.dir, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    print(f"📸 Recorded {len(poses)} golden frames of '{args.path}' ({args.mode} mode) in {args.dir}")
+
+
+def check(args):
+    with open(os.path.join(args.dir, MANIFEST), 'r') as f:
+        manifest = json.load(f)
+    renderer = open_renderer(args.mode)
+    current = settings(renderer)
+    # JSON turns tuples into lists, compare the JSON forms
+    changed = [key for key, value in json.loads(json.dumps(current)).items() if manifest["settings"].get(key) != value]
+    if changed:
+        print(f"⚠️ Settings differ from the goldens: {', '.join(changed)}")
+
+    failed = []
+    worst = None
+    try:
+        for i, pose in enumerate(manifest["poses"]):
+            frame = renderer.render(pose)
+            actual = np.asarray(frame.framebuffer.image())
+            with Image.open(os.path.join(args.dir, f"frame_{i:06d}.png")) as golden:
+                expected = np.asarray(golden.convert("RGB"))
+            stats = compare_images(expected, actual, args.tolerance)
+            if worst is None or stats["diff_ratio"] > worst[1]["diff_ratio"]:
+                worst = (i, stats)
+            if stats["diff_ratio"] > args.max_ratio:
+                failed.append(i)
+                print(f"❌ frame {i}: {stats['diff_pixels']} pixels differ ({stats['diff_ratio']:.3%}), "
+                      f"max {stats['max_diff']}, PSNR {stats['psnr']:.1f}dB")
+                if args.diff_dir:
+                    os.makedirs(args.diff_dir, exist_ok=True)
+                    diff_image(expected, actual).save(os.path.join(args.diff_dir, f"diff_{i:06d}.png"))
+    finally:
+        renderer.close()
+
+    frames = len(manifest["poses"])
+    if worst:
+        print(f"🔎 Worst frame {worst[0]}: {worst[1]['diff_ratio']:.3%} differing pixels, max {worst[1]['max_diff']}")
+    if failed:
+        print(f"❌ {len(failed)} of {frames} frames differ from the goldens ({manifest['mode']} mode) in {args.mode} mode")
+        return 1
+    print(f"✅ All {frames} frames match the goldens ({manifest['mode']} mode) in {args.mode} mode")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record and check golden frames")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = commands.add_parser("record", help="render a camera path into golden frames")
+    record_parser.add_argument("--path", default="rotate", help="scripted path name or recorded .jsonl file")
+    record_parser.add_argument("--dir", default="golden", help="directory of the golden frames")
+    record_parser.add_argument("--mode", choices=engine.RENDER_MODES, default="local")
+
+    check_parser = commands.add_parser("check", help="render the golden poses again and compare the frames")
+    check_parser.add_argument("--dir", default="golden", help="directory of the golden frames")
+    check_parser.add_argument("--mode", choices=engine.RENDER_MODES, default=engine.RENDER_MODE)
+    check_parser.add_argument("--tolerance", type=int, default=0, help="per-channel difference still counted as equal")
+    check_parser.add_argument("--max-ratio", type=float, default=0.0, help="fraction of differing pixels a frame may have")
+    check_parser.add_argument("--diff-dir", help="write difference images of failing frames here")
+
+    args = parser.parse_args()
+    if args.command == "record":
+        record(args)
+    else:
+        sys.exit(check(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Client-side latency hiding: move prediction and rotation reprojection.
+
+The server keeps no player state: every input carries the position the move
+starts from (`old_x`, `old_y`) and the one it tries to reach, and the ray stage
+resolves the collision against `map_source`. The client has the same map
+(`Renderer.game_map`), so `MovePredictor` resolves each move with the same rule
+(`game_map.resolve_move()`) the moment the key is pressed, and the next move
+starts from the predicted position instead of waiting a round trip for the
+frame. When the frame arrives, its position is checked against the prediction
+and the player is shifted by any difference, so the server stays authoritative.
+
+A rotation cannot wait for its frame either. Turning the camera on the spot only
+changes the direction of every screen column's ray: `reproject()` rebuilds the
+view of the new direction from the columns of the last frame, scaling each
+column about the horizon because the distance to the camera plane changes with
+the angle. Columns that turned in from outside the last frame repeat its edge
+column until the real frame replaces them.
+"""
+import numpy as np
+
+from frame_cache import POSE_QUANTUM
+from framebuffer import FrameBuffer
+from game_map import resolve_move
+
+
+class MovePredictor:
+    """Predicts the collision-resolved position of moves and checks it against the server's."""
+
+    def __init__(self, game_map, tolerance=POSE_QUANTUM):
+        self.game_map = game_map
+        # Frames from the frame cache were rendered for a pose within one quantum of the requested one
+        self.tolerance = tolerance
+
+        # Counters
+        self.predicted = 0
+        self.mispredicted = 0
+        self.max_error = 0.0
+
+    def predict(self, pose):
+        """The position the server will return for `pose`, rounded to Float32 like the server's."""
+        self.predicted += 1
+        return self.resolve(pose)
+
+    def resolve(self, pose):
+        x, y = resolve_move(self.game_map, pose["old_x"], pose["old_y"], pose["try_x"], pose["try_y"])
+        return float(np.float32(x)), float(np.float32(y))
+
+    def reconcile(self, pose, pos_x, pos_y):
+        """The (dx, dy) correction of the predicted position of `pose`, given the server's position."""
+        x, y = self.resolve(pose)
+        dx, dy = pos_x - x, pos_y - y
+        if max(abs(dx), abs(dy)) <= self.tolerance:
+            return 0.0, 0.0
+        self.mispredicted += 1
+        self.max_error = max(self.max_error, max(abs(dx), abs(dy)))
+        return dx, dy
+
+
+def pixel_map(width, height, from_pose, to_pose):
+    """Index of the pixel of a `from_pose` frame shown at every pixel of the `to_pose` view, row-major.
+
+    A screen column `x` casts the ray `dir + plane * (2x / width - 1)`, like the
+    ray stage. Each ray of the new view is written as `s * (dir + plane * c)` in
+    the old camera, which gives its old column from `c`. Walls, floors and
+    ceilings are `height / distance` tall about the horizon, and the distance
+    along the ray scales with `1 / s`, so the column is stretched by `s`.
+    Returns None when the views do not overlap.
+    """
+    dir_x, dir_y, plane_x, plane_y = (from_pose[k] for k in ("dir_x", "dir_y", "plane_x", "plane_y"))
+    camera_x = 2.0 * np.arange(width) / width - 1.0
+    ray_x = to_pose["dir_x"] + to_pose["plane_x"] * camera_x
+    ray_y = to_pose["dir_y"] + to_pose["plane_y"] * camera_x
+
+    cross = ray_x * plane_y - ray_y * plane_x
+    scale = cross / (dir_x * plane_y - dir_y * plane_x)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cols = np.rint(((dir_x * ray_y - dir_y * ray_x) / cross + 1.0) * width / 2.0)
+    ahead = scale > 0
+    if not (ahead & (cols >= 0) & (cols < width)).any():
+        return None
+    # Rays behind the old camera have no column in it, they repeat the edge on their side
+    cols = np.where(ahead, cols, np.where(camera_x < 0, 0, width - 1))
+    cols = np.clip(cols, 0, width - 1).astype(np.intp)
+
+    horizon = height // 2
+    scale = np.where(ahead, scale, 1.0)
+    rows = np.rint(horizon + (np.arange(height)[:, None] - horizon) / scale)
+    rows = np.clip(rows, 0, height - 1).astype(np.intp)
+    return (rows * width + cols).ravel()
+
+
+def reproject(framebuffer, from_pose, to_pose):
+    """A new `FrameBuffer` of a `from_pose` frame turned to the view direction of `to_pose`, or None."""
+    index = pixel_map(framebuffer.width, framebuffer.height, from_pose, to_pose)
+    if index is None:
+        return None
+    reprojected = FrameBuffer(framebuffer.width, framebuffer.height)
+    # One 3-byte item per pixel, so every pixel is gathered with a single index
+    pixels = np.frombuffer(framebuffer.buffer, dtype="V3")
+    np.take(pixels, index, out=np.frombuffer(reprojected.buffer, dtype="V3"))
+    return reprojected
@@ -0,0 +1,341 @@
+"""
+NumPy reference renderer.
+
+A client-side reimplementation of the SQL pipeline, vectorized with NumPy:
+collision and the ray stage (`ray_view.sql` with every `ray_traversal_*.sql`),
+per-pixel shading with mipmapped texture lookups (`render_view.sql`), the
+post-process passes over each tile and its halo (`post_process_view.sql` with
+every `post_process_*.sql`) and every frame encoding (`frame_encoding_*.sql`). It follows the SQL expression by
+expression, including its Float32 casts, ClickHouse's wrapping integer
+conversions and dictionary defaults for missing ids, so for a given pose, map
+and texture set it produces the same pixels as the server.
+
+It is the yardstick for optimized SQL variants (see `golden_images.py`) and
+backs the "local" render mode, which renders without touching the server.
+"""
+import numpy as np
+
+import render_plan
+import texture_store
+from game_map import distance_field
+
+# Constants of the SQL templates
+RAY_STEPS = 25
+VIEW_DIST = 30
+
+# Surfaces per theme in the atlas: 0 = wall1, 1 = wall2, 2 = floor, 3 = ceiling
+SURFACES = 4
+FLOOR = 2
+
+# Fixed salt of ClickHouse's `intHash32` function
+INT_HASH32_SALT = np.uint64(0x75D9543DE018BF45)
+
+
+def _to_int(values, dtype):
+    """ClickHouse's float to integer conversion: truncate, then wrap to the type's width."""
+    with np.errstate(invalid='ignore'):
+        return np.trunc(np.nan_to_num(values, nan=0.0, posinf=0.0, neginf=0.0)).astype(np.int64).astype(dtype)
+
+
+def _lookup(table, ids):
+    """`dictGet` on a FLAT dictionary: the attribute of each id, 0 for missing ids."""
+    ids = ids.astype(np.int64)
+    found = (ids >= 0) & (ids < len(table))
+    return np.where(found, table[np.where(found, ids, 0)], 0)
+
+
+def int_hash32(keys):
+    """ClickHouse `intHash32` of integer keys (sign-extended to UInt64)."""
+    key = np.asarray(keys).astype(np.int64).astype(np.uint64) ^ INT_HASH32_SALT
+    key = (~key) + (key << np.uint64(18))
+    key = key ^ ((key >> np.uint64(31)) | (key << np.uint64(33)))
+    key = key * np.uint64(21)
+    key = key ^ ((key >> np.uint64(11)) | (key << np.uint64(53)))
+    key = key + (key << np.uint64(6))
+    key = key ^ ((key >> np.uint64(22)) | (key << np.uint64(42)))
+    return key.astype(np.uint32)
+
+
+def floor_distances(height):
+    """The `dict_floor_dist` rows of one render height, indexed by screen row (see `create_source_tables.sql`)."""
+    row = np.arange(height, dtype=np.float64)
+    with np.errstate(divide='ignore'):
+        dist = np.where(row <= height // 2, 0.0, height / (2.0 * row - height))
+    return dist.astype(np.float32)
+
+
+def load_atlas(theme_names, themes, surfaces, size, intensity, levels, cache_dir=None):
+    """Texture atlas as (r, g, b) uint8 arrays indexed by atlas id, laid out like `Renderer.upload_textures()`."""
+    texels = texture_store.mip_texels(size, levels)
+    atlas = np.zeros((len(theme_names) * len(surfaces) * texels + 1, 3), dtype=np.uint8)
+    loaded = {}
+    for theme_idx, theme_name in enumerate(theme_names):
+        for surface_idx, surface in enumerate(surfaces):
+            texture_file = themes[theme_name][surface]
+            if texture_file not in loaded:
+                pixels, _ = texture_store.load_texture(f"textures/{texture_file}", size, intensity, cache_dir)
+                loaded[texture_file] = texture_store.mip_chain(pixels, size, levels)
+            base_id = (theme_idx * len(surfaces) + surface_idx) * texels + 1
+            atlas[base_id:base_id + texels] = loaded[texture_file]
+    return atlas[:, 0], atlas[:, 1], atlas[:, 2]
+
+
+class ReferenceRenderer:
+    """Renders poses into the post-processed tile rows the server would return."""
+
+    def __init__(self, game_map, tiles, traversal, atlas, tex_size, mip_levels, max_lod, encoding="rgb24",
+                 post_process=("blur",)):
+        self.map_w, self.map_h = game_map.width, game_map.height
+        self.map_val = np.concatenate([[0], np.asarray(game_map.cells, dtype=np.uint8)])
+        self.map_dist = np.concatenate([[0], np.frombuffer(distance_field(game_map), dtype=np.uint8)])
+        self.tiles = tiles
+        self.traversal = traversal
+        self.atlas = atlas
+        self.tex_size = tex_size
+        self.mip_levels = mip_levels
+        self.max_lod = min(max_lod, mip_levels - 1)
+        self.encoding = encoding
+        self.post_process_chain = tuple(post_process)
+        self.halo = render_plan.post_process_halo(self.post_process_chain)
+        self.frame_size = render_plan.frame_size(tiles)
+        self.floor_dist = {}
+
+    def render(self, pose):
+        """`(tile_id, pos_x, pos_y, pixels)` rows of a pose, like `render_plan.fetch_query`.
+
+        The pose is rendered at its `res_w` x `res_h`, by default the planned frame size.
+        """
+        resolution = (pose.get("res_w", self.frame_size[0]), pose.get("res_h", self.frame_size[1]))
+        rays = self.rays(pose, resolution)
+        colors = self.shade(rays, pose["theme"], resolution)
+        pos_x, pos_y = np.float32(rays["valid_x"]), np.float32(rays["valid_y"])
+        return [
+            (tile.tile_id, pos_x, pos_y, self.post_process(colors, tile))
+            for tile in render_plan.scale_tiles(self.tiles, resolution)
+        ]
+
+    # Ray stage (ray_view.sql)
+
+    def _cell(self, attribute, ids):
+        return _lookup(self.map_val if attribute == "val" else self.map_dist, _to_int(ids, np.uint32))
+
+    def collide(self, pose):
+        """Collision-resolved position: x first, then y, each probed 0.2 ahead."""
+        old_x, old_y, try_x, try_y = pose["old_x"], pose["old_y"], pose["try_x"], pose["try_y"]
+        probe_x = np.floor(try_x + (0.2 if try_x > old_x else -0.2))
+        valid_x = try_x if self._cell("val", np.floor(old_y) * self.map_w + probe_x + 1) == 0 else old_x
+        probe_y = np.floor(try_y + (0.2 if try_y > old_y else -0.2))
+        valid_y = try_y if self._cell("val", probe_y * self.map_w + np.floor(valid_x) + 1) == 0 else old_y
+        return float(valid_x), float(valid_y)
+
+    def rays(self, pose, resolution):
+        """One value per screen column of every `rendered_rays` column the shading needs."""
+        width, height = resolution
+        valid_x, valid_y = self.collide(pose)
+        dir_x, dir_y = np.float64(np.float32(pose["dir_x"])), np.float64(np.float32(pose["dir_y"]))
+        plane_x, plane_y = np.float64(np.float32(pose["plane_x"])), np.float64(np.float32(pose["plane_y"]))
+        camera = 2.0 * np.arange(width, dtype=np.float64) * np.float64(np.float32(1.0 / width)) - 1.0
+        r_dir_x = dir_x + plane_x * camera
+        r_dir_y = dir_y + plane_y * camera
+
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            raw_hit_dist, side = getattr(self, f"_traverse_{self.traversal}")(valid_x, valid_y, r_dir_x, r_dir_y)
+            hit_dist = raw_hit_dist
+            perp_wall_dist = raw_hit_dist * (dir_x * r_dir_x + dir_y * r_dir_y)
+            hit_x = valid_x + r_dir_x * raw_hit_dist
+            hit_y = valid_y + r_dir_y * raw_hit_dist
+            tex_max = self.tex_size - 1
+            hit_x_wall_raw = _to_int((hit_x - np.floor(hit_x)) * self.tex_size, np.int32).astype(np.int64)
+            hit_y_wall_raw = _to_int((hit_y - np.floor(hit_y)) * self.tex_size, np.int32).astype(np.int64)
+            hit_x_wall = np.where(int_hash32(_to_int(hit_y, np.int32)) & 1 == 0, tex_max - hit_x_wall_raw, hit_x_wall_raw)
+            hit_y_wall = np.where(int_hash32(_to_int(hit_x, np.int32)) & 1 == 0, tex_max - hit_y_wall_raw, hit_y_wall_raw)
+
+            line_height = height / (perp_wall_dist + 0.0001)
+            tex_step = (1.0 / line_height) * self.tex_size
+            return {
+                "valid_x": valid_x, "valid_y": valid_y,
+                "draw_start": _to_int(height // 2 - line_height * 0.5, np.int32).astype(np.int64),
+                "draw_end": _to_int(height // 2 + line_height * 0.5, np.int32).astype(np.int64),
+                "tex_step": tex_step,
+                "tex_base": -(height // 2 - line_height * 0.5) * tex_step,
+                "base_shade": np.where(side, 0.6, 1.0) * (1.0 - np.minimum(np.minimum(hit_dist, 20.0) * 0.125, 1.0)),
+                "tx": np.minimum(np.where(side, hit_x_wall, hit_y_wall), tex_max),
+                "hit_x": hit_x, "hit_y": hit_y, "perp_wall_dist": perp_wall_dist,
+            }
+
+    def _traverse_brute(self, valid_x, valid_y, r_dir_x, r_dir_y):
+        steps = np.arange(1, RAY_STEPS, dtype=np.float64)[:, None]
+        d_x = (np.floor(valid_x) + np.where(r_dir_x > 0, steps, 1 - steps) - valid_x) / r_dir_x
+        ids_x = np.floor(valid_y + r_dir_y * d_x) * self.map_w + np.floor(valid_x + r_dir_x * d_x + np.where(r_dir_x > 0, 0.005, -0.005)) + 1
+        dist_x = np.where((d_x > 0) & (d_x < VIEW_DIST) & (self._cell("val", ids_x) > 0), d_x, 999.0).min(axis=0)
+        d_y = (np.floor(valid_y) + np.where(r_dir_y > 0, steps, 1 - steps) - valid_y) / r_dir_y
+        ids_y = np.floor(valid_y + r_dir_y * d_y + np.where(r_dir_y > 0, 0.005, -0.005)) * self.map_w + np.floor(valid_x + r_dir_x * d_y) + 1
+        dist_y = np.where((d_y > 0) & (d_y < VIEW_DIST) & (self._cell("val", ids_y) > 0), d_y, 999.0).min(axis=0)
+        return np.minimum(dist_x, dist_y), dist_y < dist_x
+
+    def _traverse_dda(self, valid_x, valid_y, r_dir_x, r_dir_y):
+        map_x = np.full(len(r_dir_x), int(np.floor(valid_x)), dtype=np.int64)
+        map_y = np.full(len(r_dir_x), int(np.floor(valid_y)), dtype=np.int64)
+        delta_x, delta_y = np.abs(1.0 / r_dir_x), np.abs(1.0 / r_dir_y)
+        step_x = np.where(r_dir_x < 0, -1, 1)
+        step_y = np.where(r_dir_y < 0, -1, 1)
+        side_x = np.where(r_dir_x < 0, (valid_x - map_x) * delta_x, (map_x + 1.0 - valid_x) * delta_x)
+        side_y = np.where(r_dir_y < 0, (valid_y - map_y) * delta_y, (map_y + 1.0 - valid_y) * delta_y)
+        side = np.zeros(len(r_dir_x), dtype=bool)
+        hit = np.zeros(len(r_dir_x), dtype=bool)
+        for _ in range(self.map_w + self.map_h):
+            active = ~hit
+            if not active.any():
+                break
+            along_x = active & (side_x < side_y)
+            along_y = active & ~(side_x < side_y)
+            map_x = np.where(along_x, map_x + step_x, map_x)
+            map_y = np.where(along_y, map_y + step_y, map_y)
+            side_x = np.where(along_x, side_x + delta_x, side_x)
+            side_y = np.where(along_y, side_y + delta_y, side_y)
+            side = np.where(active, along_y, side)
+            hit = np.where(active, _lookup(self.map_val, (map_y * self.map_w + map_x + 1).astype(np.uint32)) > 0, hit)
+        raw_hit_dist = np.where(hit, np.where(side, side_y - delta_y, side_x - delta_x), 999.0)
+        return raw_hit_dist, side
+
+    def _traverse_sdf(self, valid_x, valid_y, r_dir_x, r_dir_y):
+        step_x = np.where(r_dir_x < 0, -1, 1)
+        step_y = np.where(r_dir_y < 0, -1, 1)
+        inv_x, inv_y = 1.0 / r_dir_x, 1.0 / r_dir_y
+        inv_max = 1.0 / np.maximum(np.abs(r_dir_x), np.abs(r_dir_y))
+        map_x = np.full(len(r_dir_x), int(np.floor(valid_x)), dtype=np.int64)
+        map_y = np.full(len(r_dir_x), int(np.floor(valid_y)), dtype=np.int64)
+        t = np.zeros(len(r_dir_x))
+        side = np.zeros(len(r_dir_x), dtype=bool)
+        hit = np.zeros(len(r_dir_x), dtype=bool)
+        for _ in range(self.map_w + self.map_h):
+            active = ~hit
+            if not active.any():
+                break
+            dist = _lookup(self.map_dist, (map_y * self.map_w + map_x + 1).astype(np.uint32)).astype(np.int64)
+            hit = hit | (active & (dist == 0))
+            jump = active & (dist > 1)
+            jump_t = t + (dist - 1) * inv_max
+            next_x = (map_x + np.where(step_x > 0, 1, 0) - valid_x) * inv_x
+            next_y = (map_y + np.where(step_y > 0, 1, 0) - valid_y) * inv_y
+            cross = active & (dist == 1)
+            cross_x = cross & (next_x < next_y)
+            cross_y = cross & ~(next_x < next_y)
+            map_x = np.select([jump, cross_x], [_to_int(np.floor(valid_x + r_dir_x * jump_t), np.int32), map_x + step_x], map_x)
+            map_y = np.select([jump, cross_y], [_to_int(np.floor(valid_y + r_dir_y * jump_t), np.int32), map_y + step_y], map_y)
+            t = np.select([jump, cross_x, cross_y], [jump_t, next_x, next_y], t)
+            side = np.select([cross_x, cross_y], [False, True], side)
+        return np.where(hit, t, 999.0), side
+
+    # Shading stage (render_view.sql)
+
+    def shade(self, rays, theme, resolution):
+        """(height, width) packed 0xBBGGRR colors of the whole frame."""
+        width, height = resolution
+        size = self.tex_size
+        tex_max = size - 1
+        tex_texels = size * size
+        surface_texels = (4 * (tex_texels - (tex_texels >> (2 * self.mip_levels)))) // 3
+        texels_per_dist = size * 1.32 / width
+
+        if height not in self.floor_dist:
+            self.floor_dist[height] = floor_distances(height)
+        y = np.arange(height, dtype=np.int64)[:, None]
+        floor_dist = self.floor_dist[height][np.where(y < height // 2, height - 1 - y, y)].astype(np.float64)
+        floor_shade = 1.0 - np.minimum(floor_dist * 0.125, 1.0)
+        theme_base = _to_int(theme * SURFACES * surface_texels, np.uint32).astype(np.int64)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            wall_lod = np.minimum(_to_int(np.maximum(np.floor(np.log2(rays["tex_step"])), 0), np.uint8), self.max_lod).astype(np.int64)
+            floor_lod = np.minimum(_to_int(np.maximum(np.floor(np.log2(floor_dist * texels_per_dist)), 0), np.uint8), self.max_lod).astype(np.int64)
+            w_ty = np.minimum(np.maximum(_to_int(y * rays["tex_step"] + rays["tex_base"], np.int32).astype(np.int64), 0), tex_max)
+            perp = rays["perp_wall_dist"] + 0.001
+            f_ty = _to_int((rays["valid_y"] + floor_dist * ((rays["hit_y"] - rays["valid_y"]) / perp)) * size, np.int32).astype(np.int64) & tex_max
+            f_tx = _to_int((rays["valid_x"] + floor_dist * ((rays["hit_x"] - rays["valid_x"]) / perp)) * size, np.int32).astype(np.int64) & tex_max
+
+        def level_offset(lod):
+            return (4 * (tex_texels - (tex_texels >> (2 * lod)))) // 3
+
+        w_tex_idx = theme_base + level_offset(wall_lod) + (w_ty >> wall_lod) * (size >> wall_lod) + (rays["tx"] >> wall_lod) + 1
+        f_tex_idx = theme_base + FLOOR * surface_texels + level_offset(floor_lod) + (f_ty >> floor_lod) * (size >> floor_lod) + (f_tx >> floor_lod) + 1
+        c_tex_idx = f_tex_idx + surface_texels
+
+        is_wall = (y >= rays["draw_start"]) & (y <= rays["draw_end"])
+        is_ceiling = ~is_wall & (y < rays["draw_start"])
+        idx = np.select([is_wall, is_ceiling], [w_tex_idx, c_tex_idx], f_tex_idx).astype(np.uint32)
+        shade = np.where(is_wall, rays["base_shade"], floor_shade)
+
+        color = np.zeros((height, width), dtype=np.uint32)
+        for shift, channel in zip((0, 8, 16), self.atlas):
+            color |= _to_int(_lookup(channel, idx) * shade, np.uint32) << np.uint32(shift)
+        return color
+
+    # Post-process stage (post_process_view.sql)
+
+    def post_process(self, colors, tile):
+        """The packed pixels of one tile: its halo rectangle filtered by every pass, then cropped."""
+        height, width = colors.shape
+        x0, y0 = max(tile.x0 - self.halo, 0), max(tile.y0 - self.halo, 0)
+        x1, y1 = min(tile.x0 + tile.width + self.halo, width), min(tile.y0 + tile.height + self.halo, height)
+        pixels = colors[y0:y1, x0:x1]
+        for name in self.post_process_chain:
+            pixels = getattr(self, f"_{name}")(pixels, y0, height)
+        tile_pixels = pixels[tile.y0 - y0:tile.y0 - y0 + tile.height, tile.x0 - x0:tile.x0 - x0 + tile.width]
+        return self.encode(tile_pixels.reshape(-1), self.encoding)
+
+    @staticmethod
+    def _blur(pixels, row0, height):
+        """SWAR 5-tap blur (`post_process_blur.sql`), with zeros beyond the rectangle's edges."""
+        padded = np.pad(pixels, 1)
+        left, right = padded[1:-1, :-2], padded[1:-1, 2:]
+        up, down = padded[:-2, 1:-1], padded[2:, 1:-1]
+        blurred = np.zeros_like(pixels)
+        for mask in (np.uint32(0x00FF00FF), np.uint32(0x0000FF00)):
+            total = (pixels & mask) * np.uint32(4) + (left & mask) + (right & mask) + (up & mask) + (down & mask)
+            blurred |= (total >> np.uint32(3)) & mask
+        return blurred
+
+    @staticmethod
+    def _sharpen(pixels, row0, height):
+        """Unsharp mask, 2 * c - blur(c) per channel (`post_process_sharpen.sql`)."""
+        blurred = ReferenceRenderer._blur(pixels, row0, height)
+        sharpened = np.zeros_like(pixels)
+        for shift in (np.uint32(0), np.uint32(8), np.uint32(16)):
+            channel = 2 * ((pixels >> shift) & 0xFF).astype(np.int32) - ((blurred >> shift) & 0xFF).astype(np.int32)
+            sharpened |= np.clip(channel, 0, 255).astype(np.uint32) << shift
+        return sharpened
+
+    @staticmethod
+    def _fog(pixels, row0, height):
+        """Blend towards gray, strongest on the horizon row (`post_process_fog.sql`)."""
+        rows = np.arange(row0, row0 + pixels.shape[0], dtype=np.int64)[:, None]
+        weight = (128 * (height - np.abs(2 * rows + 1 - height))) // height
+        colors = pixels.astype(np.int64)
+        fogged = np.zeros(pixels.shape, dtype=np.int64)
+        for mask, fog in ((0x00FF00FF, 0x00600060), (0x0000FF00, 0x00006000)):
+            fogged |= (((colors & mask) * (256 - weight) + fog * weight) >> 8) & mask
+        return fogged.astype(np.uint32)
+
+    @staticmethod
+    def encode(colors, encoding):
+        """Packed 0xBBGGRR colors as the bytes of a frame encoding (`frame_encoding_*.sql`)."""
+        if encoding == "rgb565":
+            r, g, b = colors & 0xFF, (colors >> 8) & 0xFF, colors >> 16
+            return ((r >> 3) << 11 | (g >> 2) << 5 | b >> 3).astype('<u2').tobytes()
+        if encoding == "palette":
+            for bits in range(7):
+                quantized = colors & np.uint32((0xFF & ~((1 << bits) - 1)) * 0x010101)
+                distinct, first, inverse = np.unique(quantized, return_index=True, return_inverse=True)
+                if len(distinct) <= 256:
+                    break
+            # Palette entries in order of first use, like arrayDistinct and arrayEnumerateDense
+            order = np.argsort(first)
+            rank = np.empty_like(order)
+            rank[order] = np.arange(len(order))
+            palette = distinct[order]
+            return (
+                bytes([len(palette) - 1]) + ReferenceRenderer.encode(palette, "rgb24")
+                + rank[inverse].astype(np.uint8).tobytes()
+            )
+        rgb = np.stack([colors & 0xFF, (colors >> 8) & 0xFF, (colors >> 16) & 0xFF], axis=1).astype(np.uint8)
+        return rgb.tobytes()
@@ -0,0 +1,85 @@
+"""
+Headless rendering: renders a camera path without a window into PNG files or a
+raw RGB24 stream.
+
+Uses the same `.env` settings as the game. The camera path is a scripted path
+(see `camera_paths.py`) or a recorded `.jsonl` file. With `--sink raw` the frames
+go to stdout and all log output to stderr, so it can be piped into an encoder:
+
+    python src/render_frames.py --path corridor --sink raw | \\
+        ffmpeg -f rawvideo -pix_fmt rgb24 -s 640x480 -r 30 -i - corridor.mp4
+
+Every frame is rendered at the configured resolution (`DOOMHOUSE_RESOLUTION`),
+which the log reports for the encoder. By default every frame is rendered like
+in the game. With `--batch N` the path is uploaded as a trajectory table and
+rendered N frames per query (see `Renderer.render_trajectory()`), for
+throughput rather than latency. `--table` renders the poses of an existing
+`player_input`-like table in batches.
+
+Usage: python src/render_frames.py [--path NAME|FILE | --table DB.TABLE] [--batch N]
+                                   [--sink png|raw] [--out DIR] [--attach]
+"""
+import argparse
+import contextlib
+import re
+import sys
+import time
+
+import camera_paths
+from frame_sinks import PngSequenceSink, RawRGBSink
+from renderer import BATCH_FRAMES, Renderer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render a camera path without a window")
+    parser.add_argument("--path", default="rotate", help="scripted path name or recorded .jsonl file")
+    parser.add_argument("--table", help="render the poses of this table (frame_id, pose columns, theme) instead of a path")
+    parser.add_argument("--batch", type=int, default=0, metavar="N",
+                        help=f"render N frames per query (0 = one at a time, {BATCH_FRAMES} with --table)")
+    parser.add_argument("--sink", choices=("png", "raw"), default="png")
+    parser.add_argument("--out", default="frames", help="output directory of the png sink")
+    parser.add_argument("--attach", action="store_true", help="use the deployed scene even if it differs from the settings")
+    args = parser.parse_args()
+    if args.table and not re.fullmatch(r"[A-Za-z0-9_.]+", args.table):
+        parser.error(f"invalid table name '{args.table}'")
+
+    # Keep stdout for the frames, everything else goes to stderr
+    stdout = sys.stdout.buffer
+    with contextlib.redirect_stdout(sys.stderr):
+        renderer = Renderer(frame_cache_mb=0)
+        renderer.connect()
+        renderer.load_scene(deploy=False if args.attach else None)
+
+        if args.table:
+            source, poses = args.table, None
+        elif args.path in camera_paths.SCRIPTED_PATHS:
+            source, poses = args.path, camera_paths.SCRIPTED_PATHS[args.path](renderer.game_map)
+        else:
+            source, poses = args.path, camera_paths.load_path(args.path)
+        sink = PngSequenceSink(args.out) if args.sink == "png" else RawRGBSink(stdout, renderer.resolution)
+
+        batch = args.batch or (BATCH_FRAMES if args.table else 0)
+        if batch:
+            table = args.table or renderer.upload_trajectory(poses)
+            frames = renderer.render_trajectory(table, batch)
+            print(f"🎬 Rendering '{source}' to the {args.sink} sink, {batch} frames per query")
+        else:
+            frames = (renderer.render(pose) for pose in poses)
+            print(f"🎬 Rendering {len(poses)} frames of '{source}' to the {args.sink} sink")
+        print(f"🎬 Frames are {renderer.resolution[0]}x{renderer.resolution[1]}")
+
+        count = 0
+        start = time.perf_counter()
+        try:
+            for frame in frames:
+                sink.write(frame)
+                count += 1
+        finally:
+            sink.close()
+            renderer.close()
+        elapsed = time.perf_counter() - start
+        print(f"🎬 Done: {count} frames in {elapsed:.1f}s ({count / elapsed if elapsed else 0.0:.1f} frames/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,378 @@
+"""
+Screen tiling for the parallel render pipeline.
+
+The render and post-process views are SQL templates that are instantiated once
+per screen tile. This module decides the tile rectangles, fills in the templates
+and builds the per-tile fetch queries used by the client. The same templates
+also back the single-query render mode, which skips the Materialized View chain,
+and the batch mode, which renders many frames of a trajectory per query.
+"""
+import math
+import os
+import re
+from collections import namedtuple
+from string import Template
+
+# "rows": horizontal strips, "cols": vertical strips, "grid": 2D tiles
+TILE_LAYOUTS = ("rows", "cols", "grid")
+
+# Grid traversals of the ray stage, see `SQL/ray_traversal_*.sql`
+RAY_TRAVERSALS = ("brute", "dda", "sdf")
+
+# Texture atlas lookups of the shading stage, see `SQL/texture_sample_*.sql`
+TEXTURE_SAMPLINGS = ("channels", "packed")
+
+# Pixel packings of the post-process stage, see `SQL/frame_encoding_*.sql`
+FRAME_ENCODINGS = ("rgb24", "rgb565", "palette")
+
+# Filters of the post-process stage, see `SQL/post_process_*.sql`, chained in any order
+POST_PROCESS_PASSES = ("blur", "sharpen", "fog")
+
+# Halo pixels a pass needs around the tile: how far it reads its neighbours
+PASS_HALO = {"blur": 1, "sharpen": 1, "fog": 0}
+
+Tile = namedtuple("Tile", ["tile_id", "x0", "y0", "width", "height"])
+
+SQL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "SQL")
+
+# Pose parameters of the single-query render mode, bound server-side.
+# Besides these Float64 values, every input carries the texture atlas theme index
+# and the render resolution (RESOLUTION_PARAMS).
+POSE_PARAMS = ("old_x", "old_y", "try_x", "try_y", "dir_x", "dir_y", "plane_x", "plane_y")
+RESOLUTION_PARAMS = ("res_w", "res_h")
+
+# Columns of the per-column ray stage (`doomhouse.rendered_rays`)
+RAY_COLUMNS = (
+    "x", "valid_x", "valid_y", "draw_start", "draw_end", "tex_step", "tex_base",
+    "base_shade", "tx", "hit_x", "hit_y", "perp_wall_dist", "lookups", "theme",
+    "session_id", "frame_id", "res_w", "res_h",
+)
+
+
+def _split(length, parts):
+    """Split `length` pixels into `parts` contiguous (offset, size) spans."""
+    bounds = [length * i // parts for i in range(parts + 1)]
+    return [(bounds[i], bounds[i + 1] - bounds[i]) for i in range(parts)]
+
+
+def _grid_shape(count):
+    """Return the (rows, cols) factorization of `count` closest to a square."""
+    rows = int(math.isqrt(count))
+    while count % rows:
+        rows -= 1
+    return rows, count // rows
+
+
+def plan_tiles(count, layout, width, height):
+    """Split a width x height frame into `count` tiles using the given layout."""
+    if layout not in TILE_LAYOUTS:
+        raise ValueError(f"Unknown tile layout '{layout}', expected one of {TILE_LAYOUTS}")
+
+    if layout == "rows":
+        rows, cols = max(1, min(count, height)), 1
+    elif layout == "cols":
+        rows, cols = 1, max(1, min(count, width))
+    else:
+        rows, cols = _grid_shape(max(1, min(count, width * height)))
+
+    tiles = []
+    for y0, tile_h in _split(height, rows):
+        for x0, tile_w in _split(width, cols):
+            tiles.append(Tile(len(tiles) + 1, x0, y0, tile_w, tile_h))
+    return tiles
+
+
+def frame_size(tiles):
+    """The (width, height) of the frame a tile plan covers."""
+    return max(tile.x0 + tile.width for tile in tiles), max(tile.y0 + tile.height for tile in tiles)
+
+
+def scale_tiles(tiles, resolution):
+    """The tiles of a plan at another render resolution, as the render views scale them.
+
+    Every tile keeps its share of the frame, so a tile may end up empty when
+    the resolution is much smaller than the planned frame.
+    """
+    width, height = frame_size(tiles)
+    res_w, res_h = resolution
+    scaled = []
+    for tile in tiles:
+        x0, y0 = tile.x0 * res_w // width, tile.y0 * res_h // height
+        x1, y1 = (tile.x0 + tile.width) * res_w // width, (tile.y0 + tile.height) * res_h // height
+        scaled.append(Tile(tile.tile_id, x0, y0, x1 - x0, y1 - y0))
+    return scaled
+
+
+def detect_server_cores(client):
+    """Return the number of threads the server uses per query (defaults to its core count)."""
+    value = client.query(
+        "SELECT value FROM system.settings WHERE name = 'max_threads'"
+    ).result_rows[0][0]
+    # The value is either a plain number or e.g. "'auto(16)'"
+    match = re.search(r"\d+", str(value))
+    return int(match.group()) if match else 1
+
+
+def parse_post_process(text):
+    """Parse a comma-separated chain of POST_PROCESS_PASSES ("none" or "" for no passes)."""
+    chain = tuple(name.strip() for name in text.split(",") if name.strip() and name.strip() != "none")
+    for name in chain:
+        if name not in POST_PROCESS_PASSES:
+            raise ValueError(f"Unknown post-process pass '{name}', expected one of {POST_PROCESS_PASSES}")
+    return chain
+
+
+def post_process_halo(chain):
+    """Halo rows and columns a tile needs for a post-process chain, every pass reading the previous one's output."""
+    return sum(PASS_HALO[name] for name in chain)
+
+
+def post_process_params(chain, full_width=False):
+    """Placeholder values for the post-process chain of `post_process_view.sql`.
+
+    Pass i reads `pass_<i>` and writes `pass_<i + 1>`, starting from the
+    rendered pixels. Every pass fragment may use `${blur}`, the blur pass over
+    its own input. Tiles spanning the `full_width` of the frame only have halo
+    rows to crop.
+    """
+    blur = _fragment("post_process_blur.sql")
+    passes = []
+    for i, name in enumerate(chain):
+        src, dst = f"pass_{i}", f"pass_{i + 1}"
+        params = {"src": src, "dst": dst, "blur": fill_template(blur, {"src": src, "dst": f"{dst}_blurred"})}
+        passes.append(fill_template(_fragment(f"post_process_{name}.sql"), params))
+    processed = f"pass_{len(chain)}"
+    halo = post_process_halo(chain)
+    crop = "post_process_crop_rows.sql" if full_width else "post_process_crop.sql"
+    return {
+        "halo": halo,
+        "passes": "".join(f"{item},\n    " for item in passes),
+        "processed": processed,
+        "crop": fill_template(_fragment(crop), {"src": processed}) if halo else f"{processed} AS pixels",
+    }
+
+
+def template_params(tile, frame, encoding="rgb24", post_process=("blur",)):
+    """Placeholder values for instantiating a per-tile SQL template.
+
+    `frame` is the (width, height) of the planned frame, which the views scale
+    the tile to the render resolution of each input by. The finished tile
+    tables keep the latest frame of every session, with its pixels filtered
+    by the `post_process` chain of POST_PROCESS_PASSES and packed in one of
+    FRAME_ENCODINGS.
+    """
+    if encoding not in FRAME_ENCODINGS:
+        raise ValueError(f"Unknown frame encoding '{encoding}', expected one of {FRAME_ENCODINGS}")
+    return {
+        **post_process_params(post_process, tile.x0 == 0 and tile.width == frame[0]),
+        "tile_id": tile.tile_id,
+        "x0": tile.x0,
+        "y0": tile.y0,
+        "x1": tile.x0 + tile.width - 1,
+        "y1": tile.y0 + tile.height - 1,
+        "tile_w": tile.width,
+        "tile_h": tile.height,
+        "frame_w": frame[0],
+        "frame_h": frame[1],
+        "input": "doomhouse.player_input",
+        "rays": "doomhouse.rendered_rays",
+        "source": f"doomhouse.rendered_frame_{tile.tile_id}",
+        "encode": _fragment(f"frame_encoding_{encoding}.sql"),
+    }
+
+
+def _fragment(filename):
+    """Load a SQL fragment (a single expression list, without comments)."""
+    with open(os.path.join(SQL_DIR, filename), 'r') as f:
+        return split_statements(f.read())[0]
+
+
+def ray_params(traversal, map_size, tex_size, input="doomhouse.player_input"):
+    """Placeholder values for the ray stage template (`ray_view.sql`).
+
+    `map_size` is the (width, height) of the loaded map in cells, and
+    `tex_size` the texels per side of the textures.
+    """
+    if traversal not in RAY_TRAVERSALS:
+        raise ValueError(f"Unknown ray traversal '{traversal}', expected one of {RAY_TRAVERSALS}")
+    fragment = _fragment(f"ray_traversal_{traversal}.sql")
+    return {"input": input, "traversal": fragment, "map_w": map_size[0], "map_h": map_size[1], "tex_size": tex_size}
+
+
+def sampling_params(sampling, tex_size, mip_levels, max_lod):
+    """Placeholder values for the texture lookups of the shading template (`render_view.sql`).
+
+    `tex_size` is the texels per side of the textures, `mip_levels` the number
+    of mip levels stored per texture in the atlas, and `max_lod` the coarsest
+    level the renderer may pick (0 = no mipmapping).
+    """
+    if sampling not in TEXTURE_SAMPLINGS:
+        raise ValueError(f"Unknown texture sampling '{sampling}', expected one of {TEXTURE_SAMPLINGS}")
+    fragment = _fragment(f"texture_sample_{sampling}.sql")
+    return {
+        "tex_size": tex_size,
+        "mip_levels": mip_levels,
+        "max_lod": min(max_lod, mip_levels - 1),
+        "wall_sample": fill_template(fragment, {"idx": "w_tex_idx", "shade": "base_shade"}),
+        "ceiling_sample": fill_template(fragment, {"idx": "c_tex_idx", "shade": "floor_shade"}),
+        "floor_sample": fill_template(fragment, {"idx": "f_tex_idx", "shade": "floor_shade"}),
+    }
+
+
+def fill_template(content, params):
+    """Substitute `${name}` placeholders in a SQL template."""
+    return Template(content).substitute(params)
+
+
+def split_statements(content):
+    """Split a SQL script into statements, stripping `--` and `/* */` comments."""
+    statements = []
+    for stmt in content.split(';'):
+        lines = stmt.split('\n')
+        clean_lines = []
+        in_block_comment = False
+        for line in lines:
+            if in_block_comment:
+                if '*/' in line:
+                    in_block_comment = False
+                    line = line.split('*/', 1)[1]
+                else:
+                    continue
+
+            if '/*' in line:
+                if '*/' in line:
+                    line = re.sub(r'/\*.*?\*/', '', line)
+                else:
+                    in_block_comment = True
+                    line = line.split('/*', 1)[0]
+
+            if '--' in line:
+                line = line.split('--', 1)[0]
+
+            if line.strip():
+                clean_lines.append(line)
+
+        stmt = '\n'.join(clean_lines).strip()
+        if stmt:
+            statements.append(stmt)
+    return statements
+
+
+def view_select(statement):
+    """Return the SELECT of a `CREATE MATERIALIZED VIEW ... AS` statement."""
+    match = re.match(r"CREATE\s+MATERIALIZED\s+VIEW\s+\S+\s+TO\s+\S+\s+AS\s+", statement, re.IGNORECASE)
+    if not match:
+        raise ValueError("Not a CREATE MATERIALIZED VIEW ... TO ... AS statement")
+    return statement[match.end():]
+
+
+def _template_select(filename, params):
+    with open(os.path.join(SQL_DIR, filename), 'r') as f:
+        content = fill_template(f.read(), params)
+    return view_select(split_statements(content)[0])
+
+
+def fetch_query(tile):
+    """SELECT returning the finished (post-processed) pixels of one tile.
+
+    The tile tables are shared by every session, so the frame is picked by the
+    bound `session_id` and `frame_id` parameters of its input.
+    """
+    return (
+        f"SELECT toUInt32({tile.tile_id}) AS tile_id, pos_x, pos_y, image_data "
+        f"FROM doomhouse.rendered_frame_post_processed_{tile.tile_id} "
+        f"WHERE session_id = {{session_id:String}} AND frame_id = {{frame_id:UInt64}}"
+    )
+
+
+def _rays_once(ray_select):
+    """Wrap the ray stage as a scalar subquery, so it is evaluated once per query.
+
+    ClickHouse caches identical scalar subqueries within a query, so every
+    UNION ALL branch (tile) unpacks the same precomputed array of rays.
+    """
+    columns = ", ".join(RAY_COLUMNS)
+    unpacked = ", ".join(f"ray.{i} AS {name}" for i, name in enumerate(RAY_COLUMNS, 1))
+    return (
+        f"(SELECT {unpacked} FROM (SELECT arrayJoin("
+        f"(SELECT groupArray(({columns})) FROM ({ray_select}))) AS ray))"
+    )
+
+
+def _resolution_input():
+    return ", ".join(f"{{{name}:UInt16}} AS {name}" for name in RESOLUTION_PARAMS)
+
+
+def pose_input():
+    """One-row subquery of the bound pose parameters, standing in for `player_input`.
+
+    A single query needs no session to find its frame, so the session columns are constants.
+    """
+    pose = ", ".join(f"{{{name}:Float64}} AS {name}" for name in POSE_PARAMS)
+    return f"(SELECT {pose}, {{theme:UInt8}} AS theme, {_resolution_input()}, '' AS session_id, toUInt64(0) AS frame_id)"
+
+
+def ray_query(traversal, map_size, tex_size):
+    """The ray stage alone as a parameterized SELECT (one row per screen column)."""
+    return _template_select('ray_view.sql', ray_params(traversal, map_size, tex_size, pose_input()))
+
+
+def tile_select(params):
+    """The render and post-process SELECTs of one tile chained into one, reading `params["rays"]`."""
+    params = dict(params, source=f"({_template_select('render_view.sql', params)})")
+    return _template_select('post_process_view.sql', params)
+
+
+def _tiles_query(tiles, rays, sampling, encoding, post_process, columns=""):
+    """UNION ALL of every tile's render and post-process SELECT over the given rays."""
+    parts = []
+    for tile in tiles:
+        params = dict(template_params(tile, frame_size(tiles), encoding=encoding, post_process=post_process), **sampling)
+        params["rays"] = rays
+        post_select = tile_select(params)
+        # Same column types as the rendered_frame_post_processed tables
+        parts.append(
+            f"SELECT {columns}toUInt32({tile.tile_id}) AS tile_id, toFloat32(pos_x) AS pos_x, "
+            f"toFloat32(pos_y) AS pos_y, image_data FROM ({post_select})"
+        )
+    return "\nUNION ALL\n".join(parts)
+
+
+def frame_query(tiles, traversal, map_size, sampling, encoding="rgb24", post_process=("blur",)):
+    """One parameterized SELECT rendering every tile straight from the pose.
+
+    The ray, render and post-process view templates are chained as subqueries,
+    with the pose bound as query parameters instead of read from `player_input`.
+    Tiles are combined with UNION ALL so they still render in parallel, and
+    the result has the same columns as `fetch_query`. `sampling` are the
+    `sampling_params` of the texture lookups, `post_process` the chain of
+    filters and `encoding` the packing of the returned pixels.
+    """
+    rays = _rays_once(ray_query(traversal, map_size, sampling["tex_size"]))
+    return _tiles_query(tiles, rays, sampling, encoding, post_process)
+
+
+def trajectory_input(table):
+    """Subquery of the poses in `table` between the bound `first_frame` and `last_frame` ids.
+
+    `table` has the pose columns of `player_input`: frame_id, POSE_PARAMS and theme.
+    All frames are rendered at the bound resolution.
+    """
+    pose = ", ".join(POSE_PARAMS)
+    return (
+        f"(SELECT frame_id, {pose}, theme, {_resolution_input()}, '' AS session_id FROM {table} "
+        f"WHERE frame_id BETWEEN {{first_frame:UInt64}} AND {{last_frame:UInt64}})"
+    )
+
+
+def batch_query(tiles, traversal, map_size, sampling, table, encoding="rgb24", post_process=("blur",)):
+    """One SELECT rendering a range of frames of a trajectory, many frames per query.
+
+    Like `frame_query`, but the poses are read from `table` (see
+    `trajectory_input`) and the render stage groups the pixels of every frame
+    into its own tile row. Rows are `frame_id` followed by the columns of
+    `fetch_query`, ordered by frame and tile.
+    """
+    rays = _rays_once(_template_select('ray_view.sql', ray_params(traversal, map_size, sampling["tex_size"], trajectory_input(table))))
+    tiles_query = _tiles_query(tiles, rays, sampling, encoding, post_process, columns="frame_id, ")
+    return f"SELECT * FROM (\n{tiles_query}\n) ORDER BY frame_id, tile_id"
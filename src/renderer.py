@@ -0,0 +1,691 @@
+"""
+GUI-free rendering engine.
+
+`Renderer` owns the ClickHouse connection and the scene (map, texture atlas and
+render pipeline) and turns poses into frames: `connect()`, `load_scene()`, then
+`render(pose)` for every frame. Nothing here needs a window system; finished
+frames are shown or stored by the sinks in `frame_sinks.py`.
+"""
+import clickhouse_connect
+import collections
+import concurrent.futures
+import hashlib
+import os
+import re
+import time
+import uuid
+from collections import namedtuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+import deployment
+import render_plan
+from frame_cache import FrameCache
+from framebuffer import FrameBuffer, decode_pixels, parse_batch_tiles, parse_tiles
+from game_map import load_map, map_columns
+from reference_renderer import ReferenceRenderer, load_atlas
+from resolution import parse_resolution
+import texture_store
+from tracing import TRACE_SETTINGS, Tracer, open_exporter
+
+# Load environment variables from .env file
+load_dotenv()
+
+# ---------------------------------------------------------
+# CONFIGURATION
+# ---------------------------------------------------------
+HOST = os.getenv('CLICKHOUSE_HOST', 'localhost')
+PORT = int(os.getenv('CLICKHOUSE_PORT', '8123'))
+USER = os.getenv('CLICKHOUSE_USER', 'default')
+PASS = os.getenv('CLICKHOUSE_PASS', '')
+
+# Render Tiling
+# The frame is split into TILE_COUNT tiles that ClickHouse renders in parallel.
+# TILE_LAYOUT is "rows" (horizontal strips), "cols" (vertical strips) or "grid" (2D tiles).
+# TILE_COUNT = 0 picks one tile per server core (the server's max_threads).
+FRAME_WIDTH = 640
+FRAME_HEIGHT = 480
+TILE_LAYOUT = os.getenv('DOOMHOUSE_TILE_LAYOUT', 'rows')
+TILE_COUNT = int(os.getenv('DOOMHOUSE_TILE_COUNT', '4'))
+
+# Render Resolution
+# Frames are rendered at RESOLUTION ("WIDTHxHEIGHT", at most the frame size) and scaled
+# up by the client. It is a runtime parameter: `Renderer.set_resolution()` changes it
+# between frames without redeploying (see resolution.py).
+RESOLUTION = os.getenv('DOOMHOUSE_RESOLUTION', f"{FRAME_WIDTH}x{FRAME_HEIGHT}")
+
+# Map
+# Text grid or PNG image of up to 1024x1024 cells (see src/game_map.py for the format).
+MAP_FILE = os.getenv('DOOMHOUSE_MAP', os.path.join("maps", "default.txt"))
+
+# Ray Traversal
+# "brute": test every grid crossing up to a fixed view distance.
+# "dda": walk the grid cell by cell and stop at the first wall (no view distance cap).
+# "sdf": like "dda" (no view distance cap), but jumps across open space using the map's distance field
+#        (best for large maps).
+RAYCAST = os.getenv('DOOMHOUSE_RAYCAST', 'brute')
+
+# Render Mode
+# "mv": INSERT into player_input triggers the Materialized View chain, then one SELECT per tile.
+# "query": one parameterized SELECT per frame, no MV chain and no intermediate tables.
+# "local": the NumPy reference renderer on the client, no server round trip (see reference_renderer.py).
+RENDER_MODES = ("mv", "query", "local")
+RENDER_MODE = os.getenv('DOOMHOUSE_RENDER_MODE', 'mv')
+
+# Batch Rendering
+# Offline renders of a whole trajectory render BATCH_FRAMES frames per query, with
+# BATCH_WORKERS queries in flight so the server renders ahead of the client.
+BATCH_FRAMES = int(os.getenv('DOOMHOUSE_BATCH_FRAMES', '32'))
+BATCH_WORKERS = int(os.getenv('DOOMHOUSE_BATCH_WORKERS', '2'))
+
+# Frame Transfer
+# FRAME_ENCODING is how the post-process stage packs the finished pixels of every tile:
+# "rgb24" (3 bytes per pixel), "rgb565" (2 bytes, lossy) or "palette" (up to 256 colors
+# per tile, 1 byte per pixel, lossy). HTTP_COMPRESSION asks the server to compress tile
+# responses with one of HTTP_COMPRESSIONS ("" = off); "br" and "zstd" need the brotli or
+# zstandard package on the client.
+FRAME_ENCODING = os.getenv('DOOMHOUSE_FRAME_ENCODING', 'rgb24')
+HTTP_COMPRESSIONS = ("gzip", "deflate", "br", "zstd")
+HTTP_COMPRESSION = os.getenv('DOOMHOUSE_HTTP_COMPRESSION', '')
+
+# Post-Processing
+# Comma-separated chain of render_plan.POST_PROCESS_PASSES ("blur", "sharpen", "fog"),
+# applied in order to every finished frame. "none" renders each tile in a single view
+# stage, without the post-process view and its table.
+POST_PROCESS = os.getenv('DOOMHOUSE_POST_PROCESS', 'blur')
+
+# Frame Cache
+# Memory budget for finished frames, keyed on quantized pose and theme (0 = disabled).
+FRAME_CACHE_MB = int(os.getenv('DOOMHOUSE_FRAME_CACHE_MB', '256'))
+
+# Tracing
+# Client timings of every frame, joined with the server's query, view and processor
+# logs, go to this file: a Prometheus text file for ".prom", JSON lines otherwise ("" = off).
+TRACE_FILE = os.getenv('DOOMHOUSE_TRACE', '')
+
+# Texture Settings
+# Texels per side of every texture: a power of two from 8 to 2048 (see texture_store.py)
+TEXTURE_SIZE = int(os.getenv('DOOMHOUSE_TEXTURE_SIZE', '512'))
+TEXTURE_INTENSITY = 1.2  # Texture intensity factor (1.0 = normal, <1.0 = darker, >1.0 = brighter)
+# Preprocessed textures are cached here, keyed by file content and the settings above ("" = no cache)
+TEXTURE_CACHE_DIR = os.getenv('DOOMHOUSE_TEXTURE_CACHE', os.path.join(".cache", "textures"))
+
+# Texture Sampling
+# "channels": three dictionary lookups (r, g, b) per pixel. "packed": one lookup of the packed RGB value.
+TEXTURE_SAMPLING = os.getenv('DOOMHOUSE_TEXTURE_SAMPLING', 'channels')
+# Texture atlas attributes: "flat" keeps r, g, b and the packed RGB value (7 bytes per texel),
+# "packed" only the packed value (4 bytes per texel, for "packed" sampling only)
+TEXTURE_STORAGE = os.getenv('DOOMHOUSE_TEXTURE_STORAGE', 'flat')
+# Mip levels stored per texture, and the coarsest one the renderer may pick (0 = no mipmapping)
+TEXTURE_MIP_LEVELS = texture_store.mip_levels(TEXTURE_SIZE)
+TEXTURE_MAX_LOD = int(os.getenv('DOOMHOUSE_TEXTURE_MAX_LOD', str(TEXTURE_MIP_LEVELS - 1)))
+
+# Surfaces of a theme, in texture atlas order (see render_view.sql)
+# NOTE: Wall2 is currently not used
+TEXTURE_SURFACES = ("wall1", "wall2", "floor", "ceiling")
+TEXTURE_THEMES = {
+    "classic": {
+        "wall1": "texture20.png",
+        "wall2": "texture20.png",
+        "floor": "texture28.png",
+        "ceiling": "texture38.png"
+    },
+       
+    "dungeon": {
+        "wall1": "texture41.png",
+        "wall2": "texture41.png",
+        "floor": "texture40.png",
+        "ceiling": "texture39.png"
+    }
+}
+
+# A rendered frame: the collision-resolved position and the frame buffer holding
+# its pixels (shared, overwritten by the next render). `cached` frames came from
+# the frame cache without touching the database.
+Frame = namedtuple("Frame", ["pos_x", "pos_y", "framebuffer", "cached"])
+
+
+class Renderer:
+    """Renders player poses (see `render_plan.POSE_PARAMS`) into RGB24 frames with ClickHouse."""
+
+    def __init__(self, render_mode=RENDER_MODE, frame_cache_mb=FRAME_CACHE_MB, trace_file=TRACE_FILE, session_id=None):
+        # Session ids end up in query_ids, which split on '-'
+        self.session_id = session_id or uuid.uuid4().hex[:12]
+        if not re.fullmatch(r"[A-Za-z0-9_]{1,64}", self.session_id):
+            raise ValueError(f"Invalid session id '{self.session_id}', expected 1-64 letters, digits or '_'")
+        self.render_mode = render_mode
+        self.trace_file = trace_file
+        self.tracer = None
+        self.trajectory_table = None
+        # Whether the session has frames in the shared tile tables of the MV pipeline
+        self.pipeline_used = False
+        self.reference = None
+        self.theme_names = list(TEXTURE_THEMES.keys())
+        self.frame_id = 0
+        self.resolution = parse_resolution(RESOLUTION)
+        self.post_process = render_plan.parse_post_process(POST_PROCESS)
+        texture_store.check_texture_size(TEXTURE_SIZE)
+        texture_store.check_storage(TEXTURE_STORAGE, TEXTURE_SAMPLING)
+        self.frame = FrameBuffer(*self.resolution)
+        # Scaled tile plan and frame buffer of every resolution rendered so far
+        self._layouts = {}
+
+        # Finished frames, so revisited poses skip the database entirely
+        self.frame_cache = FrameCache(frame_cache_mb * 1024 * 1024)
+
+        # Performance Tracking
+        self.reset_stats()
+
+    def connect(self):
+        """Connect to ClickHouse and plan the render tiles."""
+        self.client = self._connect()
+
+        # Get and print ClickHouse version
+        self.server_version = self.client.query("SELECT version()").result_rows[0][0]
+        print(f"Connected to ClickHouse version: {self.server_version}")
+
+        # Version check
+        try:
+            v_parts = [int(p) for p in self.server_version.split('.')]
+            required_v = [26, 1, 1, 562]
+            is_supported = True
+            for i in range(min(len(v_parts), len(required_v))):
+                if v_parts[i] < required_v[i]:
+                    is_supported = False
+                    break
+                elif v_parts[i] > required_v[i]:
+                    break
+            
+            if not is_supported:
+                print("\n" + "="*80)
+                print("**OBS**: Due to an issue with some newer versions of ClickHouse this program only supports ClickHosue version `26.1.1.562` or later.")
+                print("="*80 + "\n")
+        except Exception as ve:
+            print(f"Could not parse ClickHouse version for compatibility check: {ve}")
+
+        # Tile plan: one client per tile so all tiles are fetched in parallel
+        tile_count = TILE_COUNT or render_plan.detect_server_cores(self.client)
+        self.tiles = render_plan.plan_tiles(tile_count, TILE_LAYOUT, FRAME_WIDTH, FRAME_HEIGHT)
+        self.clients = [self.client] + [self._connect() for _ in self.tiles[1:]]
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=len(self.tiles))
+        self.set_resolution(*self.resolution)
+        print(f"🧩 Rendering in {len(self.tiles)} '{TILE_LAYOUT}' tiles at {self.resolution[0]}x{self.resolution[1]}")
+
+        if self.trace_file:
+            session = f"doomhouse-{self.session_id}-{time.strftime('%Y%m%dT%H%M%S')}"
+            self.tracer = Tracer(self._connect, open_exporter(self.trace_file), session)
+            print(f"🔍 Tracing frames as '{session}-<frame>' to {self.trace_file}")
+
+    def load_scene(self, deploy=None):
+        """Load the map and build the render queries.
+
+        By default the scene is deployed incrementally (see `deployment.py`): only
+        the tables, dictionaries and views whose content hash differs from the
+        deployed one are recreated, so starting another session with the same
+        settings changes nothing and does not reset the others. With `deploy`,
+        the database is cleared and every object recreated. With `deploy=False`
+        the renderer attaches to whatever a previous `load_scene()` deployed.
+        """
+        print(f"🗺️ Loading map '{MAP_FILE}'...")
+        self.game_map = load_map(MAP_FILE)
+        self.map_size = (self.game_map.width, self.game_map.height)
+        print(f"🗺️ Map is {self.game_map.width}x{self.game_map.height} cells")
+
+        self.sampling = render_plan.sampling_params(TEXTURE_SAMPLING, TEXTURE_SIZE, TEXTURE_MIP_LEVELS, TEXTURE_MAX_LOD)
+        if deploy is not False:
+            deployed = {} if deploy else deployment.deployed_objects(self.client)
+            if not deployed:
+                # Nothing recorded: a first or forced deployment, or objects of an older version to clear out
+                self.client.command("CREATE DATABASE IF NOT EXISTS doomhouse")
+                self.cleanup_database()
+            objects = self.scene_objects()
+            if not deployment.deploy(self.client, self._connect, objects, deployed):
+                print(f"♻️ Scene {self.scene_key(objects)[:12]} is already deployed, attaching to it")
+        self.frame_query = render_plan.frame_query(
+            self.tiles, RAYCAST, self.map_size, self.sampling, FRAME_ENCODING, self.post_process
+        )
+        self.reference = None
+
+    def scene_objects(self):
+        """The tables, dictionaries and views of the scene (see `deployment.py`).
+
+        Hashes cover the filled SQL templates, the map and texture files, and the
+        texture settings, so any change to them redeploys the objects built from it.
+        """
+        def sql(name):
+            return os.path.join(render_plan.SQL_DIR, name)
+
+        with open(MAP_FILE, 'rb') as f:
+            map_data = f.read()
+        objects = deployment.script_objects(
+            sql("create_source_tables.sql"), loads={"doomhouse.map_source": (self.load_map_data, [map_data])}
+        )
+        objects += deployment.script_objects(sql("create_dictionaries.sql"))
+        objects += self.texture_atlas_objects()
+
+        objects += deployment.script_objects(sql("player_input_table.sql"))
+        # Ray stage: one row per screen column, computed once per input
+        objects += deployment.script_objects(sql("rendered_rays_table.sql"), {"keep_rays": FRAME_WIDTH})
+        objects += deployment.script_objects(sql("ray_view.sql"), render_plan.ray_params(RAYCAST, self.map_size, TEXTURE_SIZE))
+
+        # Per-tile templates, instantiated once for every tile in the plan
+        for tile in self.tiles:
+            params = dict(
+                render_plan.template_params(tile, (FRAME_WIDTH, FRAME_HEIGHT), FRAME_ENCODING, self.post_process),
+                **self.sampling
+            )
+            objects += deployment.script_objects(sql("rendered_frame_post_processed_table.sql"), params)
+            if not self.post_process:
+                # Nothing to filter: one view renders and packs the tile, no intermediate table
+                objects += deployment.script_objects(
+                    sql("render_post_process_view.sql"), dict(params, select=render_plan.tile_select(params))
+                )
+                continue
+            for sql_file in ("rendered_frame_table.sql", "render_view.sql", "post_process_view.sql"):
+                objects += deployment.script_objects(sql(sql_file), params)
+        return objects
+
+    @staticmethod
+    def scene_key(objects):
+        """Hash identifying a scene: the content hashes of all its objects."""
+        digest = hashlib.sha256()
+        for name, content_hash in sorted((obj.name, obj.content_hash) for obj in objects):
+            digest.update(f"{name}:{content_hash}\n".encode())
+        return digest.hexdigest()
+
+    def supports_resolution(self, width, height):
+        """Whether frames can be rendered at `width` x `height`: at most the frame size, with no tile left empty."""
+        if not (0 < width <= FRAME_WIDTH and 0 < height <= FRAME_HEIGHT):
+            return False
+        return all(tile.width and tile.height for tile in render_plan.scale_tiles(self.tiles, (width, height)))
+
+    def set_resolution(self, width, height):
+        """Render the following frames at `width` x `height` pixels."""
+        if not self.supports_resolution(width, height):
+            raise ValueError(
+                f"Unsupported resolution {width}x{height}: the maximum is {FRAME_WIDTH}x{FRAME_HEIGHT}, "
+                f"and each of the {len(self.tiles)} '{TILE_LAYOUT}' tiles needs at least one pixel"
+            )
+        self.resolution = (width, height)
+
+    def with_resolution(self, pose):
+        """The pose with the current resolution, unless it has its own."""
+        if "res_w" in pose:
+            return pose
+        return dict(pose, res_w=self.resolution[0], res_h=self.resolution[1])
+
+    def _layout(self, resolution):
+        """(scaled tiles, frame buffer) of a render resolution."""
+        if resolution not in self._layouts:
+            self._layouts[resolution] = (render_plan.scale_tiles(self.tiles, resolution), FrameBuffer(*resolution))
+        return self._layouts[resolution]
+
+    def close(self):
+        if self.trajectory_table:
+            self.client.command(f"DROP TABLE IF EXISTS {self.trajectory_table}")
+        if self.pipeline_used:
+            # The tile tables keep the last frame of every session until it is deleted
+            for tile in self.tiles:
+                self.client.command(
+                    f"ALTER TABLE doomhouse.rendered_frame_post_processed_{tile.tile_id} "
+                    f"DELETE WHERE session_id = '{self.session_id}'"
+                )
+        self.executor.shutdown()
+        if self.tracer:
+            self.tracer.close()
+
+    def reset_stats(self):
+        self.assemble_time = 0.0
+        self.decode_time = 0.0
+        self.frame_bytes = 0
+        self.insert_time = 0.0
+        self.avg_insert_time = 0.0
+        self.total_insert_time = 0.0
+        self.insert_count = 0
+        self.select_time = 0.0
+        self.avg_select_time = 0.0
+        self.total_select_time = 0.0
+        self.select_count = 0
+
+    def _connect(self):
+        return clickhouse_connect.get_client(
+            host=HOST, port=PORT, username=USER, password=PASS
+        )
+
+    def fetch(self, client, query, parameters=None, settings=None):
+        """RowBinary response of a query, HTTP compressed if HTTP_COMPRESSION is set.
+
+        The HTTP layer decompresses the response, so the result is always the plain RowBinary bytes.
+        """
+        if not HTTP_COMPRESSION:
+            return client.raw_query(query, parameters=parameters, settings=settings, fmt='RowBinary')
+        if HTTP_COMPRESSION not in HTTP_COMPRESSIONS:
+            raise ValueError(f"Unknown HTTP compression '{HTTP_COMPRESSION}', expected one of {HTTP_COMPRESSIONS}")
+        return client.raw_query(
+            query, parameters=parameters, settings=dict(settings or {}, enable_http_compression=1), fmt='RowBinary',
+            transport_settings={"Accept-Encoding": HTTP_COMPRESSION},
+        )
+
+    def load_texture(self, filename):
+        """Preprocessed (size * size, 3) uint8 pixels of a texture, from the texture cache if possible."""
+        try:
+            pixels, source = texture_store.load_texture(
+                filename, TEXTURE_SIZE, TEXTURE_INTENSITY, TEXTURE_CACHE_DIR or None
+            )
+        except Exception as e:
+            print(f"Error processing texture: {e}")
+            raise
+        if source == "fallback":
+            print(f"⚠️ Warning: '{filename}' not found. Using fallback gray.")
+        return pixels, source
+
+    def texture_atlas_objects(self):
+        """The texture atlas table, holding every theme's textures, and its dictionary.
+
+        Atlas ids pack (theme, surface, mip level, texel) as
+        `(theme_idx * len(TEXTURE_SURFACES) + surface_idx) * surface_texels + level_offset + texel + 1`,
+        where a surface takes the texels of its whole mip chain. The attributes
+        stored per texel depend on TEXTURE_STORAGE.
+        """
+        surface_texels = texture_store.mip_texels(TEXTURE_SIZE, TEXTURE_MIP_LEVELS)
+        atlas_size = len(self.theme_names) * len(TEXTURE_SURFACES) * surface_texels
+        attributes = ",\n                ".join(
+            f"{name} {texture_store.ATTRIBUTE_TYPES[name]}" for name in texture_store.TEXTURE_STORAGES[TEXTURE_STORAGE]
+        )
+        inputs = [TEXTURE_SIZE, TEXTURE_INTENSITY, TEXTURE_MIP_LEVELS, TEXTURE_SURFACES, TEXTURE_THEMES]
+        for texture_file in sorted({texture for theme in TEXTURE_THEMES.values() for texture in theme.values()}):
+            path = os.path.join("textures", texture_file)
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    inputs.append(f.read())
+        table = deployment.schema_object("doomhouse.tex_atlas_source", "table", [f"""
+            CREATE TABLE doomhouse.tex_atlas_source (
+                id UInt32,
+                {attributes}
+            ) ENGINE = MergeTree ORDER BY id
+        """], inputs, self.upload_textures)
+        # Allocated for the whole atlas up front: growing a FLAT dictionary key by key takes
+        # minutes to load the tens of millions of texels of 1024 and 2048 textures
+        dictionary = deployment.schema_object("doomhouse.dict_tex_atlas", "dictionary", [f"""
+            CREATE DICTIONARY doomhouse.dict_tex_atlas (
+                id UInt32,
+                {attributes}
+            )
+            PRIMARY KEY id
+            SOURCE(CLICKHOUSE(TABLE 'tex_atlas_source' DB 'doomhouse'))
+            LIFETIME(MIN 3600 MAX 3600)
+            LAYOUT(FLAT(INITIAL_ARRAY_SIZE {atlas_size + 1} MAX_ARRAY_SIZE {atlas_size + 1}))
+        """])
+        return [table, dictionary]
+
+    def upload_textures(self, client):
+        """Load the textures of all themes into the texture atlas table."""
+        print(f"🌟 Uploading texture atlas for themes: {', '.join(self.theme_names)}")
+        loaded = {} # themes may share texture files
+        texels = texture_store.mip_texels(TEXTURE_SIZE, TEXTURE_MIP_LEVELS)
+        start_time = time.time()
+        for theme_idx, theme_name in enumerate(self.theme_names):
+            theme = TEXTURE_THEMES[theme_name]
+            for surface_idx, surface in enumerate(TEXTURE_SURFACES):
+                texture_file = theme[surface]
+                load_start = time.time()
+                if texture_file not in loaded:
+                    loaded[texture_file] = self.load_texture(os.path.join("textures", texture_file))
+                else:
+                    loaded[texture_file] = (loaded[texture_file][0], "shared")
+                pixels, source = loaded[texture_file]
+                load_time = (time.time() - load_start) * 1000
+
+                # One columnar Native block per texture and its mip levels, straight from the NumPy arrays
+                upload_start = time.time()
+                chain = texture_store.mip_chain(pixels, TEXTURE_SIZE, TEXTURE_MIP_LEVELS)
+                base_id = (theme_idx * len(TEXTURE_SURFACES) + surface_idx) * texels + 1
+                columns = [("id", "UInt32", np.arange(base_id, base_id + texels, dtype=np.uint32))]
+                columns += texture_store.atlas_columns(TEXTURE_STORAGE, chain)
+                block = texture_store.native_block(columns)
+                client.raw_insert('doomhouse.tex_atlas_source', [name for name, _, _ in columns], block, fmt='Native')
+                upload_time = (time.time() - upload_start) * 1000
+                print(f"🎨 {theme_name}/{surface}: '{texture_file}' {source} in {load_time:.1f}ms, uploaded in {upload_time:.1f}ms")
+        print(f"🌟 Texture atlas uploaded in {(time.time() - start_time) * 1000:.0f}ms")
+
+    def cleanup_database(self):
+        print("🧹 Cleaning up existing database objects to avoid dependency errors...")
+        try:
+            # 1. Drop Materialized Views first
+            self.client.command("DROP VIEW IF EXISTS doomhouse.render_materialized")
+            self.client.command("DROP VIEW IF EXISTS doomhouse.post_process_materialized")
+            self.client.command("DROP VIEW IF EXISTS doomhouse.render_materialized_top")
+            self.client.command("DROP VIEW IF EXISTS doomhouse.render_materialized_bottom")
+            self.client.command("DROP VIEW IF EXISTS doomhouse.post_process_materialized_top")
+            self.client.command("DROP VIEW IF EXISTS doomhouse.post_process_materialized_bottom")
+            self.client.command("DROP VIEW IF EXISTS doomhouse.ray_materialized")
+            # Per-tile views from any previous tile count
+            tile_views = self.client.query(
+                "SELECT name FROM system.tables WHERE database = 'doomhouse' "
+                "AND match(name, '^(render|post_process)_materialized_[0-9]+$')"
+            ).result_rows
+            for (name,) in tile_views:
+                self.client.command(f"DROP VIEW IF EXISTS doomhouse.{name}")
+            
+            # 2. Drop Dictionaries
+            dicts = [
+                "dict_map_data", "dict_floor_dist", "dict_tex_data", "dict_tex_wall_data",
+                "dict_tex_wall1_data", "dict_tex_wall2_data", "dict_tex_floor_data", "dict_tex_ceiling_data",
+                "dict_tex_atlas"
+            ]
+            for d in dicts:
+                self.client.command(f"DROP DICTIONARY IF EXISTS doomhouse.{d}")
+                
+            # 3. Drop Tables
+            tables = [
+                "map_source", "floor_dist_source", "tex_source", "tex_wall_source",
+                "tex_wall1_source", "tex_wall2_source", "tex_floor_source", "tex_ceiling_source",
+                "tex_atlas_source",
+                "deployment", "player_input", "rendered_rays", "rendered_frame", "rendered_frame_post_processed",
+                "rendered_frame_top", "rendered_frame_bottom",
+                "rendered_frame_post_processed_top", "rendered_frame_post_processed_bottom"
+            ]
+            for t in tables:
+                self.client.command(f"DROP TABLE IF EXISTS doomhouse.{t}")
+            tile_tables = self.client.query(
+                "SELECT name FROM system.tables WHERE database = 'doomhouse' "
+                "AND match(name, '^rendered_frame(_post_processed)?_[0-9]+$')"
+            ).result_rows
+            for (name,) in tile_tables:
+                self.client.command(f"DROP TABLE IF EXISTS doomhouse.{name}")
+        except Exception as e:
+            print(f"Note: Cleanup encountered an issue: {e}")
+
+    def load_map_data(self, client):
+        """Insert the map cells and their distance-to-wall field into map_source."""
+        start_time = time.time()
+        columns = map_columns(self.game_map)
+        print(f"📐 Distance field computed in {time.time() - start_time:.2f}s")
+        client.insert('doomhouse.map_source', columns, column_names=['id', 'val', 'dist'], column_oriented=True)
+        print(f"💾 Inserted {len(columns[0])} map cells into doomhouse.map_source")
+
+    def render(self, pose, query_id=None):
+        """Render one pose into `self.frame` and return it as a `Frame`.
+
+        The pose is rendered at its `res_w` x `res_h` if it has them, otherwise
+        at the current resolution, and `self.frame` is the frame buffer of that
+        resolution. `query_id` tags the frame's queries (`<query_id>-insert`,
+        `-tile<n>` or `-frame`) so they can be found in `system.query_log`.
+        With tracing on, frames are tagged and traced by the tracer instead.
+        """
+        pose = self.with_resolution(pose)
+        tiles, self.frame = self._layout((pose["res_w"], pose["res_h"]))
+        cache_key = FrameCache.key(pose)
+        cached = self.frame_cache.get(cache_key)
+        if cached is not None:
+            self.frame.buffer[:] = cached.pixels
+            return Frame(cached.pos_x, cached.pos_y, self.frame, True)
+
+        self.frame_id += 1
+        if self.render_mode == "local":
+            return self._assemble(*self._render_local(pose), cache_key, tiles)
+
+        if self.tracer:
+            query_id = self.tracer.query_id(self.frame_id)
+        start_time = time.time()
+        if self.render_mode == "query":
+            rows, select_start = self._fetch_query(pose, query_id)
+        else:
+            rows, select_start = self._fetch_mv(pose, query_id)
+        frame = self._assemble(rows, select_start, cache_key, tiles)
+
+        if self.tracer:
+            stages = ["frame"] if self.render_mode == "query" else ["insert"] + [f"tile{tile.tile_id}" for tile in self.tiles]
+            self.tracer.record(self.frame_id, self.render_mode, stages, {
+                "insert_ms": self.insert_time if self.render_mode == "mv" else None, "select_ms": self.select_time,
+                "assemble_ms": self.assemble_time, "total_ms": (time.time() - start_time) * 1000,
+            })
+        return frame
+
+    def _settings(self, query_id, stage, **settings):
+        if query_id:
+            settings["query_id"] = f"{query_id}-{stage}"
+        if self.tracer:
+            settings.update(TRACE_SETTINGS)
+        return settings
+
+    def _fetch_mv(self, pose, query_id):
+        self.pipeline_used = True
+        start_time = time.time()
+        self.client.command(f"""
+            INSERT INTO doomhouse.player_input
+            (session_id, frame_id, old_x, old_y, try_x, try_y, dir_x, dir_y, plane_x, plane_y, theme, res_w, res_h)
+            VALUES ('{self.session_id}', {self.frame_id}, {pose['old_x']}, {pose['old_y']}, {pose['try_x']}, {pose['try_y']},
+                    {pose['dir_x']}, {pose['dir_y']}, {pose['plane_x']}, {pose['plane_y']}, {pose['theme']},
+                    {pose['res_w']}, {pose['res_h']})
+        """, settings=self._settings(query_id, "insert", parallel_view_processing=1)) # the tile views run concurrently
+        self.insert_time = (time.time() - start_time) * 1000 # in ms
+        self.total_insert_time += self.insert_time
+        self.insert_count += 1
+        self.avg_insert_time = self.total_insert_time / self.insert_count
+
+        # Parallel Query Execution
+        # We launch one concurrent query per tile, each on its own client.
+        # Tiles come back as raw RowBinary bytes: no per-pixel Python objects.
+        # The tile tables are shared by all sessions: pick this session's frame.
+        start_time = time.time()
+        frame = {"session_id": self.session_id, "frame_id": self.frame_id}
+        futures = [
+            self.executor.submit(
+                self.fetch, client, render_plan.fetch_query(tile), frame, self._settings(query_id, f"tile{tile.tile_id}")
+            )
+            for client, tile in zip(self.clients, self.tiles)
+        ]
+        return [row for future in futures for row in parse_tiles(future.result())], start_time
+
+    def _fetch_query(self, pose, query_id):
+        """Single round trip: the pose goes in as query parameters, position and frame come back."""
+        start_time = time.time()
+        data = self.fetch(self.client, self.frame_query, pose, self._settings(query_id, "frame"))
+        return parse_tiles(data), start_time
+
+    def _render_local(self, pose):
+        """The tile rows of the SQL pipeline, computed on the client by the NumPy reference renderer."""
+        if self.reference is None:
+            # The atlas comes from the texture cache, so this only costs a few seconds once
+            print("🧮 Loading the local reference renderer...")
+            atlas = load_atlas(
+                self.theme_names, TEXTURE_THEMES, TEXTURE_SURFACES, TEXTURE_SIZE, TEXTURE_INTENSITY,
+                TEXTURE_MIP_LEVELS, TEXTURE_CACHE_DIR or None,
+            )
+            self.reference = ReferenceRenderer(
+                self.game_map, self.tiles, RAYCAST, atlas, TEXTURE_SIZE, TEXTURE_MIP_LEVELS, TEXTURE_MAX_LOD,
+                FRAME_ENCODING, self.post_process,
+            )
+        start_time = time.time()
+        return self.reference.render(pose), start_time
+
+    def _assemble(self, rows, start_time, cache_key, tiles):
+        if len(rows) != len(tiles):
+            raise RuntimeError(f"Got {len(rows)} of {len(self.tiles)} tiles")
+
+        # Calculate render time
+        self.select_time = (time.time() - start_time) * 1000 # in ms
+        self.total_select_time += self.select_time
+        self.select_count += 1
+        self.avg_select_time = self.total_select_time / self.select_count
+
+        # Compositing Step: Decode each tile into packed RGB rows and copy them into the frame buffer
+        start_time = time.time()
+        decode_time = 0.0
+        for tile_id, _, _, pixels in rows:
+            decode_start = time.time()
+            rgb = decode_pixels(FRAME_ENCODING, pixels)
+            decode_time += time.time() - decode_start
+            self.frame.blit(tiles[tile_id - 1], rgb)
+        self.assemble_time = (time.time() - start_time) * 1000 # in ms
+        self.decode_time = decode_time * 1000 # in ms
+        self.frame_bytes = sum(len(pixels) for _, _, _, pixels in rows)
+
+        # Every tile carries the same (collision-resolved) position
+        pos_x, pos_y = rows[0][1], rows[0][2]
+        self.frame_cache.put(cache_key, pos_x, pos_y, self.frame.buffer)
+        return Frame(pos_x, pos_y, self.frame, False)
+
+    def upload_trajectory(self, poses):
+        """Store a list of poses as this session's trajectory table, numbered from frame 1.
+
+        Returns the table name for `render_trajectory()`. The table is dropped by `close()`.
+        """
+        table = f"doomhouse.trajectory_{self.session_id}"
+        with open(os.path.join(render_plan.SQL_DIR, "trajectory_table.sql"), 'r') as f:
+            create = render_plan.fill_template(f.read(), {"table": table})
+        self.client.command(f"DROP TABLE IF EXISTS {table}")
+        for stmt in render_plan.split_statements(create):
+            self.client.command(stmt)
+        self.trajectory_table = table
+        columns = ["frame_id", *render_plan.POSE_PARAMS, "theme"]
+        rows = [[frame_id] + [pose[name] for name in columns[1:]] for frame_id, pose in enumerate(poses, 1)]
+        self.client.insert(table, rows, column_names=columns)
+        return table
+
+    def render_trajectory(self, table, frames_per_query=BATCH_FRAMES, workers=BATCH_WORKERS):
+        """Render every pose of a trajectory table, yielding a `Frame` per pose in frame_id order.
+
+        `table` has the pose columns of `player_input` and a unique `frame_id`
+        per pose (see `upload_trajectory()`). Every query renders
+        `frames_per_query` frames, and up to `workers` queries run ahead
+        while the client assembles and writes the frames of the previous one.
+        All frames are rendered at the current resolution. Like `render()`,
+        every yielded frame reuses the frame buffer of that resolution.
+        """
+        resolution = dict(zip(render_plan.RESOLUTION_PARAMS, self.resolution))
+        tiles, frame = self._layout(self.resolution)
+        frame_ids = [row[0] for row in self.client.query(f"SELECT frame_id FROM {table} ORDER BY frame_id").result_rows]
+        batches = [frame_ids[i:i + frames_per_query] for i in range(0, len(frame_ids), frames_per_query)]
+        query = render_plan.batch_query(
+            self.tiles, RAYCAST, self.map_size, self.sampling, table, FRAME_ENCODING, self.post_process
+        )
+        clients = [self._connect() for _ in range(min(workers, len(batches)))]
+        pending = collections.deque()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(len(clients), 1)) as executor:
+            try:
+                for i, batch in enumerate(batches):
+                    pending.append(executor.submit(
+                        self.fetch, clients[i % len(clients)], query,
+                        dict(resolution, first_frame=batch[0], last_frame=batch[-1]),
+                    ))
+                    # Keep one query per client in flight, consuming batches in order
+                    if len(pending) == len(clients):
+                        yield from self._batch_frames(pending.popleft().result(), tiles, frame)
+                while pending:
+                    yield from self._batch_frames(pending.popleft().result(), tiles, frame)
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    def _batch_frames(self, data, tiles, frame):
+        rows = parse_batch_tiles(data)
+        for i in range(0, len(rows), len(tiles)):
+            frame_rows = rows[i:i + len(tiles)]
+            if len(frame_rows) != len(tiles) or any(row[0] != frame_rows[0][0] for row in frame_rows):
+                raise RuntimeError(f"Incomplete tiles for frame {frame_rows[0][0]}")
+            for _, tile_id, _, _, pixels in frame_rows:
+                frame.blit(tiles[tile_id - 1], decode_pixels(FRAME_ENCODING, pixels))
+            yield Frame(frame_rows[0][2], frame_rows[0][3], frame, False)
@@ -0,0 +1,82 @@
+"""
+Dynamic render resolution.
+
+The render resolution is a runtime parameter of the pipeline: every input
+carries its `res_w` x `res_h`, and the render views scale the tile plan of
+the full frame to it (see `render_plan.scale_tiles`). Rendering fewer pixels
+is the cheapest way to hold a frame rate when the server falls behind, so
+`ResolutionController` picks a resolution after every rendered frame to keep
+the frame time near a target. The client scales the frames back up to the
+window.
+"""
+
+# Fractions of the maximum resolution the controller steps through, largest first
+RESOLUTION_SCALES = (1.0, 0.875, 0.75, 0.625, 0.5, 0.375, 0.25)
+
+
+def parse_resolution(text):
+    """Parse a "WIDTHxHEIGHT" string into a (width, height) tuple."""
+    try:
+        width, height = (int(part) for part in text.lower().split("x"))
+    except ValueError:
+        raise ValueError(f"Invalid resolution '{text}', expected WIDTHxHEIGHT") from None
+    return width, height
+
+
+def scaled_resolutions(resolution, scales=RESOLUTION_SCALES):
+    """`resolution` scaled by every factor in `scales`, at least one pixel each."""
+    return [(max(1, int(resolution[0] * scale)), max(1, int(resolution[1] * scale))) for scale in scales]
+
+
+class ResolutionController:
+    """Lowers and raises the render resolution to hold a target frame time.
+
+    `resolutions` are the resolutions it may pick, largest first, starting
+    with the first. Frame times are smoothed with an exponential moving
+    average. When the average exceeds the target by `tolerance`, the
+    resolution steps down one scale. It steps back up when the average, scaled by the pixel count of the
+    next larger resolution, still fits within the target with the same margin,
+    so it does not flip back and forth between two scales. After every change
+    the controller waits `settle_frames` frames and restarts the average,
+    measuring the new resolution only.
+    """
+
+    def __init__(self, resolutions, target_ms, smoothing=0.2, tolerance=0.1, settle_frames=10):
+        self.resolutions = list(resolutions)
+        self.target_ms = target_ms
+        self.smoothing = smoothing
+        self.tolerance = tolerance
+        self.settle_frames = settle_frames
+        self.level = 0
+        self.average_ms = None
+        self._settling = 0
+
+    @property
+    def resolution(self):
+        return self.resolutions[self.level]
+
+    def update(self, frame_ms):
+        """Account for one rendered frame. Returns the new resolution if it changed, else None."""
+        if self._settling:
+            self._settling -= 1
+            return None
+        if self.average_ms is None:
+            self.average_ms = frame_ms
+        else:
+            self.average_ms += self.smoothing * (frame_ms - self.average_ms)
+
+        if self.average_ms > self.target_ms * (1 + self.tolerance) and self.level < len(self.resolutions) - 1:
+            self.level += 1
+        elif self.level > 0 and self._predicted_ms(self.level - 1) < self.target_ms * (1 - self.tolerance):
+            self.level -= 1
+        else:
+            return None
+        self.average_ms = None
+        self._settling = self.settle_frames
+        return self.resolution
+
+    def _predicted_ms(self, level):
+        """Frame time at another level, assuming it grows with the pixel count."""
+        width, height = self.resolutions[level]
+        current_w, current_h = self.resolution
+        return self.average_ms * (width * height) / (current_w * current_h)
@@ -0,0 +1,154 @@
+"""
+Speculative background rendering.
+
+From any pose the player can only reach a handful of next poses with one more
+input step (rotate left/right, step forward/back). The speculator renders those
+ahead of time into the frame cache using the stateless single-query render mode
+at a low server priority, so a key press usually finds its frame already there.
+Speculation for poses the player no longer can reach is cancelled.
+"""
+import concurrent.futures
+import queue
+import threading
+import time
+import uuid
+
+import render_plan
+from framebuffer import FrameBuffer, decode_pixels, parse_tiles
+
+
+class Speculator:
+    """Renders candidate next poses into a `FrameCache` on background workers."""
+
+    def __init__(self, connect, fetch, frame_query, tiles, frame_cache, encoding, workers=2, priority=10):
+        # `fetch(client, query, parameters, settings)` returns the RowBinary response (see `Renderer.fetch`)
+        self.fetch = fetch
+        self.frame_query = frame_query
+        self.tiles = tiles
+        self.frame_cache = frame_cache
+        self.encoding = encoding
+        # ClickHouse `priority`: queries with a larger value yield to smaller ones
+        self.settings = {"priority": priority}
+
+        # One connection per worker, plus one for KILL QUERY from the caller's thread
+        self._clients = queue.Queue()
+        for _ in range(workers):
+            self._clients.put(connect())
+        self._kill_client = connect()
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="speculate"
+        )
+
+        self._lock = threading.Lock()
+        self._in_flight = {}    # key -> (future, query_id)
+        self._cancelled = set() # query ids whose results must be discarded
+        self._unused = {}       # key -> render time of a speculative frame not shown yet
+
+        # Counters
+        self.issued = 0
+        self.completed = 0
+        self.cancelled = 0
+        self.hits = 0
+        self.total_time = 0.0 # seconds spent on speculative renders
+        self.used_time = 0.0  # ... of which the frames were eventually shown
+
+    def speculate(self, candidates):
+        """Render `(cache_key, pose)` candidates, cancelling in-flight work for any other pose."""
+        wanted = {key for key, _ in candidates}
+        with self._lock:
+            stale = [
+                (key, future, query_id) for key, (future, query_id) in self._in_flight.items()
+                if key not in wanted
+            ]
+        self._cancel(stale)
+
+        for key, pose in candidates:
+            if key in self.frame_cache:
+                continue
+            with self._lock:
+                if key in self._in_flight:
+                    continue
+                query_id = f"doomhouse-speculate-{uuid.uuid4()}"
+                future = self._executor.submit(self._render, key, pose, query_id)
+                self._in_flight[key] = (future, query_id)
+                self.issued += 1
+
+    def wait(self, key, timeout):
+        """Wait for an in-flight speculative render of `key`, if there is one."""
+        with self._lock:
+            entry = self._in_flight.get(key)
+        if entry is not None:
+            concurrent.futures.wait([entry[0]], timeout=timeout)
+
+    def consume(self, key):
+        """Record that the frame for `key` was shown; counts a hit if it was speculative."""
+        with self._lock:
+            elapsed = self._unused.pop(key, None)
+            if elapsed is not None:
+                self.hits += 1
+                self.used_time += elapsed
+
+    def hit_rate(self):
+        """Share of completed speculative frames that were eventually shown."""
+        return self.hits / self.completed if self.completed else 0.0
+
+    def wasted_time(self):
+        """Render time (seconds) spent on speculation that was never shown."""
+        return self.total_time - self.used_time
+
+    def shutdown(self):
+        with self._lock:
+            stale = [(key, future, query_id) for key, (future, query_id) in self._in_flight.items()]
+        self._cancel(stale)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _cancel(self, stale):
+        running = []
+        with self._lock:
+            for key, future, query_id in stale:
+                self._in_flight.pop(key, None)
+                self.cancelled += 1
+                if not future.cancel():
+                    self._cancelled.add(query_id)
+                    running.append(query_id)
+        if running:
+            ids = ", ".join(f"'{query_id}'" for query_id in running)
+            try:
+                self._kill_client.command(f"KILL QUERY WHERE query_id IN ({ids}) ASYNC")
+            except Exception as e:
+                print(f"Speculation cancel error: {e}")
+
+    def _render(self, key, pose, query_id):
+        client = self._clients.get()
+        start_time = time.time()
+        try:
+            data = self.fetch(client, self.frame_query, pose, dict(self.settings, query_id=query_id))
+            rows = parse_tiles(data)
+            if len(rows) != len(self.tiles):
+                return
+            # Candidate poses carry the resolution they are rendered at
+            resolution = (pose["res_w"], pose["res_h"])
+            tiles = render_plan.scale_tiles(self.tiles, resolution)
+            frame = FrameBuffer(*resolution)
+            for tile_id, _, _, pixels in rows:
+                frame.blit(tiles[tile_id - 1], decode_pixels(self.encoding, pixels))
+            with self._lock:
+                if query_id in self._cancelled:
+                    return
+            self.frame_cache.put(key, rows[0][1], rows[0][2], frame.buffer)
+            with self._lock:
+                self._unused[key] = time.time() - start_time
+                self.completed += 1
+        except Exception as e:
+            # Killed queries end up here as well
+            with self._lock:
+                if query_id not in self._cancelled:
+                    print(f"Speculation error: {e}")
+        finally:
+            with self._lock:
+                self.total_time += time.time() - start_time
+                self._cancelled.discard(query_id)
+                entry = self._in_flight.get(key)
+                if entry is not None and entry[1] == query_id:
+                    del self._in_flight[key]
+            self._clients.put(client)
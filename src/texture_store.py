@@ -0,0 +1,175 @@
+"""
+Texture preprocessing and bulk upload.
+
+Textures are decoded, resized to the atlas texture size and scaled by the
+intensity factor with NumPy, then uploaded as one columnar Native block per
+texture instead of a list of Python rows. Each texture is stored with a chain
+of mip levels (halving the size per level, down to MIP_MIN_SIZE) for level of
+detail sampling. The preprocessed pixels are kept in
+an on-disk cache keyed by a hash of the file contents and the preprocessing
+settings, so an unchanged texture skips decoding, resizing and scaling on the
+next start.
+
+The atlas dictionary is held in one of the TEXTURE_STORAGES: every texel's
+`r`, `g` and `b` channels plus its packed `rgb` value, or only the packed value
+at a little over half the memory. `src/bench_texture_storage.py` compares them
+with other dictionary layouts and array tables.
+"""
+import hashlib
+import os
+
+import numpy as np
+from PIL import Image
+
+# Pixel value used when a texture file is missing
+FALLBACK_GRAY = 100
+
+# Smallest mip level, in texels per side
+MIP_MIN_SIZE = 8
+
+# Largest texture size. Two themes of 2048x2048 textures are 45M atlas texels.
+MAX_TEXTURE_SIZE = 2048
+
+# Atlas attributes stored per texel, by texture storage
+TEXTURE_STORAGES = {
+    "flat": ("r", "g", "b", "rgb"),
+    "packed": ("rgb",),
+}
+ATTRIBUTE_TYPES = {"r": "UInt8", "g": "UInt8", "b": "UInt8", "rgb": "UInt32"}
+
+# Atlas attributes read by each texture sampling (see `render_plan.TEXTURE_SAMPLINGS`)
+_SAMPLING_ATTRIBUTES = {"channels": ("r", "g", "b"), "packed": ("rgb",)}
+
+
+def check_texture_size(size):
+    """Raise ValueError unless textures can be `size` x `size`: a power of two the mip chain and shaders can wrap."""
+    if not MIP_MIN_SIZE <= size <= MAX_TEXTURE_SIZE or size & (size - 1):
+        raise ValueError(f"Texture size {size} must be a power of two from {MIP_MIN_SIZE} to {MAX_TEXTURE_SIZE}")
+
+
+def storage_supports(storage, sampling):
+    """Whether the atlas `storage` holds the attributes that `sampling` reads."""
+    return set(_SAMPLING_ATTRIBUTES[sampling]) <= set(TEXTURE_STORAGES[storage])
+
+
+def check_storage(storage, sampling):
+    """Raise ValueError unless the atlas `storage` exists and holds what `sampling` reads."""
+    if storage not in TEXTURE_STORAGES:
+        raise ValueError(f"Unknown texture storage '{storage}', expected one of {tuple(TEXTURE_STORAGES)}")
+    if not storage_supports(storage, sampling):
+        raise ValueError(f"Texture storage '{storage}' does not support '{sampling}' texture sampling")
+
+
+def texture_key(data, size, intensity):
+    """Cache key of a texture file's bytes under the given preprocessing settings."""
+    digest = hashlib.sha256(data)
+    digest.update(f"{size}:{intensity}".encode())
+    return digest.hexdigest()
+
+
+def preprocess(path, size, intensity):
+    """Decode, resize (nearest neighbour) and intensity-scale a texture into a (size * size, 3) uint8 array."""
+    with Image.open(path) as img:
+        img = img.convert("RGB").resize((size, size), Image.NEAREST)
+        pixels = np.asarray(img, dtype=np.float32).reshape(-1, 3)
+    return np.clip(pixels * intensity, 0, 255).astype(np.uint8)
+
+
+def load_texture(path, size, intensity, cache_dir=None):
+    """Return `(pixels, source)` for a texture file.
+
+    `pixels` is a (size * size, 3) uint8 array of scaled RGB values and
+    `source` says where it came from: "cache", "decoded" or "fallback".
+    """
+    if not os.path.exists(path):
+        return np.full((size * size, 3), FALLBACK_GRAY, dtype=np.uint8), "fallback"
+
+    with open(path, 'rb') as f:
+        key = texture_key(f.read(), size, intensity)
+    cache_path = os.path.join(cache_dir, f"{key}.npy") if cache_dir else None
+    if cache_path and os.path.exists(cache_path):
+        try:
+            return np.load(cache_path), "cache"
+        except (OSError, ValueError):
+            pass # corrupt entry, rebuild it
+
+    pixels = preprocess(path, size, intensity)
+    if cache_path:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, pixels)
+        os.replace(tmp_path, cache_path)
+    return pixels, "decoded"
+
+
+def mip_levels(size):
+    """Number of mip levels of a size x size texture (at least the full resolution one)."""
+    levels = 1
+    while size > MIP_MIN_SIZE and size % 2 == 0:
+        size //= 2
+        levels += 1
+    return levels
+
+
+def mip_texels(size, levels):
+    """Total texels of a mip chain, i.e. the atlas space taken by one texture."""
+    return sum((size >> level) ** 2 for level in range(levels))
+
+
+def mip_chain(pixels, size, levels):
+    """Stack a (size * size, 3) texture and its 2x2 box-filtered mip levels into one array."""
+    chain = [pixels]
+    level = pixels.reshape(size, size, 3).astype(np.uint16)
+    for _ in range(levels - 1):
+        half = level.shape[0] // 2
+        level = (level.reshape(half, 2, half, 2, 3).sum(axis=(1, 3)) + 2) // 4
+        chain.append(level.reshape(-1, 3).astype(np.uint8))
+    return np.concatenate(chain)
+
+
+def pack_rgb(pixels):
+    """Pack (n, 3) uint8 RGB pixels into uint32 values 0xBBGGRR."""
+    pixels = pixels.astype(np.uint32)
+    return pixels[:, 0] | (pixels[:, 1] << 8) | (pixels[:, 2] << 16)
+
+
+def atlas_columns(storage, chain):
+    """`(name, type, array)` attribute columns of a mip chain's texels under `storage`, for `native_block`."""
+    columns = []
+    for name in TEXTURE_STORAGES[storage]:
+        values = pack_rgb(chain) if name == "rgb" else chain[:, "rgb".index(name)]
+        columns.append((name, ATTRIBUTE_TYPES[name], values))
+    return columns
+
+
+def _varint(value):
+    """LEB128 varint, as used for Native block headers and string lengths."""
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _native_string(value):
+    data = value.encode()
+    return _varint(len(data)) + data
+
+
+def native_block(columns):
+    """Encode `(name, type, array)` columns as one ClickHouse Native format block.
+
+    Only fixed-width numeric types are supported. Each array must match the
+    column type's little-endian width (e.g. uint32 for UInt32).
+    """
+    parts = [_varint(len(columns)), _varint(len(columns[0][2]))]
+    for name, type_name, values in columns:
+        parts.append(_native_string(name))
+        parts.append(_native_string(type_name))
+        parts.append(np.ascontiguousarray(values).tobytes())
+    return b"".join(parts)
@@ -0,0 +1,257 @@
+"""
+Per-frame tracing.
+
+Every rendered frame gets a deterministic query_id prefix `<session>-<frame_id>`,
+and each of its queries is tagged `<session>-<frame_id>-<stage>` (`insert`,
+`tile<n>` or `frame`, see `Renderer.render()`). The renderer hands the client-side
+timings of every frame to a `Tracer`, which returns immediately. A background
+thread joins them with the server's view of the same queries:
+
+ - `system.query_log`: duration, CPU time and memory of every query
+ - `system.query_views_log`: every Materialized View the INSERT triggered
+   (ray stage, `render_materialized_N`, `post_process_materialized_N`)
+ - `system.processors_profile_log`: time spent per pipeline processor
+
+and exports the joined record. The server flushes these logs every few
+seconds, so records are exported with that delay. Frames whose logs do not
+show up within TRACE_TIMEOUT are exported with what was found.
+
+Exporters write JSON lines (one record per frame) or a Prometheus text file
+(per-stage histograms, rewritten atomically for the node_exporter textfile
+collector). They only run on the tracer's thread, never on the render path.
+"""
+import json
+import os
+import queue
+import threading
+import time
+
+# Seconds between polls of the system logs, and until a frame is exported without them
+TRACE_POLL_SECONDS = 2.0
+TRACE_TIMEOUT = 30.0
+
+# Settings of traced queries, so the server logs their views and processors
+TRACE_SETTINGS = {"log_query_views": 1, "log_processors_profiles": 1}
+
+
+class JsonLinesExporter:
+    """Appends one JSON record per frame to a file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'a')
+
+    def export(self, record):
+        self._file.write(json.dumps(record) + "\n")
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class PrometheusExporter:
+    """Keeps per-stage histograms of frame timings and writes them as a Prometheus text file."""
+
+    BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+    def __init__(self, path):
+        self.path = path
+        self.frames = 0
+        self._stages = {} # stage -> [bucket counts..., sum, count]
+
+    def _observe(self, stage, value_ms):
+        if value_ms is None:
+            return
+        hist = self._stages.setdefault(stage, [0] * len(self.BUCKETS_MS) + [0.0, 0])
+        for i, bound in enumerate(self.BUCKETS_MS):
+            if value_ms <= bound:
+                hist[i] += 1
+        hist[-2] += value_ms
+        hist[-1] += 1
+
+    def export(self, record):
+        self.frames += 1
+        for stage, value in record["client"].items():
+            if stage.endswith("_ms"):
+                self._observe(f"client_{stage[:-3]}", value)
+        server = record.get("server")
+        if server:
+            self._observe("transport", server["transport_ms"])
+            for stage, query in server["queries"].items():
+                self._observe(f"query_{stage}", query["duration_ms"])
+            for view, stats in server["views"].items():
+                self._observe(f"view_{view.split('.')[-1]}", stats["duration_ms"])
+            for name, stats in server["processors"].items():
+                self._observe(f"processor_{name}", stats["elapsed_ms"])
+
+    def flush(self):
+        lines = [
+            "# HELP doomhouse_frames_total Traced frames.",
+            "# TYPE doomhouse_frames_total counter",
+            f"doomhouse_frames_total {self.frames}",
+            "# HELP doomhouse_stage_ms Time per render stage and frame, in milliseconds.",
+            "# TYPE doomhouse_stage_ms histogram",
+        ]
+        for stage, hist in sorted(self._stages.items()):
+            for bound, count in zip(self.BUCKETS_MS, hist):
+                lines.append(f'doomhouse_stage_ms_bucket{{stage="{stage}",le="{bound}"}} {count}')
+            lines.append(f'doomhouse_stage_ms_bucket{{stage="{stage}",le="+Inf"}} {hist[-1]}')
+            lines.append(f'doomhouse_stage_ms_sum{{stage="{stage}"}} {hist[-2]:.3f}')
+            lines.append(f'doomhouse_stage_ms_count{{stage="{stage}"}} {hist[-1]}')
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, self.path)
+
+    def close(self):
+        self.flush()
+
+
+def open_exporter(path):
+    """Prometheus text file for `.prom` paths, JSON lines otherwise."""
+    if path.endswith(".prom"):
+        return PrometheusExporter(path)
+    return JsonLinesExporter(path)
+
+
+class Tracer:
+    """Collects client timings per frame, joins them with the server logs and exports them in the background."""
+
+    def __init__(self, connect, exporter, session, server=True):
+        self.exporter = exporter
+        self.session = session
+        self.server = server
+        self._client = connect() if server else None
+        self._since = int(time.time())
+        self._queue = queue.Queue()
+        self._pending = {} # frame_id -> (record, expected stages, deadline)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="trace", daemon=True)
+        self._thread.start()
+
+    def query_id(self, frame_id):
+        return f"{self.session}-{frame_id}"
+
+    def record(self, frame_id, mode, stages, client):
+        """Queue a frame's client timings. `stages` are the query_id suffixes of its queries."""
+        self._queue.put((frame_id, {
+            "frame": frame_id, "query_id": self.query_id(frame_id), "mode": mode,
+            "time": time.time(), "client": client, "server": None,
+        }, stages))
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        self.exporter.close()
+
+    def _run(self):
+        while not self._stop.wait(TRACE_POLL_SECONDS):
+            self._poll()
+        # Final round: make the server write out its logs and export every frame left
+        self._drain()
+        if self.server and self._pending:
+            try:
+                self._client.command("SYSTEM FLUSH LOGS")
+            except Exception as e:
+                print(f"Trace flush error: {e}")
+        self._poll(final=True)
+
+    def _drain(self):
+        while True:
+            try:
+                frame_id, record, stages = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if not self.server:
+                self.exporter.export(record)
+                continue
+            self._pending[frame_id] = (record, stages, time.time() + TRACE_TIMEOUT)
+
+    def _poll(self, final=False):
+        self._drain()
+        if self._pending:
+            try:
+                self._collect()
+            except Exception as e:
+                print(f"Trace collect error: {e}")
+
+        now = time.time()
+        for frame_id in sorted(self._pending):
+            record, stages, deadline = self._pending[frame_id]
+            server = record["server"]
+            complete = server is not None and set(stages) <= set(server["queries"]) and (
+                record["mode"] != "mv" or server["views"]
+            )
+            if complete or final or now > deadline:
+                self.exporter.export(record)
+                del self._pending[frame_id]
+        self.exporter.flush()
+
+    def _collect(self):
+        """Attach the logged queries, views and processors to the pending frames."""
+        params = {
+            "prefix": f"{self.session}-", "since": self._since,
+            "frames": [str(frame_id) for frame_id in self._pending],
+        }
+        where = "event_time >= toDateTime({since:UInt32}) AND startsWith(%s, {prefix:String}) AND splitByChar('-', %s)[-2] IN {frames:Array(String)}"
+
+        queries = self._client.query(f"""
+            SELECT query_id, query_duration_ms, ProfileEvents['OSCPUVirtualTimeMicroseconds'] / 1000, memory_usage, read_rows
+            FROM system.query_log
+            WHERE type = 'QueryFinish' AND {where % ('query_id', 'query_id')}
+        """, parameters=params).result_rows
+        views = self._client.query(f"""
+            SELECT initial_query_id, view_name, view_duration_ms, ProfileEvents['OSCPUVirtualTimeMicroseconds'] / 1000,
+                   read_rows, written_rows, peak_memory_usage
+            FROM system.query_views_log
+            WHERE status = 'QueryFinish' AND {where % ('initial_query_id', 'initial_query_id')}
+        """, parameters=params).result_rows
+        processors = self._client.query(f"""
+            SELECT query_id, name, sum(elapsed_us) / 1000, sum(input_wait_elapsed_us) / 1000, sum(output_wait_elapsed_us) / 1000
+            FROM system.processors_profile_log
+            WHERE {where % ('query_id', 'query_id')}
+            GROUP BY query_id, name
+        """, parameters=params).result_rows
+
+        servers = {}
+        for frame_id, (record, _, _) in self._pending.items():
+            servers[frame_id] = {"queries": {}, "views": {}, "processors": {}}
+        for query_id, duration_ms, cpu_ms, memory, read_rows in queries:
+            frame_id, stage = self._split(query_id)
+            servers[frame_id]["queries"][stage] = {
+                "duration_ms": float(duration_ms), "cpu_ms": float(cpu_ms), "memory": memory, "read_rows": read_rows,
+            }
+        for query_id, view, duration_ms, cpu_ms, read_rows, written_rows, memory in views:
+            frame_id, _ = self._split(query_id)
+            servers[frame_id]["views"][view] = {
+                "duration_ms": float(duration_ms), "cpu_ms": float(cpu_ms),
+                "read_rows": read_rows, "written_rows": written_rows, "peak_memory": memory,
+            }
+        for query_id, name, elapsed_ms, input_wait_ms, output_wait_ms in processors:
+            frame_id, _ = self._split(query_id)
+            stats = servers[frame_id]["processors"].setdefault(name, {"elapsed_ms": 0.0, "input_wait_ms": 0.0, "output_wait_ms": 0.0})
+            stats["elapsed_ms"] += elapsed_ms
+            stats["input_wait_ms"] += input_wait_ms
+            stats["output_wait_ms"] += output_wait_ms
+
+        for frame_id, server in servers.items():
+            if not server["queries"]:
+                continue
+            record = self._pending[frame_id][0]
+            server["transport_ms"] = self._transport_ms(record, server["queries"])
+            record["server"] = server
+
+    def _split(self, query_id):
+        """`(frame_id, stage)` of a traced query_id."""
+        frame_id, stage = query_id[len(self.session) + 1:].split("-", 1)
+        return int(frame_id), stage
+
+    @staticmethod
+    def _transport_ms(record, queries):
+        """Client time not spent executing queries on the server: HTTP, transfer and decoding."""
+        client = record["client"]
+        server_ms = queries.get("insert", {}).get("duration_ms", 0.0)
+        server_ms += max((q["duration_ms"] for stage, q in queries.items() if stage != "insert"), default=0.0)
+        return (client["insert_ms"] or 0.0) + client["select_ms"] - server_ms
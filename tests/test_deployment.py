@@ -0,0 +1,74 @@
+import pytest
+
+import deployment
+from deployment import schema_object
+
+
+def _objects(source_sql="CREATE TABLE doomhouse.source (x UInt8) ENGINE = Memory"):
+    return [
+        schema_object("doomhouse.source", "table", [source_sql]),
+        schema_object("doomhouse.dict_source", "dictionary", ["CREATE DICTIONARY doomhouse.dict_source (x UInt8) SOURCE(CLICKHOUSE(TABLE 'source'))"]),
+        schema_object("doomhouse.view", "view", ["CREATE MATERIALIZED VIEW doomhouse.view AS SELECT dictGet('doomhouse.dict_source', 'x', 1)"]),
+        schema_object("doomhouse.other", "table", ["CREATE TABLE doomhouse.other (y UInt8) ENGINE = Memory"]),
+    ]
+
+
+def _deployed(objects):
+    return {obj.name: (obj.kind, obj.content_hash) for obj in objects}
+
+
+def test_plan_deploys_everything_at_first():
+    objects = _objects()
+    rebuild, drop = deployment.plan(objects, {})
+    assert rebuild == objects
+    assert drop == []
+
+
+def test_plan_nothing_to_do_when_unchanged():
+    objects = _objects()
+    assert deployment.plan(objects, _deployed(objects)) == ([], [])
+
+
+def test_plan_rebuilds_everything_that_refers_to_a_changed_object():
+    deployed = _deployed(_objects())
+    objects = _objects("CREATE TABLE doomhouse.source (x UInt16) ENGINE = Memory")
+    rebuild, drop = deployment.plan(objects, deployed)
+    assert [obj.name for obj in rebuild] == ["doomhouse.source", "doomhouse.dict_source", "doomhouse.view"]
+    assert drop == [("doomhouse.source", "table"), ("doomhouse.dict_source", "dictionary"), ("doomhouse.view", "view")]
+
+
+def test_plan_drops_objects_no_longer_wanted():
+    objects = _objects()
+    deployed = dict(_deployed(objects), **{"doomhouse.render_materialized_5": ("view", "abc")})
+    rebuild, drop = deployment.plan(objects, deployed)
+    assert rebuild == []
+    assert drop == [("doomhouse.render_materialized_5", "view")]
+
+
+def test_dependency_levels():
+    objects = _objects()
+    levels = deployment.dependency_levels(objects, deployment.dependencies(objects))
+    assert [[obj.name for obj in level] for level in levels] == [
+        ["doomhouse.source", "doomhouse.other"], ["doomhouse.dict_source"], ["doomhouse.view"],
+    ]
+
+
+class _Client:
+    """Answers `EXISTS TABLE` and fails every other query, like a server that went away mid-startup."""
+
+    def __init__(self, exists):
+        self.exists = exists
+
+    def query(self, sql):
+        if sql.startswith("EXISTS TABLE"):
+            return type("Result", (), {"result_rows": [[self.exists]]})
+        raise ConnectionError("connection reset")
+
+
+def test_deployed_objects_without_a_record():
+    assert deployment.deployed_objects(_Client(0)) == {}
+
+
+def test_deployed_objects_raises_when_the_record_cannot_be_read():
+    with pytest.raises(ConnectionError):
+        deployment.deployed_objects(_Client(1))
@@ -0,0 +1,59 @@
+from frame_cache import POSE_QUANTUM, FrameCache
+
+
+def _pose(**changes):
+    pose = {
+        "old_x": 1.5, "old_y": 2.5, "try_x": 1.5, "try_y": 2.5, "dir_x": -1.0, "dir_y": 0.0,
+        "plane_x": 0.0, "plane_y": 0.66, "theme": 0, "res_w": 640, "res_h": 480,
+    }
+    return dict(pose, **changes)
+
+
+def test_key_quantizes_the_pose():
+    assert FrameCache.key(_pose()) == FrameCache.key(_pose(old_x=1.5 + POSE_QUANTUM / 4))
+    assert FrameCache.key(_pose()) != FrameCache.key(_pose(old_x=1.5 + POSE_QUANTUM * 2))
+
+
+def test_key_does_not_depend_on_the_field_order():
+    pose = _pose()
+    assert FrameCache.key(dict(reversed(pose.items()))) == FrameCache.key(pose)
+
+
+def test_key_tells_themes_and_resolutions_apart():
+    keys = {FrameCache.key(pose) for pose in (_pose(), _pose(theme=1), _pose(res_w=320, res_h=240), _pose(res_w=480, res_h=320))}
+    assert len(keys) == 4
+
+
+def test_get_counts_hits_and_misses():
+    cache = FrameCache(100)
+    assert cache.get("a") is None
+    cache.put("a", 1.0, 2.0, bytearray(b"abc"))
+    assert cache.get("a") == (1.0, 2.0, b"abc")
+    assert (cache.hits, cache.misses, cache.hit_rate()) == (1, 1, 0.5)
+
+
+def test_put_evicts_least_recently_used():
+    cache = FrameCache(10)
+    cache.put("a", 0, 0, b"a" * 4)
+    cache.put("b", 0, 0, b"b" * 4)
+    cache.get("a")
+    cache.put("c", 0, 0, b"c" * 4)
+    assert "a" in cache and "c" in cache and "b" not in cache
+    assert (len(cache), cache.size_bytes, cache.evictions) == (2, 8, 1)
+
+
+def test_put_replaces_an_entry_and_skips_frames_over_budget():
+    cache = FrameCache(10)
+    cache.put("a", 0, 0, b"a" * 4)
+    cache.put("a", 0, 0, b"a" * 6)
+    assert cache.size_bytes == 6
+    cache.put("big", 0, 0, b"x" * 11)
+    assert "big" not in cache and "a" in cache
+
+
+def test_put_copies_the_pixels():
+    cache = FrameCache(10)
+    pixels = bytearray(b"abc")
+    cache.put("a", 0, 0, pixels)
+    pixels[0] = 0
+    assert cache.get("a").pixels == b"abc"
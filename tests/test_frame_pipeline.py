@@ -0,0 +1,86 @@
+import queue
+import threading
+import time
+
+from frame_pipeline import FramePipeline
+
+
+def _poll_until(pipeline, done, timeout=5.0):
+    deadline = time.time() + timeout
+    while not done() and time.time() < deadline:
+        pipeline.poll()
+        time.sleep(0.001)
+    assert done()
+
+
+def test_frames_are_delivered_in_submission_order():
+    delays = {0: 0.05, 1: 0.0, 2: 0.01, 3: 0.0}
+    shown = []
+    pipeline = FramePipeline(["a", "b"], lambda lane, pose: time.sleep(delays[pose]) or pose,
+                             lambda lane, pose, frame: shown.append(frame))
+    for pose in delays:
+        pipeline.submit(pose)
+        _poll_until(pipeline, pipeline.ready)
+    _poll_until(pipeline, lambda: not pipeline.in_flight())
+    assert shown == [0, 1, 2, 3]
+    pipeline.shutdown()
+
+
+def test_every_finished_frame_is_delivered():
+    # Many renders finishing right as the consumer polls: none may be left in flight
+    shown = []
+    pipeline = FramePipeline(["a", "b", "c"], lambda lane, pose: pose, lambda lane, pose, frame: shown.append(frame))
+    for pose in range(300):
+        pipeline.submit(pose)
+        pipeline.poll()
+    _poll_until(pipeline, lambda: not pipeline.in_flight() and pipeline.ready())
+    assert shown == sorted(shown) and shown[-1] == 299
+    assert len(shown) + pipeline.coalesced == 300
+    pipeline.shutdown()
+
+
+
+def test_a_frame_is_done_when_its_lane_is_signalled():
+    # The consumer polls right after the signal: the frame must already be done to be delivered
+    polled = threading.Event()
+
+    class SignalThenWait(queue.Queue):
+        def put(self, item, *args, **kwargs):
+            super().put(item, *args, **kwargs)
+            polled.wait(1)
+
+    shown = []
+    pipeline = FramePipeline(["a"], lambda lane, pose: pose, lambda lane, pose, frame: shown.append(frame))
+    pipeline._finished = SignalThenWait()
+    pipeline.submit("pose")
+    while pipeline._finished.empty():
+        time.sleep(0.001)
+    pipeline.poll()
+    polled.set()
+    _poll_until(pipeline, lambda: shown == ["pose"], timeout=1.0)
+    pipeline.shutdown()
+
+def test_waiting_poses_are_coalesced():
+    release = threading.Event()
+    shown = []
+    pipeline = FramePipeline(["a"], lambda lane, pose: release.wait() and pose, lambda lane, pose, frame: shown.append(frame))
+    for pose in range(4):
+        pipeline.submit(pose)
+    assert pipeline.queued_poses() == [0, 3]
+    release.set()
+    _poll_until(pipeline, lambda: shown == [0, 3])
+    assert pipeline.coalesced == 2
+    pipeline.shutdown()
+
+
+def test_failed_render_is_delivered_as_none():
+    shown = []
+
+    def render(lane, pose):
+        raise RuntimeError("server went away")
+
+    pipeline = FramePipeline(["a"], render, lambda lane, pose, frame: shown.append((pose, frame)))
+    pipeline.submit("pose")
+    _poll_until(pipeline, lambda: shown)
+    assert shown == [("pose", None)] and pipeline.failed == 1 and pipeline.ready()
+    pipeline.shutdown()
@@ -0,0 +1,77 @@
+import struct
+
+import numpy as np
+import pytest
+
+from framebuffer import FrameBuffer, decode_pixels, parse_batch_tiles, parse_tiles
+from reference_renderer import ReferenceRenderer
+from render_plan import Tile
+
+# Packed 0xBBGGRR colors, like the post-process stage
+COLORS = np.array([0x000000, 0xFFFFFF, 0x0000FF, 0x00FF00, 0xFF0000, 0x123456], dtype=np.uint32)
+
+
+def _rgb(colors):
+    return bytes(np.stack([colors & 0xFF, (colors >> 8) & 0xFF, colors >> 16], axis=1).astype(np.uint8).reshape(-1))
+
+
+def test_decode_rgb24_is_a_copy_free_pass_through():
+    data = memoryview(_rgb(COLORS))
+    assert decode_pixels("rgb24", data) is data
+
+
+def test_decode_rgb565_keeps_the_top_bits_of_every_channel():
+    decoded = np.frombuffer(bytes(decode_pixels("rgb565", ReferenceRenderer.encode(COLORS, "rgb565"))), dtype=np.uint8)
+    expected = np.frombuffer(_rgb(COLORS), dtype=np.uint8)
+    masks = np.tile([0xF8, 0xFC, 0xF8], len(COLORS))
+    assert np.array_equal(decoded & masks, expected & masks)
+    # Full intensity stays 255
+    assert bytes(decoded[3:6]) == b"\xff\xff\xff"
+
+
+def test_decode_rgb565_of_known_values():
+    data = struct.pack('<HH', 0xF800, 0x07E0)
+    assert bytes(decode_pixels("rgb565", data)) == b"\xff\x00\x00\x00\xff\x00"
+
+
+def test_decode_palette_is_lossless_up_to_256_colors():
+    colors = np.repeat(COLORS, 3)
+    encoded = ReferenceRenderer.encode(colors, "palette")
+    assert encoded[0] == len(COLORS) - 1
+    assert bytes(decode_pixels("palette", encoded)) == _rgb(colors)
+
+
+def test_decode_palette_quantizes_beyond_256_colors():
+    colors = np.arange(1000, dtype=np.uint32) * 0x010101 // 4
+    decoded = np.frombuffer(bytes(decode_pixels("palette", ReferenceRenderer.encode(colors, "palette"))), dtype=np.uint8)
+    assert np.abs(decoded.astype(int) - np.frombuffer(_rgb(colors), dtype=np.uint8)).max() < 8
+
+
+def test_decode_rejects_unknown_encodings():
+    with pytest.raises(KeyError):
+        decode_pixels("jpeg", b"")
+
+
+def _row(header, *fields, pixels):
+    return struct.pack(header, *fields) + bytes([len(pixels)]) + pixels
+
+
+def test_parse_tiles():
+    data = _row('<Iff', 1, 1.5, 2.5, pixels=b"abc") + _row('<Iff', 2, 1.5, 2.5, pixels=b"")
+    rows = parse_tiles(data)
+    assert [(tile_id, x, y, bytes(pixels)) for tile_id, x, y, pixels in rows] == [(1, 1.5, 2.5, b"abc"), (2, 1.5, 2.5, b"")]
+    assert isinstance(rows[0][3], memoryview)
+
+
+def test_parse_batch_tiles_with_long_strings():
+    pixels = b"x" * 300
+    data = struct.pack('<QIff', 7, 1, 0.5, 0.5) + bytes([0xAC, 0x02]) + pixels
+    assert [(frame_id, tile_id, bytes(p)) for frame_id, tile_id, _, _, p in parse_batch_tiles(data)] == [(7, 1, pixels)]
+
+
+def test_blit_places_tiles():
+    frame = FrameBuffer(4, 2)
+    frame.blit(Tile(1, 0, 0, 4, 1), b"\x01" * 12)
+    frame.blit(Tile(2, 2, 1, 2, 1), b"\x02" * 6)
+    assert bytes(frame.buffer) == b"\x01" * 12 + b"\x00" * 6 + b"\x02" * 6
+    assert frame.image().size == (4, 2)
@@ -0,0 +1,88 @@
+import os
+
+import numpy as np
+import pytest
+
+import game_map
+from game_map import distance_field, load_map, map_columns, resolve_move
+
+
+def _write(tmp_path, text):
+    path = tmp_path / "map.txt"
+    path.write_text(text)
+    return str(path)
+
+
+def test_load_text_map(tmp_path):
+    loaded = load_map(_write(tmp_path, "#####\n#.P.#\n#.2.#\n#####\n"))
+    assert (loaded.width, loaded.height, loaded.spawn) == (5, 4, (2.5, 1.5))
+    assert loaded.cells[2 * 5 + 2] == 2
+
+
+def test_load_map_walls_in_the_outer_ring(tmp_path):
+    loaded = load_map(_write(tmp_path, "...\n...\n...\n"))
+    assert list(loaded.cells) == [1, 1, 1, 1, 0, 1, 1, 1, 1]
+    assert loaded.spawn == (1.5, 1.5)
+
+
+def test_load_map_errors(tmp_path):
+    with pytest.raises(ValueError, match="Unknown map cell 'x'"):
+        load_map(_write(tmp_path, "###\n#x#\n###\n"))
+    with pytest.raises(ValueError, match="no empty cell"):
+        load_map(_write(tmp_path, "###\n#1#\n###\n"))
+    with pytest.raises(ValueError, match="sides must be between"):
+        load_map(_write(tmp_path, "..\n..\n"))
+
+
+def test_load_png_map(tmp_path):
+    from PIL import Image
+    img = Image.new("RGB", (4, 3), (255, 255, 255))
+    img.putpixel((1, 1), (0, 255, 0))
+    img.putpixel((2, 1), (200, 0, 0))
+    path = str(tmp_path / "map.png")
+    img.save(path)
+    loaded = load_map(path)
+    assert (loaded.width, loaded.height, loaded.spawn) == (4, 3, (1.5, 1.5))
+    assert list(loaded.cells[4:8]) == [1, 0, 2, 1]
+
+
+def test_load_repo_maps():
+    for name in ("default.txt", "arena.png"):
+        loaded = load_map(os.path.join(os.path.dirname(__file__), "..", "maps", name))
+        spawn_x, spawn_y = loaded.spawn
+        assert loaded.cells[int(spawn_y) * loaded.width + int(spawn_x)] == 0
+
+
+def test_distance_field_is_the_chebyshev_distance_to_the_nearest_wall(tmp_path):
+    loaded = load_map(_write(tmp_path, "\n".join(["." * 9] * 7)))
+    dist = distance_field(loaded)
+    walls = [(i % 9, i // 9) for i, val in enumerate(loaded.cells) if val]
+    for i, d in enumerate(dist):
+        x, y = i % 9, i // 9
+        assert d == min(max(abs(x - wx), abs(y - wy)) for wx, wy in walls)
+    assert dist[3 * 9 + 4] == 3
+
+
+def test_distance_field_is_capped(monkeypatch, tmp_path):
+    monkeypatch.setattr(game_map, "DIST_CAP", 2)
+    loaded = load_map(_write(tmp_path, "\n".join(["." * 9] * 9)))
+    assert max(distance_field(loaded)) == 2
+
+
+def test_map_columns(tmp_path):
+    loaded = load_map(_write(tmp_path, "....\n....\n....\n"))
+    ids, cells, dist = map_columns(loaded)
+    assert [ids.dtype, cells.dtype, dist.dtype] == [np.uint32, np.uint8, np.uint8]
+    assert ids[4:8].tolist() == [5, 6, 7, 8]
+    assert cells[4:8].tolist() == [1, 0, 0, 1]
+    assert dist[4:8].tolist() == [0, 1, 1, 0]
+
+
+def test_resolve_move_slides_along_walls(tmp_path):
+    loaded = load_map(_write(tmp_path, "#####\n#...#\n#...#\n#####\n"))
+    # Free move
+    assert resolve_move(loaded, 1.5, 1.5, 2.0, 2.0) == (2.0, 2.0)
+    # Blocked along x by the right wall, still moves along y
+    assert resolve_move(loaded, 3.5, 1.5, 3.9, 2.0) == (3.5, 2.0)
+    # Blocked along y by the bottom wall
+    assert resolve_move(loaded, 2.5, 2.5, 2.0, 2.9) == (2.0, 2.5)
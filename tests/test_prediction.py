@@ -0,0 +1,50 @@
+import math
+
+import numpy as np
+
+import camera_paths
+from framebuffer import FrameBuffer
+from prediction import MovePredictor, pixel_map, reproject
+
+
+def _frame(width, height):
+    frame = FrameBuffer(width, height)
+    frame.buffer[:] = np.arange(width * height * 3, dtype=np.uint8).tobytes()
+    return frame
+
+
+def test_reproject_to_the_same_pose_is_the_identity():
+    frame = _frame(16, 12)
+    pose = camera_paths.start_pose(2.5, 2.5, 0.3)
+    assert bytes(reproject(frame, pose, pose).buffer) == bytes(frame.buffer)
+
+
+def test_reproject_shifts_columns_when_turning():
+    width, height = 64, 48
+    from_pose = camera_paths.start_pose(2.5, 2.5, 0.0)
+    to_pose = camera_paths.start_pose(2.5, 2.5, 0.1)
+    index = pixel_map(width, height, from_pose, to_pose).reshape(height, width)
+    horizon = index[height // 2] % width
+    # The view turned, so the horizon row shows other columns of the old frame in the same order
+    assert (np.diff(horizon) >= 0).all()
+    assert (horizon != np.arange(width)).any()
+    # Rays that turned in from outside the old frame repeat its edge column
+    assert horizon[0] == 0 or horizon[-1] == width - 1
+
+
+def test_reproject_without_overlap():
+    frame = _frame(16, 12)
+    assert reproject(frame, camera_paths.start_pose(2.5, 2.5, 0.0), camera_paths.start_pose(2.5, 2.5, math.pi)) is None
+
+
+def test_move_predictor(tmp_path):
+    from game_map import load_map
+    path = tmp_path / "map.txt"
+    path.write_text("#####\n#...#\n#...#\n#####\n")
+    predictor = MovePredictor(load_map(str(path)))
+    pose = {"old_x": 1.5, "old_y": 1.5, "try_x": 1.8, "try_y": 1.5}
+    x, y = predictor.predict(pose)
+    assert (x, y) == (float(np.float32(1.8)), 1.5)
+    assert predictor.reconcile(pose, x, y) == (0.0, 0.0)
+    assert predictor.reconcile(pose, x + 0.5, y) == (0.5, 0.0)
+    assert (predictor.predicted, predictor.mispredicted, predictor.max_error) == (1, 1, 0.5)
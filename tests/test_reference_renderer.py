@@ -0,0 +1,103 @@
+"""
+Golden frames of the NumPy reference renderer, rendered without a server.
+
+The goldens in `tests/golden/` are small frames of the default map and the
+classic theme, rendered with 4 row tiles. Set DOOMHOUSE_UPDATE_GOLDENS=1 to record them again after an
+intended change of the rendered image, and check the new frames against the
+server with `golden_images.py` before committing them.
+"""
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import camera_paths
+import render_plan
+import texture_store
+from framebuffer import FrameBuffer, decode_pixels
+from game_map import load_map
+from golden_images import compare_images
+from reference_renderer import ReferenceRenderer, load_atlas
+from renderer import TEXTURE_INTENSITY, TEXTURE_SURFACES, TEXTURE_THEMES
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GOLDEN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden")
+
+WIDTH, HEIGHT = 160, 120
+TEXTURE_SIZE = 64
+MIP_LEVELS = texture_store.mip_levels(TEXTURE_SIZE)
+
+
+@pytest.fixture(scope="module")
+def game_map():
+    return load_map(os.path.join(ROOT, "maps", "default.txt"))
+
+
+@pytest.fixture(scope="module")
+def atlas():
+    cwd = os.getcwd()
+    os.chdir(ROOT)
+    try:
+        return load_atlas(["classic"], TEXTURE_THEMES, TEXTURE_SURFACES, TEXTURE_SIZE, TEXTURE_INTENSITY, MIP_LEVELS)
+    finally:
+        os.chdir(cwd)
+
+
+@pytest.fixture(scope="module")
+def poses(game_map):
+    return camera_paths.corridor_walk(game_map, frames=40)[::13]
+
+
+def render(game_map, atlas, pose, traversal="dda", tiles=None, encoding="rgb24", post_process=("blur",)):
+    """A frame as an (H, W, 3) array, assembled like `Renderer` does."""
+    tiles = tiles or render_plan.plan_tiles(4, "rows", WIDTH, HEIGHT)
+    reference = ReferenceRenderer(
+        game_map, tiles, traversal, atlas, TEXTURE_SIZE, MIP_LEVELS, MIP_LEVELS - 1, encoding, post_process
+    )
+    frame = FrameBuffer(WIDTH, HEIGHT)
+    for (tile_id, _, _, pixels), tile in zip(reference.render(pose), tiles):
+        assert tile_id == tile.tile_id
+        frame.blit(tile, decode_pixels(encoding, pixels))
+    return np.asarray(frame.image())
+
+
+def test_golden_frames(game_map, atlas, poses):
+    for i, pose in enumerate(poses):
+        actual = render(game_map, atlas, pose)
+        path = os.path.join(GOLDEN_DIR, f"frame_{i:06d}.png")
+        if os.getenv("DOOMHOUSE_UPDATE_GOLDENS"):
+            os.makedirs(GOLDEN_DIR, exist_ok=True)
+            Image.fromarray(actual).save(path)
+        with Image.open(path) as golden:
+            expected = np.asarray(golden.convert("RGB"))
+        assert compare_images(expected, actual)["diff_pixels"] == 0, f"frame {i} differs from {path}"
+
+
+@pytest.mark.parametrize("traversal", ["brute", "sdf"])
+def test_traversals_match_dda(game_map, atlas, poses, traversal):
+    # They find the same walls, with hit distances computed differently, so only a few edge pixels differ
+    for pose in poses:
+        stats = compare_images(render(game_map, atlas, pose), render(game_map, atlas, pose, traversal), tolerance=8)
+        assert stats["diff_ratio"] < 0.02
+
+
+@pytest.mark.parametrize("count,layout", [(1, "rows"), (3, "cols"), (6, "grid")])
+def test_frames_do_not_depend_on_the_tile_plan(game_map, atlas, poses, count, layout):
+    tiles = render_plan.plan_tiles(count, layout, WIDTH, HEIGHT)
+    for pose in poses:
+        assert np.array_equal(render(game_map, atlas, pose, tiles=tiles), render(game_map, atlas, pose))
+
+
+@pytest.mark.parametrize("encoding", ["rgb565", "palette"])
+def test_encodings_stay_close_to_rgb24(game_map, atlas, poses, encoding):
+    for pose in poses:
+        stats = compare_images(render(game_map, atlas, pose), render(game_map, atlas, pose, encoding=encoding))
+        assert stats["psnr"] > 25
+
+
+def test_render_resolution(game_map, atlas, poses):
+    tiles = render_plan.plan_tiles(4, "rows", WIDTH, HEIGHT)
+    reference = ReferenceRenderer(game_map, tiles, "dda", atlas, TEXTURE_SIZE, MIP_LEVELS, MIP_LEVELS - 1)
+    rows = reference.render(dict(poses[0], res_w=WIDTH // 2, res_h=HEIGHT // 2))
+    assert sum(len(pixels) for _, _, _, pixels in rows) == WIDTH // 2 * HEIGHT // 2 * 3
@@ -0,0 +1,66 @@
+import glob
+import os
+
+import pytest
+
+import render_plan
+from render_plan import Tile
+
+
+@pytest.mark.parametrize("layout", render_plan.TILE_LAYOUTS)
+@pytest.mark.parametrize("count", [1, 3, 4, 6])
+def test_plan_tiles_covers_the_frame_once(layout, count):
+    tiles = render_plan.plan_tiles(count, layout, 640, 480)
+    assert len(tiles) == count
+    assert [tile.tile_id for tile in tiles] == list(range(1, count + 1))
+    covered = [[0] * 640 for _ in range(480)]
+    for tile in tiles:
+        for y in range(tile.y0, tile.y0 + tile.height):
+            for x in range(tile.x0, tile.x0 + tile.width):
+                covered[y][x] += 1
+    assert all(count == 1 for row in covered for count in row)
+    assert render_plan.frame_size(tiles) == (640, 480)
+
+
+def test_plan_tiles_layouts():
+    assert render_plan.plan_tiles(2, "rows", 640, 480) == [Tile(1, 0, 0, 640, 240), Tile(2, 0, 240, 640, 240)]
+    assert render_plan.plan_tiles(2, "cols", 640, 480) == [Tile(1, 0, 0, 320, 480), Tile(2, 320, 0, 320, 480)]
+    assert [(tile.width, tile.height) for tile in render_plan.plan_tiles(6, "grid", 600, 400)] == [(200, 200)] * 6
+
+
+def test_plan_tiles_never_more_tiles_than_pixels():
+    assert len(render_plan.plan_tiles(8, "rows", 640, 3)) == 3
+
+
+def test_plan_tiles_rejects_unknown_layout():
+    with pytest.raises(ValueError, match="Unknown tile layout"):
+        render_plan.plan_tiles(4, "spiral", 640, 480)
+
+
+def test_scale_tiles_keeps_the_share_of_every_tile():
+    tiles = render_plan.plan_tiles(4, "grid", 640, 480)
+    assert render_plan.scale_tiles(tiles, (320, 240)) == [
+        Tile(1, 0, 0, 160, 120), Tile(2, 160, 0, 160, 120), Tile(3, 0, 120, 160, 120), Tile(4, 160, 120, 160, 120),
+    ]
+
+
+def test_split_statements_strips_comments():
+    script = """
+        /* header
+           comment */
+        CREATE TABLE a (x UInt8) ENGINE = Memory; -- trailing
+        -- only a comment
+        INSERT INTO a /* inline */ VALUES (1);
+        ;
+    """
+    assert render_plan.split_statements(script) == [
+        "CREATE TABLE a (x UInt8) ENGINE = Memory",
+        "INSERT INTO a  VALUES (1)",
+    ]
+
+
+def test_split_statements_of_every_sql_script():
+    for path in glob.glob(os.path.join(render_plan.SQL_DIR, "*.sql")):
+        with open(path, 'r') as f:
+            for statement in render_plan.split_statements(f.read()):
+                assert "--" not in statement and "/*" not in statement, path
@@ -0,0 +1,41 @@
+import pytest
+
+from resolution import ResolutionController, parse_resolution, scaled_resolutions
+
+
+def test_parse_resolution():
+    assert parse_resolution("640x480") == (640, 480)
+    assert parse_resolution("320X200") == (320, 200)
+    with pytest.raises(ValueError, match="expected WIDTHxHEIGHT"):
+        parse_resolution("640")
+
+
+def test_scaled_resolutions():
+    assert scaled_resolutions((640, 480), (1.0, 0.5)) == [(640, 480), (320, 240)]
+    assert scaled_resolutions((4, 4), (0.1,)) == [(1, 1)]
+
+
+def test_steps_down_when_slow_and_settles():
+    controller = ResolutionController([(640, 480), (320, 240)], target_ms=10, settle_frames=2)
+    assert controller.update(20) == (320, 240)
+    assert controller.update(100) is None
+    assert controller.update(100) is None
+    # Already at the smallest resolution
+    assert controller.update(100) is None
+    assert controller.resolution == (320, 240)
+
+
+def test_steps_up_only_when_the_larger_resolution_fits():
+    controller = ResolutionController([(640, 480), (320, 240)], target_ms=10, settle_frames=0)
+    controller.update(20)
+    # 3 ms at a quarter of the pixels predicts 12 ms at the full resolution
+    assert controller.update(3) is None
+    assert controller.resolution == (320, 240)
+    controller.average_ms = None
+    assert controller.update(2) == (640, 480)
+
+
+def test_holds_within_tolerance():
+    controller = ResolutionController([(640, 480), (320, 240)], target_ms=10, tolerance=0.1)
+    assert all(controller.update(ms) is None for ms in (10, 10.5, 9.5, 11))
+    assert controller.level == 0